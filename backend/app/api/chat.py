@@ -1,52 +1,274 @@
-from fastapi import APIRouter, HTTPException
-from app.models.chat import ChatRequest, ChatResponse, SummarizeRequest, SummarizeResponse
+import json
+from contextlib import aclosing
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator
+from app.models.chat import (
+    ChatRequest,
+    ChatResponse,
+    SessionChatRequest,
+    SessionChatResponse,
+    SummarizeRequest,
+    SummarizeResponse,
+)
+from app.models.db_models import Session as DBSession, Message as DBMessage, gen_id
 from app.core.config import settings
+from app.core.context_builder import ContextWindow, build_context, context_stats
+from app.core.conversation_cache import conversation_cache
+from app.core.conversation_summaries import fold_session, load_summary
+from app.core.circuit_breaker import ProviderUnavailable
+from app.core.metrics import TimedRoute
+from app.core.rate_limit import enforce_rate_limit, rate_limited_body
+from app.core.scheduler import SchedulerOverloaded
+from app.db import get_db
+from app.api.sessions import title_from_messages
 from datetime import datetime
 
 # Import both services
-from app.core.anthropic_service import anthropic_service
+from app.core.anthropic_service import MIRA_SYSTEM_PROMPT, anthropic_service
 from app.core.mock_ai_service import mock_ai_service
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(enforce_rate_limit)])
+
+MAX_CONTEXT_MESSAGES = settings.context_max_messages
+
+
+def _context_window(request: ChatRequest, context_summary: str | None = None) -> ContextWindow:
+    """Convert and fit to the token budget to avoid context overflow."""
+    raw = [{"role": msg.role, "content": msg.content} for msg in request.messages]
+    return _trim_window(raw, context_summary)
+
+
+def _trim_window(messages: list[dict], context_summary: str | None = None) -> ContextWindow:
+    """Keep the newest messages that fit the budget, opening the window with a user turn."""
+    return build_context(messages, system_prompt=MIRA_SYSTEM_PROMPT, summary=context_summary)
+
+
+async def _session_history(db: AsyncSession, session: DBSession) -> list[dict]:
+    """Recent messages of a stored session, from the LRU when it is current."""
+    history = conversation_cache.get(session.id, session.updated_at)
+    if history is None:
+        result = await db.execute(
+            select(DBMessage.role, DBMessage.content)
+            .where(DBMessage.session_id == session.id)
+            .order_by(DBMessage.timestamp.desc())
+            .limit(MAX_CONTEXT_MESSAGES)
+        )
+        history = [{"role": role, "content": content} for role, content in reversed(result.all())]
+    return history
+
+
+async def _owned_session_id(db: AsyncSession, request: ChatRequest) -> str | None:
+    """The request's session id, if that session belongs to the requesting user."""
+    if not request.session_id:
+        return None
+    return await db.scalar(
+        select(DBSession.id).where(DBSession.id == request.session_id, DBSession.user_id == request.user_id)
+    )
+
+
+async def _context_summary(db: AsyncSession, request: ChatRequest, session_id: str | None) -> str | None:
+    """The client's summary if it sent one, else the stored summary of its (owned) session."""
+    if request.context_summary or not session_id:
+        return request.context_summary
+    return await load_summary(db, session_id)
+
+
+def _schedule_fold(background_tasks: BackgroundTasks, session_id: str | None, window: ContextWindow) -> None:
+    """
+    After the response, fold what the window left out into the session's
+    summary (only for a verified owner). The boundary is what the token
+    budget actually dropped, so no message is in neither.
+    """
+    if session_id and window.dropped:
+        background_tasks.add_task(fold_session, session_id, len(window.messages))
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _sse_events(tokens: AsyncIterator[str], http_request: Request, degraded: bool = False) -> AsyncIterator[str]:
+    """Relay tokens as SSE. The token source is closed as soon as the client goes away."""
+    parts = []
+    async with aclosing(tokens):
+        try:
+            async for token in tokens:
+                if await http_request.is_disconnected():
+                    return
+                parts.append(token)
+                yield _sse("token", {"text": token})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+    done = {"message": "".join(parts), "timestamp": datetime.now().isoformat()}
+    yield _sse("done", {**done, "degraded": True} if degraded else done)
 
-MAX_CONTEXT_MESSAGES = 30
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(
+    background_tasks: BackgroundTasks,
+    request: ChatRequest = Depends(rate_limited_body(ChatRequest)),
+    db: AsyncSession = Depends(get_db),
+):
     """
     Handle chat messages and return AI response
     """
     try:
-        # Convert and truncate to avoid context overflow
-        raw = [{"role": msg.role, "content": msg.content} for msg in request.messages]
-        messages = raw[-MAX_CONTEXT_MESSAGES:] if len(raw) > MAX_CONTEXT_MESSAGES else raw
-        
-        context_summary = request.context_summary
+        session_id = await _owned_session_id(db, request)
+        context_summary = await _context_summary(db, request, session_id)
+        window = _context_window(request, context_summary)
+        messages = window.messages
+        degraded = False
 
         # Choose service based on config
         if settings.use_mock_ai:
             response_text = await mock_ai_service.chat(messages)
         else:
-            response_text = await anthropic_service.chat(messages, context_summary=context_summary)
+            try:
+                response_text = await anthropic_service.chat(
+                    messages, context_summary=context_summary, user_id=request.user_id
+                )
+            except ProviderUnavailable:
+                response_text, degraded = await mock_ai_service.chat(messages), True
         
+        _schedule_fold(background_tasks, session_id, window)
         return ChatResponse(
             message=response_text,
-            timestamp=datetime.now()
+            timestamp=datetime.now(),
+            degraded=degraded,
         )
     
+    except SchedulerOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/sessions/{session_id}/chat", response_model=SessionChatResponse)
+async def session_chat(
+    session_id: str,
+    user_id: str,
+    request: SessionChatRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Chat inside a stored session: the client sends only the new message, the
+    server supplies recent history plus the rolling summary of older messages
+    and persists both turns.
+    """
+    result = await db.execute(
+        select(DBSession).where(DBSession.id == session_id, DBSession.user_id == user_id)
+    )
+    session = result.scalar_one_or_none()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    history = await _session_history(db, session)
+    user_turn = {"role": "user", "content": request.message}
+    user_timestamp = datetime.utcnow()
+    context_summary = request.context_summary or await load_summary(db, session_id)
+    window = _trim_window(history + [user_turn], context_summary)
+    messages = window.messages
+
+    degraded = False
+    try:
+        if settings.use_mock_ai:
+            response_text = await mock_ai_service.chat(messages)
+        else:
+            response_text = await anthropic_service.chat(messages, context_summary=context_summary, user_id=user_id)
+    except ProviderUnavailable:
+        response_text, degraded = await mock_ai_service.chat(messages), True
+    except SchedulerOverloaded:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    now = datetime.utcnow()
+    user_message = DBMessage(
+        id=request.id or gen_id(), session_id=session_id, role="user", content=request.message, timestamp=user_timestamp
+    )
+    reply = DBMessage(id=gen_id(), session_id=session_id, role="assistant", content=response_text, timestamp=now)
+    db.add_all([user_message, reply])
+    if session.title == "New Entry":
+        session.title = title_from_messages([user_turn])
+    session.updated_at = now
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Message already exists")
+
+    conversation_cache.put(session_id, now, history + [user_turn, {"role": "assistant", "content": response_text}])
+    if window.dropped:  # Keep what the window sent, plus the reply just stored; fold the rest
+        background_tasks.add_task(fold_session, session_id, len(window.messages) + 1)
+    return SessionChatResponse(
+        message=response_text,
+        timestamp=now,
+        degraded=degraded,
+        message_id=reply.id,
+        user_message_id=user_message.id,
+    )
+
+@router.post("/chat/stream")
+async def chat_stream(
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    request: ChatRequest = Depends(rate_limited_body(ChatRequest)),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Stream the AI response as Server-Sent Events: one ``token`` event per
+    delta, then a ``done`` event with the full message (or ``error``).
+    """
+    session_id = await _owned_session_id(db, request)
+    context_summary = await _context_summary(db, request, session_id)
+    window = _context_window(request, context_summary)
+    messages = window.messages
+    degraded = False
+    if settings.use_mock_ai:
+        tokens = mock_ai_service.stream_chat(messages)
+    else:
+        # Admit before the response starts, so a shed request gets a 429/503 rather than an error event
+        try:
+            ticket = await anthropic_service.admit("chat_stream", request.user_id, messages, context_summary=context_summary)
+        except ProviderUnavailable:
+            tokens, degraded = mock_ai_service.stream_chat(messages), True
+        else:
+            background_tasks.add_task(ticket.release)  # In case the stream never starts
+            tokens = anthropic_service.stream_chat(messages, context_summary=context_summary, ticket=ticket)
+    _schedule_fold(background_tasks, session_id, window)
+    return StreamingResponse(
+        _sse_events(tokens, http_request, degraded),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/summarize", response_model=SummarizeResponse)
-async def summarize(request: SummarizeRequest):
+async def summarize(request: SummarizeRequest = Depends(rate_limited_body(SummarizeRequest))):
     """Compress older messages into a brief summary for context retention."""
     if not request.messages:
         return SummarizeResponse(summary="")
     raw = [{"role": msg.role, "content": msg.content} for msg in request.messages]
-    summary = await anthropic_service.summarize(raw)
+    summary = await anthropic_service.summarize(raw, previous_summary=request.previous_summary, user_id=request.user_id)
     return SummarizeResponse(summary=summary)
 
 
+@router.get("/ai/stats")
+async def ai_stats():
+    """Counters for the upstream AI client: deduplicated calls, context trimming, token usage, timings and queueing."""
+    return {
+        "single_flight": anthropic_service.flights.stats(),
+        "context": context_stats.stats(),
+        "usage": anthropic_service.usage.stats(),
+        "scheduler": anthropic_service.scheduler.stats(),
+        "circuit": anthropic_service.breaker.stats(),
+    }
+
+
 @router.get("/opening-prompt")
 async def get_opening_prompt():
     """
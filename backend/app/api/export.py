@@ -0,0 +1,196 @@
+"""Whole-journal export and import as NDJSON, streamed both ways."""
+from datetime import datetime
+from typing import Annotated, AsyncIterator, List, Literal, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from pydantic_core import to_json
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.sessions import MigratedMessageIn, Timestamp
+from app.core.conversation_cache import conversation_cache
+from app.core.metrics import TimedRoute
+from app.core.rate_limit import enforce_rate_limit
+from app.db import async_session, get_db, insert_ignore
+from app.models.db_models import Message as DBMessage, Session as DBSession, gen_id
+
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(enforce_rate_limit)])
+
+EXPORT_BATCH_ROWS = 1000  # Rows fetched from the database cursor (and lines written) at a time
+IMPORT_BATCH_ROWS = 2000  # Message rows buffered before a bulk insert and commit
+MAX_LINE_BYTES = 1_000_000  # One session or message line
+
+
+class SessionLine(BaseModel):
+    type: Literal["session"]
+    id: str = Field(..., max_length=64)
+    title: str = Field("New Entry", max_length=200)
+    created_at: Timestamp | None = None
+    updated_at: Timestamp | None = None
+
+
+class MessageLine(MigratedMessageIn):
+    type: Literal["message"]
+    session_id: str = Field(..., max_length=64)
+
+
+_LINE = TypeAdapter(Annotated[Union[SessionLine, MessageLine], Field(discriminator="type")])
+
+
+class ImportResponse(BaseModel):
+    sessions_imported: int
+    sessions_skipped: int  # Already present; new messages still merge into the user's own sessions
+    messages_imported: int  # Inserted into the user's sessions (ids already present are left as they are)
+    messages_skipped: int  # Their session belongs to someone else
+
+
+_EXPORT = (
+    select(
+        DBSession.id, DBSession.title, DBSession.created_at, DBSession.updated_at,
+        DBMessage.id.label("message_id"), DBMessage.role, DBMessage.content, DBMessage.timestamp,
+    )
+    .outerjoin(DBMessage, DBMessage.session_id == DBSession.id)
+    # Walks the (user_id, updated_at, id) and (session_id, timestamp, id) indexes; only one session's messages are sorted at a time
+    .order_by(DBSession.updated_at, DBSession.id, DBMessage.timestamp, DBMessage.id)
+    .execution_options(yield_per=EXPORT_BATCH_ROWS)
+)
+
+
+async def _export_lines(user_id: str) -> AsyncIterator[bytes]:
+    """
+    One query (so one consistent snapshot) over a server-side cursor: each
+    session line is followed by its message lines, EXPORT_BATCH_ROWS rows per chunk.
+    Opens its own database session, as the request's one is closed before the body is sent.
+    """
+    current = None
+    async with async_session() as db:
+        result = await db.stream(_EXPORT.where(DBSession.user_id == user_id))
+        async for rows in result.partitions():
+            lines = []
+            for row in rows:
+                if row.id != current:
+                    current = row.id
+                    lines.append(to_json({
+                        "type": "session", "id": row.id, "title": row.title,
+                        "created_at": row.created_at, "updated_at": row.updated_at,
+                    }))
+                if row.message_id is not None:
+                    lines.append(to_json({
+                        "type": "message", "id": row.message_id, "session_id": row.id,
+                        "role": row.role, "content": row.content, "timestamp": row.timestamp,
+                    }))
+            yield b"\n".join(lines) + b"\n"
+
+
+@router.get("/export")
+async def export_journal(user_id: str):
+    """
+    The user's whole journal as NDJSON: a ``session`` line, then that
+    session's ``message`` lines, for every session (oldest change first).
+    Streamed with constant memory; POST the file back to /api/import.
+    """
+    return StreamingResponse(
+        _export_lines(user_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="journal.ndjson"'},
+    )
+
+
+async def _lines(request: Request) -> AsyncIterator[tuple[int, bytes]]:
+    """Numbered lines of the request body, as it arrives."""
+    number = 0
+    pending = b""
+    async for chunk in request.stream():
+        parts = (pending + chunk).split(b"\n")
+        pending = parts.pop()
+        if len(pending) > MAX_LINE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Line {number + len(parts) + 1} is longer than {MAX_LINE_BYTES} bytes")
+        for part in parts:
+            number += 1
+            yield number, part
+    if pending:
+        yield number + 1, pending
+
+
+def _parse(number: int, line: bytes) -> SessionLine | MessageLine:
+    try:
+        return _LINE.validate_json(line)
+    except ValidationError as e:
+        errors = [
+            {"loc": ["body", "line", number, *error["loc"]], "msg": error["msg"], "type": error["type"]}
+            for error in e.errors(include_url=False)
+        ]
+        raise HTTPException(status_code=422, detail=errors)
+
+
+@router.post("/import", response_model=ImportResponse)
+async def import_journal(user_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Import an NDJSON journal (the /api/export format) as it is uploaded.
+    Sessions that already exist are skipped; messages are merged into those
+    the user owns. Rows are written and committed in batches, so memory
+    stays flat; after a failure, import the same file again to finish.
+    """
+    counts = dict.fromkeys(ImportResponse.model_fields, 0)
+    owned: set[str] = set()  # Session ids this user's messages may go to
+    merged: set[str] = set()  # Of those, the ones that existed before this import
+    session_rows: List[dict] = []
+    message_rows: List[dict] = []
+
+    async def flush():
+        if session_rows:
+            ids = [row["id"] for row in session_rows]
+            existing = dict((await db.execute(select(DBSession.id, DBSession.user_id).where(DBSession.id.in_(ids)))).all())
+            new = {row["id"]: row for row in session_rows if row["id"] not in existing}
+            if new:
+                await db.execute(insert_ignore(DBSession), list(new.values()))
+            owned.update(new)
+            merged.update(sid for sid, owner in existing.items() if owner == user_id and sid not in owned)
+            owned.update(merged)
+            counts["sessions_imported"] += len(new)
+            counts["sessions_skipped"] += len(session_rows) - len(new)
+        accepted = {row["id"]: row for row in message_rows if row["session_id"] in owned}
+        if accepted:
+            known = (await db.execute(select(DBMessage.id).where(DBMessage.id.in_(list(accepted))))).scalars().all()
+            for mid in known:
+                del accepted[mid]
+        touched = {row["session_id"] for row in accepted.values()} & merged
+        if accepted:
+            await db.execute(insert_ignore(DBMessage), list(accepted.values()))
+        if touched:
+            await db.execute(update(DBSession).where(DBSession.id.in_(touched)).values(updated_at=datetime.utcnow()))
+        counts["messages_imported"] += len(accepted)
+        counts["messages_skipped"] += sum(row["session_id"] not in owned for row in message_rows)
+        await db.commit()
+        for session_id in touched:
+            conversation_cache.invalidate(session_id)
+        session_rows.clear()
+        message_rows.clear()
+
+    now = datetime.utcnow()
+    async for number, raw in _lines(request):
+        if not raw.strip():
+            continue
+        line = _parse(number, raw)
+        if isinstance(line, SessionLine):
+            session_rows.append({
+                "id": line.id,
+                "user_id": user_id,
+                "title": line.title,
+                "created_at": line.created_at or now,
+                "updated_at": line.updated_at or line.created_at or now,
+            })
+        else:
+            message_rows.append({
+                "id": line.id or gen_id(),
+                "session_id": line.session_id,
+                "role": line.role,
+                "content": line.content,
+                "timestamp": line.timestamp or now,
+            })
+        if len(message_rows) + len(session_rows) >= IMPORT_BATCH_ROWS:
+            await flush()
+    await flush()
+    return ImportResponse(**counts)
@@ -1,9 +1,30 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, List, Optional
 from app.core.anthropic_service import anthropic_service
+from app.core.config import settings
+from app.core.insight_jobs import JobWorkerPool, Report
+from app.core.insights_cache import insights_cache
+from app.core.circuit_breaker import ProviderUnavailable
+from app.core.metrics import TimedRoute
+from app.core.rate_limit import enforce_rate_limit, rate_limited_body
+from app.core.scheduler import SchedulerOverloaded
+from app.core.text_analysis import EntryAnalysis, analyze_entries
+from app.db import async_session, get_db
+from app.models.db_models import InsightJob
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(enforce_rate_limit)])
+
+RECENT_ENTRIES = 15  # Entries quoted in the prompt
+SAMPLE_MESSAGES = 3  # Quotes per entry
+NARRATIVE_MAX_TOKENS = 700
+JOB_OVERLOAD_RETRIES = 5  # Times a job retries after being shed or finding the provider down
+PROMPT_VERSION = 2  # Bump when the prompt changes so cached results are not reused
 
 class JournalEntry(BaseModel):
     date: str = Field(..., max_length=20)
@@ -14,6 +35,10 @@ class InsightsRequest(BaseModel):
     entries: List[JournalEntry] = Field(..., max_length=500)
     total_days_active: int = Field(..., ge=0, le=10000)
     total_messages: int = Field(..., ge=0, le=100000)
+    user_id: Optional[str] = Field(None, max_length=128)  # For fair scheduling; not part of the cache key
+
+class InsightsJobRequest(InsightsRequest):
+    user_id: str = Field(..., max_length=128)  # Owner; only they can read the job
 
 class ThemeNode(BaseModel):
     theme: str
@@ -46,104 +71,246 @@ class UnifiedInsights(BaseModel):
     hidden_pattern: str
     future_prompt: str
 
+class InsightJobStatus(BaseModel):
+    id: str
+    status: str  # 'queued' | 'running' | 'succeeded' | 'failed'
+    progress: str
+    result: Optional[UnifiedInsights] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+def _cache_key(request: InsightsRequest) -> str:
+    """Hash of exactly the request fields the result depends on."""
+    return insights_cache.key_for({
+        "v": PROMPT_VERSION,
+        "entries": [entry.model_dump() for entry in request.entries],
+        "total_days_active": request.total_days_active,
+    })
+
+
+def _build_prompt(request: InsightsRequest, analysis: EntryAnalysis) -> str:
+    """Narrative-only prompt: the counting is already done, so send the results, not the raw text."""
+    entries_context = []
+    for idx, entry in enumerate(request.entries[-RECENT_ENTRIES:]):
+        quotes = "\n  ".join(f'- "{msg[:200]}"' for msg in entry.sample_messages[:SAMPLE_MESSAGES])
+        entries_context.append(f"Entry {idx+1} ({entry.date}, {entry.message_count} messages):\n  {quotes}")
+    words = ", ".join(f"{word} ({count})" for word, count in analysis.term_counts.items())
+    themes = "\n".join(
+        f'- key "{theme.key}": terms {", ".join(theme.terms[:6])}; in {theme.frequency} entries'
+        for theme in analysis.themes
+    )
+    return f"""You are helping someone reflect on their journal ({len(request.entries)} entries over {request.total_days_active} days).
+
+MOST FREQUENT WORDS (count): {words}
+
+CANDIDATE THEMES (already measured from their entries):
+{themes or "- none"}
+
+RECENT ENTRIES:
+{chr(10).join(entries_context)}
+
+Name and interpret what was measured. Be warm, specific and use their actual words.
+- central_theme: the single most dominant theme (2-4 words), with emoji, 1-sentence description and a hex color matching the mood
+- themes: for EACH candidate key above, a short name, emoji and sentiment (positive/negative/neutral/mixed)
+- narrative (3-4 sentences), hidden_pattern (2-3 sentences), future_prompt (one reflective question)
+
+Respond with ONLY valid JSON:
+{{"central_theme": "...", "central_emoji": "🎯", "theme_description": "...", "theme_color": "#9333ea",
+ "themes": [{{"key": "candidate-key", "theme": "Theme Name", "emoji": "⏰", "sentiment": "negative"}}],
+ "narrative": "...", "hidden_pattern": "...", "future_prompt": "...?"}}"""
+
+
+def _parse_model_json(response_text: str) -> dict:
+    response_text = response_text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text.replace("```json", "").replace("```", "").strip()
+    if response_text.startswith("```"):
+        response_text = response_text.replace("```", "").strip()
+    return json.loads(response_text)
+
+
+def _merge_insights(request: InsightsRequest, analysis: EntryAnalysis, narrative: dict) -> UnifiedInsights:
+    """Numbers come from the local analysis, names and prose from the model."""
+    labels = {label.get("key"): label for label in narrative.get("themes", []) if isinstance(label, dict)}
+    names = {}
+    core_themes = []
+    for theme in analysis.themes:
+        label = labels.get(theme.key, {})
+        names[theme.key] = label.get("theme") or theme.key.title()
+        core_themes.append(ThemeNode(
+            theme=names[theme.key],
+            emoji=label.get("emoji") or "✨",
+            frequency=theme.frequency,
+            sentiment=label.get("sentiment") or "neutral",
+            dates=list(dict.fromkeys(request.entries[i].date for i in theme.entries)),
+        ))
+    central = core_themes[0] if core_themes else None
+    return UnifiedInsights(
+        central_theme=narrative.get("central_theme") or (central.theme if central else "Reflection"),
+        central_emoji=narrative.get("central_emoji") or (central.emoji if central else "✨"),
+        theme_description=narrative.get("theme_description", ""),
+        theme_color=narrative.get("theme_color") or "#9333ea",
+        related_words=[WordCloudWord(word=word, size=size) for word, size in analysis.related_words],
+        core_themes=core_themes,
+        connections=[
+            ThoughtConnection(from_theme=names[a], to_theme=names[b], strength=strength)
+            for a, b, strength in analysis.connections
+        ],
+        narrative=narrative.get("narrative", ""),
+        hidden_pattern=narrative.get("hidden_pattern", ""),
+        future_prompt=narrative.get("future_prompt", ""),
+    )
+
+def _require_client() -> None:
+    if not anthropic_service.client:
+        raise HTTPException(
+            status_code=503,
+            detail="AI service not available. Please configure Anthropic API key."
+        )
+
+
+async def _generate(request: InsightsRequest, report: Optional[Report] = None) -> UnifiedInsights:
+    """Cached result, or local analysis plus one narrative call to the model."""
+    cache_key = _cache_key(request)
+    cached = await insights_cache.get(cache_key)
+    if cached is not None:
+        return UnifiedInsights.model_validate_json(cached)
+
+    if report:
+        await report("analyzing")
+    analysis = analyze_entries([entry.sample_messages for entry in request.entries])
+    if report:
+        await report("generating")
+    messages = [{"role": "user", "content": _build_prompt(request, analysis)}]
+    response_text = await anthropic_service.chat(
+        messages,
+        max_tokens=NARRATIVE_MAX_TOKENS,
+        timeout=settings.anthropic_insights_timeout,
+        cache=settings.prompt_cache_insights,
+        operation="insights",
+        user_id=request.user_id,
+    )
+
+    insights = _merge_insights(request, analysis, _parse_model_json(response_text))
+    await insights_cache.set(cache_key, insights.model_dump_json())
+    return insights
+
+
+async def _run_job(payload: str, report: Report) -> str:
+    request = InsightsRequest.model_validate_json(payload)
+    for attempt in range(JOB_OVERLOAD_RETRIES + 1):
+        try:
+            return (await _generate(request, report)).model_dump_json()
+        except (SchedulerOverloaded, ProviderUnavailable) as e:
+            # A queued job can wait out a busy period or provider outage instead of failing
+            if attempt == JOB_OVERLOAD_RETRIES:
+                raise
+            await report("waiting")
+            await asyncio.sleep(e.retry_after)
+
+
+# Background workers for /insights/jobs (started by the app lifespan, or on first submit)
+insight_jobs = JobWorkerPool(_run_job)
+
+
+def _job_status(job: InsightJob) -> InsightJobStatus:
+    return InsightJobStatus(
+        id=job.id,
+        status=job.status,
+        progress=job.progress,
+        result=UnifiedInsights.model_validate_json(job.result) if job.result else None,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
+
+
 @router.post("/insights/unified", response_model=UnifiedInsights)
-async def generate_unified_insights(request: InsightsRequest):
+async def generate_unified_insights(request: InsightsRequest = Depends(rate_limited_body(InsightsRequest))):
     """
-    Generate comprehensive insights: word cloud + constellation in one call
+    Generate comprehensive insights: word cloud + constellation in one call.
+    Word sizes, theme frequencies and connection strengths are computed
+    locally; the model only names the themes and writes the narrative.
     """
     try:
-        if not anthropic_service.client:
-            raise HTTPException(
-                status_code=503,
-                detail="AI service not available. Please configure Anthropic API key."
-            )
-        
-        # Collect all user messages
-        all_messages = []
-        entries_context = []
-        
-        for idx, entry in enumerate(request.entries[-15:]):
-            all_messages.extend(entry.sample_messages)
-            messages_text = "\n  ".join([f'- "{msg}"' for msg in entry.sample_messages[:5]])
-            entries_context.append(
-                f"Entry {idx+1} ({entry.date}, {entry.message_count} messages):\n  {messages_text}"
-            )
-        
-        full_text = " ".join(all_messages)
-        entries_summary = "\n\n".join(entries_context)
-        
-        prompt = f"""Analyze this person's journal entries to create a comprehensive insight dashboard with BOTH a word cloud and theme constellation.
-
-JOURNAL ENTRIES ({len(request.entries)} total, over {request.total_days_active} days):
-
-{entries_summary}
-
-FULL TEXT FOR WORD ANALYSIS:
-{full_text[:2500]}
-
-Provide TWO types of analysis in one JSON response:
-
-1. WORD CLOUD (Central Theme Focus):
-   - Identify the SINGLE most dominant theme
-   - Name it specifically (2-4 words)
-   - Choose perfect emoji
-   - Write 1-sentence description
-   - Extract 12-15 related words from their actual text
-   - Assign sizes (1-5) based on frequency
-   - Pick a theme color (hex) matching the mood
-
-2. CONSTELLATION (Multiple Themes & Connections):
-   - Identify 3-5 core themes (can include the central theme)
-   - For each: name, emoji, frequency, sentiment, dates
-   - Map 3-5 connections between themes (strength 1-5)
-   - Write narrative (3-4 sentences)
-   - Identify hidden pattern (2-3 sentences)
-   - Provide thoughtful future prompt question
-
-IMPORTANT:
-- Use their ACTUAL words
-- Be specific and personal to their content
-- If work stress appears 2+ times: make it prominent
-- Connect themes meaningfully
-
-Respond with ONLY valid JSON:
-{{
-  "central_theme": "Most Dominant Theme",
-  "central_emoji": "🎯",
-  "theme_description": "This theme recurs because...",
-  "theme_color": "#9333ea",
-  "related_words": [
-    {{"word": "actual-word", "size": 5}},
-    {{"word": "another", "size": 4}}
-  ],
-  "core_themes": [
-    {{"theme": "Theme Name", "emoji": "⏰", "frequency": 3, "sentiment": "negative", "dates": ["Jan 15", "Jan 17"]}}
-  ],
-  "connections": [
-    {{"from_theme": "Theme1", "to_theme": "Theme2", "strength": 5}}
-  ],
-  "narrative": "Your journal reveals...",
-  "hidden_pattern": "You might not have noticed...",
-  "future_prompt": "What would it look like if...?"
-}}"""
-
-        messages = [{"role": "user", "content": prompt}]
-        # response_text = await anthropic_service.chat(messages)
-        response_text = await anthropic_service.chat(messages, max_tokens=2000)
-
-        
-        import json
-        response_text = response_text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text.replace("```json", "").replace("```", "").strip()
-        if response_text.startswith("```"):
-            response_text = response_text.replace("```", "").strip()
-        
-        insights = json.loads(response_text)
-        return UnifiedInsights(**insights)
+        _require_client()
+        return await _generate(request)
     
-    except HTTPException:
+    except (HTTPException, SchedulerOverloaded):
         raise
+    except ProviderUnavailable as e:
+        raise HTTPException(status_code=503, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         print(f"Error generating insights: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/insights/jobs", response_model=InsightJobStatus, status_code=202)
+async def create_insights_job(
+    request: InsightsJobRequest = Depends(rate_limited_body(InsightsJobRequest)),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Queue an insights request and return its job id immediately. Poll
+    GET /insights/jobs/{id}?user_id= (or stream its /events) for progress and the result.
+    """
+    _require_client()
+    job = InsightJob(user_id=request.user_id, request=request.model_dump_json())
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    await insight_jobs.submit(job.id)
+    return _job_status(job)
+
+
+async def _get_owned_job(db: AsyncSession, job_id: str, user_id: str) -> InsightJob:
+    job = await db.get(InsightJob, job_id)
+    if not job or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/insights/jobs/{job_id}", response_model=InsightJobStatus)
+async def get_insights_job(job_id: str, user_id: str, db: AsyncSession = Depends(get_db)):
+    """Current status of a job, with the insights once it has succeeded."""
+    return _job_status(await _get_owned_job(db, job_id, user_id))
+
+
+async def _job_events(job_id: str, http_request: Request) -> AsyncIterator[str]:
+    """SSE: a progress event per stage change, then done (with the result) or error."""
+    last = None
+    while not await http_request.is_disconnected():
+        async with async_session() as db:
+            job = await db.get(InsightJob, job_id)
+        if not job:  # Removed since the stream opened
+            yield f"event: error\ndata: {json.dumps({'detail': 'Job not found'})}\n\n"
+            return
+        status = _job_status(job)
+        if status.status == "succeeded":
+            yield f"event: done\ndata: {status.model_dump_json()}\n\n"
+            return
+        if status.status == "failed":
+            yield f"event: error\ndata: {json.dumps({'detail': status.error})}\n\n"
+            return
+        if (status.status, status.progress) != last:
+            last = (status.status, status.progress)
+            yield f"event: progress\ndata: {json.dumps({'status': status.status, 'progress': status.progress})}\n\n"
+        await asyncio.sleep(settings.insights_job_poll_interval)
+
+
+@router.get("/insights/jobs/{job_id}/events")
+async def stream_insights_job(job_id: str, user_id: str, http_request: Request, db: AsyncSession = Depends(get_db)):
+    """Server-sent events for a job until it finishes."""
+    await _get_owned_job(db, job_id, user_id)
+    return StreamingResponse(
+        _job_events(job_id, http_request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/insights/cache/stats")
+async def insights_cache_stats():
+    """Hit/miss counters for the insights result cache."""
+    return insights_cache.stats()
@@ -0,0 +1,64 @@
+"""Full-text search over a user's journal messages."""
+import base64
+from datetime import datetime
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import TimedRoute
+from app.core.rate_limit import enforce_rate_limit
+from app.core.search import search_messages
+from app.db import get_db
+
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(enforce_rate_limit)])
+
+
+class SearchHit(BaseModel):
+    message_id: str
+    session_id: str
+    session_title: str
+    role: str
+    timestamp: datetime
+    snippet: str  # HTML-escaped message excerpt, matched words in <mark>
+    score: float  # Higher is a better match
+
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_cursor: str | None
+
+
+def _encode_offset(offset: int) -> str:
+    return base64.urlsafe_b64encode(f"offset|{offset}".encode()).decode()
+
+
+def _decode_offset(cursor: str) -> int:
+    try:
+        label, offset = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        if label != "offset" or int(offset) < 0:
+            raise ValueError(cursor)
+        return int(offset)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/search", response_model=SearchPage)
+async def search(
+    user_id: str,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Search the user's messages, best matches first. Every word must match;
+    end a word with ``*`` to match by prefix. Pass ``next_cursor`` back as
+    ``cursor`` for the next page.
+    """
+    offset = _decode_offset(cursor) if cursor else 0
+    rows = await search_messages(db, user_id, q, limit + 1, offset)
+    page = rows[:limit]
+    next_cursor = _encode_offset(offset + limit) if len(rows) > limit else None
+    return SearchPage(items=[SearchHit(**row) for row in page], next_cursor=next_cursor)
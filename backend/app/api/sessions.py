@@ -1,16 +1,43 @@
 """Sessions and messages API."""
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from sqlalchemy.orm import selectinload
-from pydantic import BaseModel, Field
-from typing import List
+from sqlalchemy import select, delete, insert, update, func, and_, or_
+from pydantic import AfterValidator, BaseModel, BeforeValidator, Field
+from pydantic_core import to_json
+from typing import Annotated, List, Literal
 from datetime import datetime
 
-from app.db import get_db
+from app.db import get_db, insert_ignore
+from app.core.conversation_cache import conversation_cache
+from app.core.conversation_summaries import drop_summary
+from app.core.http_cache import is_not_modified, make_etag, not_modified, set_etag
+from app.core.metrics import TimedRoute
+from app.core.rate_limit import enforce_rate_limit, rate_limited_body
 from app.models.db_models import Session as DBSession, Message as DBMessage, gen_id
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(enforce_rate_limit)])
+
+PREVIEW_CHARS = 120
+MIGRATE_BATCH_ROWS = 2000  # Message rows buffered before a bulk insert
+
+
+def _iso_only(value):
+    """Timestamps arrive as ISO 8601 strings (or datetimes from Python callers), never as bare numbers."""
+    if not isinstance(value, (str, datetime)):
+        raise ValueError("timestamp must be an ISO 8601 string")
+    return value
+
+
+def _naive_utc(ts: datetime) -> datetime:
+    """The form stored in the DB."""
+    if ts.tzinfo is None:
+        return ts
+    offset = ts.utcoffset()
+    return ts.replace(tzinfo=None) - offset if offset else ts.replace(tzinfo=None)
+
+
+Timestamp = Annotated[datetime, BeforeValidator(_iso_only), AfterValidator(_naive_utc)]
 
 
 class MessageSchema(BaseModel):
@@ -28,19 +55,58 @@ class SessionSchema(BaseModel):
     updated_at: datetime
 
 
+class SessionMessagesPage(SessionSchema):
+    older_cursor: str | None = None  # Pass as ``before`` to fetch the previous page
+
+
+class SessionSummary(BaseModel):
+    id: str
+    title: str
+    created_at: datetime
+    updated_at: datetime
+    message_count: int
+    last_message_preview: str | None
+
+
+class SessionSummaryPage(BaseModel):
+    items: List[SessionSummary]
+    next_cursor: str | None
+
+
 class CreateSessionRequest(BaseModel):
     user_id: str = Field(..., max_length=128)
     title: str = Field("New Entry", max_length=200)
 
 
+class MessageIn(BaseModel):
+    id: str | None = Field(None, max_length=64)  # Generated when missing
+    role: Literal["user", "assistant"]
+    content: str
+    timestamp: Timestamp | None = None  # Now, when missing
+
+
+class MigratedMessageIn(MessageIn):
+    role: str = Field("user", max_length=32)
+    content: str = ""
+
+
 class SaveMessagesRequest(BaseModel):
-    messages: List[dict] = Field(..., max_length=500)  # {id, role, content, timestamp}
+    messages: List[MessageIn] = Field(..., max_length=500)
+
+
+class MessagesDelta(BaseModel):
+    session_id: str
+    title: str
+    updated_at: datetime
+    inserted: List[MessageSchema]
+    updated: List[MessageSchema]
+    deleted: List[str]
 
 
 class MigrateSessionItem(BaseModel):
     id: str = Field(..., max_length=64)
     title: str = Field(..., max_length=200)
-    messages: List[dict] = Field(..., max_length=500)
+    messages: List[MigratedMessageIn] = Field(..., max_length=500)
     created_at: str | None = None
     updated_at: str | None = None
 
@@ -55,19 +121,49 @@ class MigrateResponse(BaseModel):
     skipped: int
 
 
-def _parse_timestamp(ts) -> datetime:
-    if ts is None:
-        return datetime.utcnow()
-    if isinstance(ts, str):
-        return datetime.fromisoformat(ts.replace("Z", "+00:00")) if "T" in ts else datetime.fromisoformat(ts)
-    return ts
+def _message_rows(session_id: str, messages: List[MessageIn]) -> List[dict]:
+    """Validated client messages as rows ready for a bulk insert."""
+    now = datetime.utcnow()
+    return [
+        {
+            "id": msg.id or gen_id(),
+            "session_id": session_id,
+            "role": msg.role,
+            "content": msg.content,
+            "timestamp": msg.timestamp or now,
+        }
+        for msg in messages
+    ]
+
+
+def _encode_cursor(ts: datetime, row_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{ts.isoformat()}|{row_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        ts, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(ts), row_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# Hot read and save responses are serialized in one pass straight from SQL rows (pydantic-core), rather than
+# built as schema objects that FastAPI would validate against response_model again. The dicts keep the
+# schemas' field order, and response_model still documents the shape.
+_MESSAGE_COLUMNS = (DBMessage.id, DBMessage.role, DBMessage.content, DBMessage.timestamp)
 
 
-def _to_message_schema(m: DBMessage) -> MessageSchema:
-    return MessageSchema(id=m.id, role=m.role, content=m.content, timestamp=m.timestamp)
+def _json_response(content, headers: dict | None = None) -> Response:
+    return Response(to_json(content), media_type="application/json", headers=headers)
 
 
-def _title_from_messages(messages: list) -> str:
+def _message_json(row) -> dict:
+    """A MessageSchema-shaped dict from a row of _MESSAGE_COLUMNS."""
+    return {"id": row.id, "role": row.role, "content": row.content, "timestamp": row.timestamp}
+
+
+def title_from_messages(messages: list) -> str:
     first_user = next((m for m in messages if m.get("role") == "user"), None)
     if not first_user:
         return "New Entry"
@@ -75,30 +171,119 @@ def _title_from_messages(messages: list) -> str:
     return content[:50] + ("..." if len(content) > 50 else "")
 
 
+async def _get_owned_session(db: AsyncSession, session_id: str, user_id: str) -> DBSession:
+    result = await db.execute(select(DBSession).where(DBSession.id == session_id, DBSession.user_id == user_id))
+    session = result.scalar_one_or_none()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+async def _touch_session(db: AsyncSession, session: DBSession, title: str | None = None) -> None:
+    """Bump updated_at (and optionally the title) with a single UPDATE."""
+    values = {"updated_at": datetime.utcnow()}
+    if title and title != "New Entry":
+        values["title"] = title
+    await db.execute(update(DBSession).where(DBSession.id == session.id).values(**values))
+    session.updated_at = values["updated_at"]
+    session.title = values.get("title", session.title)
+
+
+def _message_count():
+    return (
+        select(func.count(DBMessage.id))
+        .where(DBMessage.session_id == DBSession.id)
+        .correlate(DBSession)
+        .scalar_subquery()
+    )
+
+
+def _row_json(row: dict) -> dict:
+    """A MessageSchema-shaped dict from a row built by _message_rows."""
+    return {"id": row["id"], "role": row["role"], "content": row["content"], "timestamp": row["timestamp"]}
+
+
 @router.get("/sessions", response_model=List[SessionSchema])
-async def list_sessions(user_id: str, db: AsyncSession = Depends(get_db)):
-    """List all sessions for a user."""
-    result = await db.execute(
-        select(DBSession)
+async def list_sessions(user_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    List all sessions for a user. The ETag comes from each session's id,
+    updated_at and message count, read without loading any message; a
+    matching If-None-Match gets a 304 without the full load.
+    """
+    sessions = (await db.execute(
+        select(DBSession.id, DBSession.title, DBSession.created_at, DBSession.updated_at, _message_count())
         .where(DBSession.user_id == user_id)
-        .order_by(DBSession.updated_at.desc())
-        .options(selectinload(DBSession.messages))
+        .order_by(DBSession.updated_at.desc(), DBSession.id)
+    )).all()
+    etag = make_etag(*(f"{s.id}/{s.updated_at.isoformat()}/{s[4]}" for s in sessions))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    # Only the sessions listed above: one created since (not in the ETag either) waits for the next read
+    messages = {s.id: [] for s in sessions}
+    rows = await db.execute(
+        select(DBMessage.session_id, *_MESSAGE_COLUMNS)
+        .where(DBMessage.session_id.in_(list(messages)))
+        .order_by(DBMessage.session_id, DBMessage.timestamp, DBMessage.id)
+    ) if messages else []
+    for row in rows:
+        messages[row.session_id].append(_message_json(row))
+    response = _json_response([
+        {"id": s.id, "title": s.title, "messages": messages[s.id], "created_at": s.created_at, "updated_at": s.updated_at}
+        for s in sessions
+    ])
+    set_etag(response, etag)
+    return response
+
+
+@router.get("/sessions/summaries", response_model=SessionSummaryPage)
+async def list_session_summaries(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Page through a user's sessions, newest first, without loading messages.
+    Counts and previews are computed in SQL; pass ``next_cursor`` back as ``cursor``.
+    """
+    message_count = _message_count()
+    last_preview = (
+        select(func.substr(DBMessage.content, 1, PREVIEW_CHARS))
+        .where(DBMessage.session_id == DBSession.id)
+        .order_by(DBMessage.timestamp.desc(), DBMessage.id.desc())
+        .limit(1)
+        .correlate(DBSession)
+        .scalar_subquery()
     )
-    sessions = result.scalars().all()
-    return [
-        SessionSchema(
-            id=s.id,
-            title=s.title,
-            messages=[_to_message_schema(m) for m in s.messages],
-            created_at=s.created_at,
-            updated_at=s.updated_at,
+    stmt = (
+        select(
+            DBSession.id,
+            DBSession.title,
+            DBSession.created_at,
+            DBSession.updated_at,
+            message_count.label("message_count"),
+            last_preview.label("last_message_preview"),
         )
-        for s in sessions
-    ]
+        .where(DBSession.user_id == user_id)
+        .order_by(DBSession.updated_at.desc(), DBSession.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        ts, sid = _decode_cursor(cursor)
+        stmt = stmt.where(or_(DBSession.updated_at < ts, and_(DBSession.updated_at == ts, DBSession.id < sid)))
+
+    rows = (await db.execute(stmt)).all()
+    page = rows[:limit]
+    next_cursor = _encode_cursor(page[-1].updated_at, page[-1].id) if len(rows) > limit else None
+    return SessionSummaryPage(items=[SessionSummary(**row._mapping) for row in page], next_cursor=next_cursor)
 
 
 @router.post("/sessions", response_model=SessionSchema)
-async def create_session(req: CreateSessionRequest, db: AsyncSession = Depends(get_db)):
+async def create_session(
+    req: CreateSessionRequest = Depends(rate_limited_body(CreateSessionRequest)),
+    db: AsyncSession = Depends(get_db),
+):
     """Create a new session."""
     session = DBSession(user_id=req.user_id, title=req.title)
     db.add(session)
@@ -113,68 +298,149 @@ async def create_session(req: CreateSessionRequest, db: AsyncSession = Depends(g
     )
 
 
-@router.get("/sessions/{session_id}", response_model=SessionSchema)
-async def get_session(session_id: str, user_id: str, db: AsyncSession = Depends(get_db)):
-    """Get a session with its messages."""
-    result = await db.execute(
-        select(DBSession)
+@router.get("/sessions/{session_id}", response_model=SessionMessagesPage)
+async def get_session(
+    session_id: str,
+    user_id: str,
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=500),
+    before: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get a session with its messages. With ``limit``, only the newest ``limit``
+    messages (older than ``before``) are returned, plus a cursor for the rest.
+    Sends an ETag; a matching If-None-Match gets a 304 before any message is read.
+    """
+    session = (await db.execute(
+        select(DBSession.title, DBSession.created_at, DBSession.updated_at, _message_count())
         .where(DBSession.id == session_id, DBSession.user_id == user_id)
-        .options(selectinload(DBSession.messages))
-    )
-    session = result.scalar_one_or_none()
-    if not session:
+    )).first()
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    return SessionSchema(
-        id=session.id,
-        title=session.title,
-        messages=[_to_message_schema(m) for m in session.messages],
-        created_at=session.created_at,
-        updated_at=session.updated_at,
-    )
+    etag = make_etag(session_id, session.updated_at.isoformat(), session[3], limit, before)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    stmt = select(*_MESSAGE_COLUMNS).where(DBMessage.session_id == session_id)
+    if limit is None:
+        messages = (await db.execute(stmt.order_by(DBMessage.timestamp, DBMessage.id))).all()
+        older_cursor = None
+    else:
+        stmt = stmt.order_by(DBMessage.timestamp.desc(), DBMessage.id.desc()).limit(limit + 1)
+        if before:
+            ts, mid = _decode_cursor(before)
+            stmt = stmt.where(or_(DBMessage.timestamp < ts, and_(DBMessage.timestamp == ts, DBMessage.id < mid)))
+        rows = (await db.execute(stmt)).all()
+        page = rows[:limit]
+        older_cursor = _encode_cursor(page[-1].timestamp, page[-1].id) if len(rows) > limit else None
+        messages = list(reversed(page))
+
+    response = _json_response({
+        "id": session_id,
+        "title": session.title,
+        "messages": [_message_json(m) for m in messages],
+        "created_at": session.created_at,
+        "updated_at": session.updated_at,
+        "older_cursor": older_cursor,
+    })
+    set_etag(response, etag)
+    return response
+
+
+@router.put("/sessions/{session_id}/messages", response_model=SessionSchema | MessagesDelta)
+async def save_messages(
+    session_id: str,
+    user_id: str,
+    req: SaveMessagesRequest,
+    delta: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Replace all messages in a session. Only rows that are new, changed or gone
+    are written. With ``delta=true`` the response lists just those changes.
+    """
+    session = await _get_owned_session(db, session_id, user_id)
 
-
-@router.put("/sessions/{session_id}/messages", response_model=SessionSchema)
-async def save_messages(session_id: str, user_id: str, req: SaveMessagesRequest, db: AsyncSession = Depends(get_db)):
-    """Replace all messages in a session."""
     result = await db.execute(
-        select(DBSession)
-        .where(DBSession.id == session_id, DBSession.user_id == user_id)
-        .options(selectinload(DBSession.messages))
-    )
-    session = result.scalar_one_or_none()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-
-    await db.execute(delete(DBMessage).where(DBMessage.session_id == session_id))
-
-    for msg in req.messages:
-        ts = msg.get("timestamp")
-        if isinstance(ts, str):
-            ts = datetime.fromisoformat(ts.replace("Z", "+00:00")) if "T" in ts else datetime.fromisoformat(ts)
-        elif ts is None:
-            ts = datetime.utcnow()
-        db_msg = DBMessage(
-            id=msg.get("id") or gen_id(),
-            session_id=session_id,
-            role=msg["role"],
-            content=msg["content"],
-            timestamp=ts,
+        select(DBMessage.id, DBMessage.role, DBMessage.content, DBMessage.timestamp).where(
+            DBMessage.session_id == session_id
         )
-        db.add(db_msg)
-
-    title = _title_from_messages(req.messages)
-    if title != "New Entry":
-        session.title = title
-
-    await db.commit()
-    await db.refresh(session)
-    return SessionSchema(
-        id=session.id,
-        title=session.title,
-        messages=[_to_message_schema(m) for m in session.messages],
-        created_at=session.created_at,
-        updated_at=session.updated_at,
     )
+    existing = {row.id: (row.role, row.content, row.timestamp) for row in result.all()}
+    rows = _message_rows(session_id, req.messages)
+    incoming_ids = {row["id"] for row in rows}
+
+    inserted = [row for row in rows if row["id"] not in existing]
+    updated = [
+        row for row in rows
+        if row["id"] in existing and existing[row["id"]] != (row["role"], row["content"], row["timestamp"])
+    ]
+    deleted = [mid for mid in existing if mid not in incoming_ids]
+
+    title = title_from_messages(rows)
+    if inserted or updated or deleted or (title != "New Entry" and title != session.title):
+        if deleted:
+            await db.execute(delete(DBMessage).where(DBMessage.id.in_(deleted)))
+        if inserted:
+            await db.execute(insert(DBMessage), inserted)
+        if updated:
+            await db.execute(update(DBMessage), [{k: row[k] for k in ("id", "role", "content", "timestamp")} for row in updated])
+        if updated or deleted:
+            await drop_summary(db, session_id)  # It may describe messages that changed; rebuilt on the next turn
+        await _touch_session(db, session, title)
+        await db.commit()
+        conversation_cache.invalidate(session_id)
+
+    if delta:
+        return _json_response({
+            "session_id": session.id,
+            "title": session.title,
+            "updated_at": session.updated_at,
+            "inserted": [_row_json(row) for row in inserted],
+            "updated": [_row_json(row) for row in updated],
+            "deleted": deleted,
+        })
+    return _json_response({
+        "id": session.id,
+        "title": session.title,
+        "messages": [_row_json(row) for row in sorted(rows, key=lambda row: row["timestamp"])],
+        "created_at": session.created_at,
+        "updated_at": session.updated_at,
+    })
+
+
+@router.post("/sessions/{session_id}/messages:append", response_model=MessagesDelta)
+async def append_messages(session_id: str, user_id: str, req: SaveMessagesRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Append messages to a session. Ids already in the session are skipped, so
+    retries are safe; an id used in another session is a 409.
+    """
+    session = await _get_owned_session(db, session_id, user_id)
+
+    rows = _message_rows(session_id, req.messages)
+    result = await db.execute(
+        select(DBMessage.id, DBMessage.session_id).where(DBMessage.id.in_([row["id"] for row in rows]))
+    )
+    known = dict(result.all())
+    if any(owner != session_id for owner in known.values()):
+        raise HTTPException(status_code=409, detail="Message id already used in another session")
+    inserted = [row for row in rows if row["id"] not in known]
+
+    if inserted:
+        await db.execute(insert(DBMessage), inserted)
+        await _touch_session(db, session, title_from_messages(inserted) if session.title == "New Entry" else None)
+        await db.commit()
+        conversation_cache.invalidate(session_id)
+
+    return _json_response({
+        "session_id": session.id,
+        "title": session.title,
+        "updated_at": session.updated_at,
+        "inserted": [_row_json(row) for row in inserted],
+        "updated": [],
+        "deleted": [],
+    })
 
 
 @router.delete("/sessions/{session_id}")
@@ -184,39 +450,48 @@ async def delete_session(session_id: str, user_id: str, db: AsyncSession = Depen
     session = result.scalar_one_or_none()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
+    await drop_summary(db, session_id)  # SQLite does not enforce the cascade
     await db.delete(session)
     await db.commit()
+    conversation_cache.invalidate(session_id)
     return {"ok": True}
 
 
 @router.post("/migrate", response_model=MigrateResponse)
-async def migrate_sessions(req: MigrateRequest, db: AsyncSession = Depends(get_db)):
-    """Import localStorage sessions. Skips sessions that already exist (conflict handling)."""
+async def migrate_sessions(
+    req: MigrateRequest = Depends(rate_limited_body(MigrateRequest)),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Import localStorage sessions. Skips sessions that already exist (conflict handling).
+    One existence query, then chunked bulk inserts that ignore duplicate ids.
+    """
+    result = await db.execute(select(DBSession.id).where(DBSession.id.in_([item.id for item in req.sessions])))
+    seen = set(result.scalars().all())
     imported = 0
     skipped = 0
+    session_rows: List[dict] = []
+    message_rows: List[dict] = []
+
+    async def flush():
+        # Sessions first so message foreign keys resolve
+        if session_rows:
+            await db.execute(insert_ignore(DBSession), session_rows)
+        if message_rows:
+            await db.execute(insert_ignore(DBMessage), message_rows)
+        session_rows.clear()
+        message_rows.clear()
+
     for item in req.sessions:
-        result = await db.execute(
-            select(DBSession).where(DBSession.id == item.id, DBSession.user_id == req.user_id)
-        )
-        if result.scalar_one_or_none():
+        if item.id in seen:
             skipped += 1
             continue
-        session = DBSession(
-            id=item.id,
-            user_id=req.user_id,
-            title=item.title or "New Entry",
-        )
-        db.add(session)
-        for msg in item.messages:
-            ts = _parse_timestamp(msg.get("timestamp"))
-            db_msg = DBMessage(
-                id=msg.get("id") or gen_id(),
-                session_id=item.id,
-                role=msg.get("role", "user"),
-                content=msg.get("content", ""),
-                timestamp=ts,
-            )
-            db.add(db_msg)
+        seen.add(item.id)
+        session_rows.append({"id": item.id, "user_id": req.user_id, "title": item.title or "New Entry"})
+        message_rows.extend(_message_rows(item.id, item.messages))
         imported += 1
+        if len(message_rows) >= MIGRATE_BATCH_ROWS:
+            await flush()
+    await flush()
     await db.commit()
     return MigrateResponse(imported=imported, skipped=skipped)
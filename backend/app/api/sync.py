@@ -0,0 +1,94 @@
+"""Delta sync for multi-device clients: what changed since the client's cursor."""
+import base64
+from datetime import datetime
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import TimedRoute
+from app.core.rate_limit import enforce_rate_limit
+from app.core.sync import changes_since, cursor_seq, latest_seq, load_changed, oldest_cursor, snapshot, tombstones
+from app.db import get_db
+
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(enforce_rate_limit)])
+
+
+class SyncSession(BaseModel):
+    id: str
+    title: str
+    created_at: datetime
+    updated_at: datetime
+
+
+class SyncMessage(BaseModel):
+    id: str
+    session_id: str
+    role: str
+    content: str
+    timestamp: datetime
+
+
+class SyncResponse(BaseModel):
+    sessions: List[SyncSession]  # Created or changed (full current rows)
+    messages: List[SyncMessage]
+    deleted_sessions: List[str]  # Their messages are gone too
+    deleted_messages: List[str]
+    cursor: str  # Pass as ``since`` next time
+    has_more: bool  # More changes are waiting: call again right away with ``cursor``
+
+
+def _encode_seq(seq: int) -> str:
+    return base64.urlsafe_b64encode(f"seq|{seq}".encode()).decode()
+
+
+def _decode_seq(cursor: str) -> int:
+    try:
+        label, seq = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        if label != "seq" or int(seq) < 0:
+            raise ValueError(cursor)
+        return int(seq)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/sync", response_model=SyncResponse)
+async def sync(
+    user_id: str,
+    since: str | None = None,
+    limit: int = Query(1000, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Without ``since``: every session and message of the user, and a cursor.
+    With ``since``: only the sessions and messages created, updated or
+    deleted after that cursor, at most ``limit`` changes per call. A 410
+    means the cursor is older than the retained changes: sync again without ``since``.
+    """
+    if since is None:
+        seq = await latest_seq(db)  # Read first: a write landing during the snapshot is sent again, not lost
+        sessions, messages = await snapshot(db, user_id)
+        return SyncResponse(
+            sessions=[SyncSession.model_validate(s, from_attributes=True) for s in sessions],
+            messages=[SyncMessage.model_validate(m, from_attributes=True) for m in messages],
+            deleted_sessions=[],
+            deleted_messages=[],
+            cursor=_encode_seq(seq),
+            has_more=False,
+        )
+
+    seq = _decode_seq(since)
+    if seq < await oldest_cursor(db):
+        raise HTTPException(status_code=410, detail="Cursor expired, resync without since")
+    changes, has_more = await changes_since(db, user_id, seq, limit)
+    sessions, messages = await load_changed(db, user_id, changes)
+    deleted_sessions, deleted_messages = tombstones(changes)
+    return SyncResponse(
+        sessions=[SyncSession.model_validate(s, from_attributes=True) for s in sessions],
+        messages=[SyncMessage.model_validate(m, from_attributes=True) for m in messages],
+        deleted_sessions=deleted_sessions,
+        deleted_messages=deleted_messages,
+        cursor=_encode_seq(cursor_seq(changes, seq)),
+        has_more=has_more,
+    )
@@ -1,23 +1,25 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import Counter, defaultdict, deque
 import anthropic
+import httpx
+from app.core.circuit_breaker import CircuitBreaker, ProviderUnavailable
 from app.core.config import settings
-from typing import List, Dict
+from app.core.context_builder import build_context, estimate_text_tokens, estimate_tokens
+from app.core.metrics import metrics
+from app.core.scheduler import AIScheduler, Ticket, ai_scheduler
+from app.core.single_flight import SingleFlight
+from typing import Any, AsyncIterator, List, Dict
 
-class AnthropicService:
-    def __init__(self):
-        if settings.anthropic_api_key and settings.anthropic_api_key != "mock-key":
-            self.client = anthropic.Anthropic(api_key=settings.anthropic_api_key)
-        else:
-            self.client = None
-    
-    async def chat(self, messages: List[Dict[str, str]], max_tokens: int = 500, context_summary: str | None = None) -> str:
-        """
-        Send messages to Claude and get a response
-        """
-        if not self.client:
-            return "API not configured. Please add your Anthropic API key to use real AI insights."
-        
-        context_block = f"\n\nEarlier in this conversation:\n{context_summary}" if context_summary else ""
-        system_prompt = """You are Mira, an empathetic AI journaling companion. Your role is to:
+MODEL = "claude-sonnet-4-20250514"
+
+CACHE_CONTROL = {"type": "ephemeral"}  # Prompt-caching breakpoint
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+FALLBACK_SUMMARY_CHARS = 2000  # Rolling fallback summaries keep only the most recent text
+
+MIRA_SYSTEM_PROMPT = """You are Mira, an empathetic AI journaling companion. Your role is to:
 - Listen actively and respond with genuine understanding
 - Ask thoughtful follow-up questions (one at a time)
 - Help users reflect on their thoughts and feelings
@@ -26,43 +28,328 @@ class AnthropicService:
 - Never provide medical or therapeutic advice
 - If someone expresses crisis thoughts, gently suggest professional help
 
-Remember: You're a reflective companion, not a therapist.""" + context_block
+Remember: You're a reflective companion, not a therapist."""
 
-        try:
-            response = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=max_tokens,  # Now configurable
-                system=system_prompt,
-                messages=messages
+
+def _is_provider_failure(error: BaseException) -> bool:
+    """Errors that mean the provider is in trouble (not our own request or shedding)."""
+    if isinstance(error, (asyncio.TimeoutError, anthropic.APIConnectionError, ProviderUnavailable)):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and (error.status_code >= 500 or error.status_code == 429)
+
+
+def _deadline(operation: str) -> float:
+    """Overall deadline of one call, retries included."""
+    return {
+        "summarize": settings.ai_deadline_summarize,
+        "insights": settings.ai_deadline_insights,
+    }.get(operation, settings.ai_deadline_chat)
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    """Pooled keep-alive transport shared by every call of the service."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.anthropic_max_connections,
+            max_keepalive_connections=settings.anthropic_max_keepalive_connections,
+            keepalive_expiry=settings.anthropic_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(settings.anthropic_timeout, connect=settings.anthropic_connect_timeout),
+    )
+
+
+class UsageStats:
+    """Token usage per operation, and recent latency / time-to-first-token samples with caching on and off."""
+
+    def __init__(self, samples: int = 1000):
+        self.tokens: Dict[str, Counter] = defaultdict(Counter)
+        self.timings: Dict[str, deque] = defaultdict(lambda: deque(maxlen=samples))
+
+    def record_usage(self, operation: str, usage: Any) -> None:
+        counter = self.tokens[operation]
+        counter["calls"] += 1
+        for field in USAGE_FIELDS:
+            tokens = getattr(usage, field, None) or 0
+            counter[field] += tokens
+            metrics.count_tokens(operation, field, tokens)
+
+    def record_timing(self, metric: str, operation: str, cached: bool, seconds: float) -> None:
+        self.timings[f"{metric}.{operation}.{'cache_on' if cached else 'cache_off'}"].append(seconds)
+        metrics.observe_ai(metric, operation, seconds)
+
+    def stats(self) -> dict:
+        timings = {}
+        for key, samples in self.timings.items():
+            ordered = sorted(samples)
+            timings[key] = {
+                "count": len(ordered),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+            }
+        return {"tokens": {op: dict(counter) for op, counter in self.tokens.items()}, "timings": timings}
+
+
+class AnthropicService:
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        http_client: httpx.AsyncClient | None = None,
+        scheduler: AIScheduler | None = None,
+    ):
+        api_key = api_key or settings.anthropic_api_key
+        if api_key and api_key != "mock-key":
+            self._http = http_client or _build_http_client()
+            self.client = anthropic.AsyncAnthropic(
+                api_key=api_key,
+                base_url=base_url or settings.anthropic_base_url,
+                max_retries=settings.anthropic_max_retries,
+                http_client=self._http,
             )
-            
-            return response.content[0].text
+        else:
+            self._http = None
+            self.client = None
+        self.flights = SingleFlight()
+        self.usage = UsageStats()
+        self.scheduler = scheduler or ai_scheduler
+        self.breaker = CircuitBreaker(settings.circuit_failure_threshold, settings.circuit_reset_seconds)
+
+    async def warm_up(self) -> bool:
+        """
+        Open a pooled connection to the provider (DNS, TCP and TLS) at startup,
+        so the first chat does not pay for it. Any HTTP response will do; a
+        failure only means the first call connects itself.
+        """
+        if not self.client:
+            return False
+        try:
+            await self._http.head(str(self.client.base_url), timeout=settings.anthropic_connect_timeout)
+            return True
+        except httpx.HTTPError as e:
+            print(f"AI client warm-up failed: {e}")
+            return False
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections (called on app shutdown)."""
+        if self.client:
+            await self.client.close()
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 500,
+        context_summary: str | None = None,
+        timeout: float | None = None,
+        cache: bool | None = None,
+        operation: str = "chat",
+        user_id: str | None = None,
+    ) -> str:
+        """
+        Send messages to Claude and get a response. With ``cache`` (default
+        PROMPT_CACHE_CHAT) the system prompt and history prefix are marked
+        for provider-side prompt caching. The call waits for a scheduler slot
+        and raises SchedulerOverloaded if it is shed, or ProviderUnavailable
+        on provider trouble (immediately while the circuit is open).
+        """
+        if not self.client:
+            return "API not configured. Please add your Anthropic API key to use real AI insights."
         
+        cache = settings.prompt_cache_chat if cache is None else cache
+        request = {
+            "model": MODEL,
+            "max_tokens": max_tokens,  # Now configurable
+            "system": self._system(context_summary, cache),
+            "messages": self._cache_history(messages) if cache else messages,
+        }
+
+        try:
+            return await self._coalesced_create(request, timeout, operation, cache, user_id)
+        
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             print(f"Error calling Anthropic API: {e}")
+            if _is_provider_failure(e):
+                raise ProviderUnavailable(f"AI provider error: {e}") from e
             raise
 
-    async def summarize(self, messages: List[Dict[str, str]], max_tokens: int = 150) -> str:
-        """Summarize conversation history into 2-3 sentences."""
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 500,
+        context_summary: str | None = None,
+        timeout: float | None = None,
+        cache: bool | None = None,
+        user_id: str | None = None,
+        ticket: Ticket | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Yield Claude's reply as text deltas. Closing the generator early
+        closes the upstream HTTP stream, so generation stops being billed.
+        Pass a ``ticket`` from ``admit`` to take the scheduler slot up front.
+        """
+        if not self.client:
+            yield "API not configured. Please add your Anthropic API key to use real AI insights."
+            return
+
+        cache = settings.prompt_cache_chat if cache is None else cache
+        started = time.perf_counter()
+        first = True
+        ticket = ticket or await self.admit("chat_stream", user_id, messages, max_tokens, context_summary)
+        try:
+            async with self.breaker.guard(_is_provider_failure):
+                # The deadline covers the wait for the first token; once text flows it is lifted
+                async with asyncio.timeout(_deadline("chat_stream")) as deadline:
+                    async with self.client.messages.stream(
+                        model=MODEL,
+                        max_tokens=max_tokens,
+                        system=self._system(context_summary, cache),
+                        messages=self._cache_history(messages) if cache else messages,
+                        timeout=timeout if timeout is not None else anthropic.NOT_GIVEN,
+                    ) as stream:
+                        async for text in stream.text_stream:
+                            if first:
+                                self.usage.record_timing("ttft", "chat_stream", cache, time.perf_counter() - started)
+                                deadline.reschedule(None)
+                                first = False
+                            yield text
+                        self.usage.record_usage("chat_stream", (await stream.get_final_message()).usage)
+                        self.usage.record_timing("latency", "chat_stream", cache, time.perf_counter() - started)
+        finally:
+            ticket.release()
+
+    async def admit(
+        self,
+        operation: str,
+        user_id: str | None,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 500,
+        context_summary: str | None = None,
+    ) -> Ticket:
+        """
+        Take a scheduler slot for a call; release the ticket when done. Raises
+        CircuitOpen while the provider is known to be down, SchedulerOverloaded if shed.
+        """
+        self.breaker.check()
+        tokens = estimate_tokens(MIRA_SYSTEM_PROMPT + (context_summary or "")) + max_tokens
+        tokens += sum(estimate_tokens(m["content"]) for m in messages if isinstance(m["content"], str))
+        return await self.scheduler.acquire(operation, user_id, tokens)
+
+    async def summarize(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 150,
+        timeout: float | None = None,
+        previous_summary: str | None = None,
+        cache: bool | None = None,
+        user_id: str | None = None,
+        fallback: bool = True,
+    ) -> str:
+        """
+        Summarize conversation history into 2-3 sentences. With
+        ``previous_summary`` only the new messages are sent and folded into it.
+        Errors, including being shed or an open circuit, fall back to a
+        heuristic summary unless ``fallback`` is false.
+        """
         if not self.client:
-            return self._fallback_summary(messages)
-        prompt = """Summarize this journal conversation in 2-3 concise sentences. Capture themes, feelings, and key points. Output only the summary."""
+            return self._fallback_summary(messages, previous_summary)
+        messages = build_context(
+            messages,
+            budget=settings.summarize_token_budget,
+            max_messages=len(messages),
+            summary=previous_summary,
+            start_with_user=False,
+        ).messages
+        if previous_summary:
+            prompt = f"""Here is a running summary of a journal conversation:\n{previous_summary}\n\nUpdate it with the newer messages below, still in 2-3 concise sentences. Capture themes, feelings, and key points. Output only the summary."""
+        else:
+            prompt = """Summarize this journal conversation in 2-3 concise sentences. Capture themes, feelings, and key points. Output only the summary."""
         text = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        cache = settings.prompt_cache_summarize if cache is None else cache
+        content: Any = f"{prompt}\n\n{text}"
+        if cache:
+            # The instructions (and running summary) come first, so they form the cacheable prefix
+            content = [{"type": "text", "text": prompt, "cache_control": CACHE_CONTROL}, {"type": "text", "text": text}]
+        request = {
+            "model": MODEL,
+            "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": content}],
+        }
         try:
-            response = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=max_tokens,
-                messages=[{"role": "user", "content": f"{prompt}\n\n{text}"}],
-            )
-            return response.content[0].text.strip()
+            return (await self._coalesced_create(request, timeout, "summarize", cache, user_id)).strip()
         except Exception as e:
             print(f"Error summarizing: {e}")
-            return self._fallback_summary(messages)
+            if not fallback:
+                raise
+            return self._fallback_summary(messages, previous_summary)
+
+    async def _coalesced_create(
+        self,
+        request: Dict[str, Any],
+        timeout: float | None,
+        operation: str = "chat",
+        cached: bool = False,
+        user_id: str | None = None,
+    ) -> str:
+        """
+        messages.create, shared between concurrent callers sending the same
+        payload (double clicks, client retries) so only one upstream call runs
+        and takes one scheduler slot.
+        """
+        payload = json.dumps(request, sort_keys=True)
+        key = hashlib.sha256(payload.encode()).hexdigest()
+
+        async def create() -> str:
+            self.breaker.check()  # Fail fast rather than queue for a provider that is down
+            async with self.scheduler.slot(operation, user_id, estimate_text_tokens(payload) + request["max_tokens"]):
+                async with self.breaker.guard(_is_provider_failure):
+                    started = time.perf_counter()
+                    response = await asyncio.wait_for(
+                        self.client.messages.create(
+                            **request, timeout=timeout if timeout is not None else anthropic.NOT_GIVEN
+                        ),
+                        _deadline(operation),
+                    )
+                self.usage.record_timing("latency", operation, cached, time.perf_counter() - started)
+            self.usage.record_usage(operation, response.usage)
+            return response.content[0].text
+
+        return await self.flights.do(key, create)
+
+    def _system(self, context_summary: str | None, cache: bool) -> str | List[Dict[str, Any]]:
+        """System prompt; as cacheable blocks (static prompt, then the slower-changing summary) when caching."""
+        if not cache:
+            return self._system_prompt(context_summary)
+        blocks = [{"type": "text", "text": MIRA_SYSTEM_PROMPT, "cache_control": CACHE_CONTROL}]
+        if context_summary:
+            blocks.append({"type": "text", "text": f"Earlier in this conversation:\n{context_summary}", "cache_control": CACHE_CONTROL})
+        return blocks
+
+    def _cache_history(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Mark the end of the stable prefix (everything before the new turn) as a
+        cache breakpoint; next turn the provider reads that prefix from cache.
+        """
+        if len(messages) < 2:
+            return messages
+        marked = dict(messages[-2])
+        content = marked["content"]
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        marked["content"] = [*content[:-1], {**content[-1], "cache_control": CACHE_CONTROL}]
+        return [*messages[:-2], marked, messages[-1]]
+
+    def _system_prompt(self, context_summary: str | None) -> str:
+        context_block = f"\n\nEarlier in this conversation:\n{context_summary}" if context_summary else ""
+        return MIRA_SYSTEM_PROMPT + context_block
 
-    def _fallback_summary(self, messages: List[Dict[str, str]]) -> str:
+    def _fallback_summary(self, messages: List[Dict[str, str]], previous_summary: str | None = None) -> str:
         """Heuristic fallback when no API client."""
         user_msgs = [m["content"][:80] for m in messages if m["role"] == "user"][:5]
-        return "User shared thoughts including: " + "; ".join(user_msgs) + ("..." if len(messages) > 5 else "")
+        summary = "User shared thoughts including: " + "; ".join(user_msgs) + ("..." if len(messages) > 5 else "")
+        if previous_summary:
+            summary = f"{previous_summary} {summary}"[-FALLBACK_SUMMARY_CHARS:]
+        return summary
 
 # Global instance
-anthropic_service = AnthropicService()
\ No newline at end of file
+anthropic_service = AnthropicService()
@@ -0,0 +1,92 @@
+"""Circuit breaker for the AI provider.
+
+After ``failure_threshold`` consecutive provider failures the circuit opens
+and calls fail immediately (callers degrade instead of waiting for timeouts).
+After ``reset_seconds`` one probe call is let through (half-open): success
+closes the circuit, failure opens it again.
+"""
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class ProviderUnavailable(Exception):
+    """The provider failed, timed out, or is not being called because the circuit is open."""
+
+    def __init__(self, detail: str, retry_after: float = 1.0):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = max(1, round(retry_after))
+
+
+class CircuitOpen(ProviderUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0  # Consecutive
+        self.opened_at = 0.0
+        self.probing = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def check(self) -> None:
+        """Raise CircuitOpen if calls are currently refused, without taking the half-open probe."""
+        if self.state == OPEN and self.clock() - self.opened_at < self.reset_seconds:
+            self.rejected += 1
+            raise CircuitOpen("AI provider unavailable, using fallback", self.retry_in())
+        if self.state == HALF_OPEN and self.probing:
+            self.rejected += 1
+            raise CircuitOpen("AI provider unavailable, using fallback", self.reset_seconds)
+
+    @asynccontextmanager
+    async def guard(self, is_failure: Callable[[BaseException], bool]) -> AsyncIterator[None]:
+        """Run one call through the breaker; exceptions for which ``is_failure`` is true count against it."""
+        self.check()
+        probe = self.state != CLOSED  # Open and due for a probe, or half-open and free
+        if probe:
+            self.state = HALF_OPEN
+            self.probing = True
+        try:
+            yield
+        except BaseException as e:
+            if is_failure(e):
+                self._failure()
+            elif probe:
+                self.probing = False  # Inconclusive (cancelled, bad request): let the next call probe
+            raise
+        else:
+            self._success()
+
+    def retry_in(self) -> float:
+        return max(0.0, self.reset_seconds - (self.clock() - self.opened_at)) if self.state == OPEN else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_in_seconds": round(self.retry_in(), 1),
+        }
+
+    def _success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self.probing = False
+
+    def _failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+            self.state = OPEN
+            self.opened_at = self.clock()
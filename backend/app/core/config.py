@@ -3,15 +3,100 @@ from typing import Optional
 
 class Settings(BaseSettings):
     anthropic_api_key: str = "mock-key"  # Default to mock
+    host: str = "0.0.0.0"
     port: int = 8000
     use_mock_ai: bool = True  # Enable mock mode by default
     database_url: str = "sqlite+aiosqlite:///./mindspace.db"
 
+    # Database connection pool (per worker process)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20  # Extra connections opened under bursts, closed when returned
+    db_pool_timeout: float = 30.0  # Seconds a request waits for a free connection
+    db_pool_recycle: int = 1800  # Replace connections older than this many seconds
+    db_pool_pre_ping: bool = False  # Test connections before use (PostgreSQL behind a proxy or failover)
+    db_warm_connections: int = 2  # Opened at startup, so the first requests do not pay for connecting
+
+    # Production server (serve.py)
+    web_concurrency: int = 0  # Worker processes (0 = one per CPU core)
+    server_access_log: bool = False  # A log line per request; costly under load
+    shutdown_grace_seconds: float = 30.0  # In-flight requests and AI streams may finish, then running insights jobs
+
+    # Anthropic HTTP client (shared, pooled, keep-alive)
+    anthropic_base_url: Optional[str] = None  # Override for local stub servers
+    anthropic_max_connections: int = 50
+    anthropic_max_keepalive_connections: int = 20
+    anthropic_keepalive_expiry: float = 30.0  # Seconds an idle connection is kept
+    anthropic_connect_timeout: float = 5.0
+    anthropic_timeout: float = 60.0  # Default per-call timeout (seconds)
+    anthropic_insights_timeout: float = 120.0
+    anthropic_max_retries: int = 2
+
+    # AI call scheduling (admission control in front of the provider)
+    ai_max_concurrency: int = 16  # Upstream calls in flight per process
+    ai_tokens_per_minute: int = 0  # Estimated input+output token budget (0 = unlimited)
+    ai_queue_deadline_interactive: float = 10.0  # Longest queue wait (seconds) before a chat call is shed
+    ai_queue_deadline_summarize: float = 30.0
+    ai_queue_deadline_insights: float = 60.0
+    ai_max_queued_per_user: int = 8
+
+    # Provider failure handling
+    ai_deadline_chat: float = 20.0  # Overall seconds per chat call, retries included (streams: until the first token)
+    ai_deadline_summarize: float = 15.0
+    ai_deadline_insights: float = 90.0
+    circuit_failure_threshold: int = 5  # Consecutive provider failures that open the circuit
+    circuit_reset_seconds: float = 30.0  # Open time before a half-open probe call
+
+    # Provider prompt caching, per endpoint (system prompt and stable history prefix)
+    prompt_cache_chat: bool = True  # /api/chat, /api/chat/stream and session chat
+    prompt_cache_summarize: bool = False
+    prompt_cache_insights: bool = False
+
+    # Context window sent to the model (token counts are local estimates)
+    context_token_budget: int = 12000  # Input tokens for system prompt + summary + history
+    context_max_messages: int = 30
+    summarize_token_budget: int = 8000  # Input tokens of messages sent to one summarize call
+
+    # Server-side conversation state
+    conversation_cache_size: int = 256  # Hot sessions kept in the in-process LRU
+
+    # Delta sync change feed (/api/sync)
+    sync_retention_days: int = 30  # Changes kept; an older cursor gets a 410 and must take a new snapshot
+    sync_prune_interval: int = 3600  # Seconds between prunes of the change feed
+
+    # Insights result cache
+    insights_cache_ttl_seconds: int = 3600
+    insights_cache_max_entries: int = 256  # In-memory LRU size
+    insights_cache_path: Optional[str] = None  # SQLite file for the persistent tier (disabled when unset)
+    insights_cache_disk_max_entries: int = 5000
+
+    # Insights jobs (/api/insights/jobs)
+    insights_job_workers: int = 2  # Jobs processed concurrently per process
+    insights_job_queue: str = "memory"  # 'memory' (single process) or 'database' (shared by several workers)
+    insights_job_poll_interval: float = 0.5  # Seconds between polls of the database queue and job events
+    insights_job_lease_seconds: int = 300  # A running job not updated for this long is considered orphaned
+    insights_job_max_attempts: int = 3
+
+    # Mock AI
+    mock_tokens_per_second: float = 0.0  # Pace of /api/chat/stream tokens in mock mode (0 = unpaced)
+    mock_latency_ms: float = 0.0  # Median delay before a mock reply or its first streamed token
+    mock_latency_distribution: str = "fixed"  # 'fixed', 'uniform' (0 to 2x the median) or 'lognormal' (long tail)
+    mock_latency_sigma: float = 0.5  # Spread of the lognormal distribution
+
+    # Response compression (brotli if the package is installed, else gzip); streamed responses are never compressed
+    compress_min_bytes: int = 1024  # Smaller bodies are sent as they are (0 turns compression off)
+    compress_gzip_level: int = 5
+    compress_brotli_quality: int = 4
+
     # Request body and rate limiting
     max_body_bytes: int = 1_000_000  # 1MB
-    rate_limit: str = "60/minute"  # Per-IP limit (slowapi format)
+    max_import_bytes: int = 20_000_000_000  # 20GB; POST /api/import streams its NDJSON body and never holds it whole
+    rate_limit: str = "60/minute"  # Cost units per user id and period; a session read costs 1, insights 20
+    rate_limit_ip: str = "600/minute"  # Cost units per client IP, charged on every request whatever user id it names
+    rate_limit_store: str = "sqlite"  # 'memory' (per process), 'sqlite' (shared by workers on one host) or 'redis'
+    rate_limit_sqlite_path: Optional[str] = None  # Defaults to a file in /dev/shm (or the temp dir)
+    rate_limit_redis_url: Optional[str] = None  # e.g. redis://localhost:6379/0 (needs the redis package)
 
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,123 @@
+"""Fit conversation history into an input-token budget, newest messages first."""
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Sequence
+
+from app.core.config import settings
+
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and turn markers around each message
+
+
+def estimate_text_tokens(text: str) -> int:
+    """
+    Fast local estimate (~4 UTF-8 bytes per token) instead of a real tokenizer;
+    errs high for non-Latin scripts. Uncached: for one-off text such as a whole
+    serialized request.
+    """
+    return (len(text.encode("utf-8")) + 3) // 4 if text else 0
+
+
+@lru_cache(maxsize=8192)
+def estimate_tokens(text: str) -> int:
+    """estimate_text_tokens, cached, since the same history is measured again on every turn."""
+    return estimate_text_tokens(text)
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+@dataclass
+class ContextWindow:
+    messages: List[Dict[str, str]]
+    tokens: int  # Estimated input tokens, system prompt and summary included
+    dropped: int  # Oldest messages left out
+    history: Sequence[Dict[str, str]] = field(default=(), repr=False)
+
+    @property
+    def dropped_tokens(self) -> int:
+        """Estimated tokens left out; computed on demand, as it is O(history)."""
+        return sum(message_tokens(m) for m in self.history[:self.dropped])
+
+
+class ContextStats:
+    """Totals of what the builder left out, for /api/ai/stats."""
+
+    def __init__(self):
+        self.windows = 0
+        self.truncated_windows = 0
+        self.dropped_messages = 0
+        self.sent_tokens = 0
+
+    def record(self, window: ContextWindow) -> None:
+        self.windows += 1
+        self.truncated_windows += window.dropped > 0
+        self.dropped_messages += window.dropped
+        self.sent_tokens += window.tokens
+
+    def stats(self) -> dict:
+        return {
+            "windows": self.windows,
+            "truncated_windows": self.truncated_windows,
+            "dropped_messages": self.dropped_messages,
+            "sent_tokens": self.sent_tokens,
+        }
+
+
+def build_context(
+    messages: Sequence[Dict[str, str]],
+    budget: int | None = None,
+    max_messages: int | None = None,
+    system_prompt: str = "",
+    summary: str | None = None,
+    start_with_user: bool = True,
+) -> ContextWindow:
+    """
+    Take messages from newest to oldest while they fit in ``budget`` tokens
+    (after reserving the system prompt and summary) and ``max_messages``.
+    The newest message is always kept. With ``start_with_user`` leading
+    assistant turns are dropped too, as the Messages API requires.
+    """
+    budget = budget if budget is not None else settings.context_token_budget
+    max_messages = max_messages if max_messages is not None else settings.context_max_messages
+    reserved = estimate_tokens(system_prompt) + estimate_tokens(summary or "")
+
+    used = reserved
+    start = len(messages)
+    while start > 0 and len(messages) - start < max_messages:
+        cost = message_tokens(messages[start - 1])
+        if used + cost > budget and start < len(messages):
+            break
+        used += cost
+        start -= 1
+    if start_with_user:
+        while start < len(messages) - 1 and messages[start]["role"] != "user":
+            used -= message_tokens(messages[start])
+            start += 1
+
+    window = ContextWindow(
+        messages=list(messages[start:]),
+        tokens=used,
+        dropped=start,
+        history=messages,
+    )
+    context_stats.record(window)
+    return window
+
+
+def chunk_by_budget(messages: Sequence[Dict[str, str]], budget: int) -> List[List[Dict[str, str]]]:
+    """Split messages, oldest first, into consecutive runs of at most ``budget`` tokens."""
+    chunks: List[List[Dict[str, str]]] = []
+    used = budget
+    for message in messages:
+        cost = message_tokens(message)
+        if used + cost > budget:
+            chunks.append([])
+            used = 0
+        chunks[-1].append(message)
+        used += cost
+    return chunks
+
+
+# Global instance
+context_stats = ContextStats()
@@ -0,0 +1,46 @@
+"""In-process LRU of recent conversation windows, keyed by session id."""
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List
+
+from app.core.config import settings
+
+
+class ConversationCache:
+    """
+    Holds the last ``window`` messages of hot sessions so a chat turn does not
+    have to re-read history. Entries are tagged with the session's
+    ``updated_at``; a mismatch (another worker wrote the session) is a miss.
+    """
+
+    def __init__(self, max_sessions: int = 256, window: int = 30):
+        self.max_sessions = max_sessions
+        self.window = window
+        self._entries: "OrderedDict[str, tuple[datetime, List[Dict[str, str]]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: str, updated_at: datetime) -> List[Dict[str, str]] | None:
+        entry = self._entries.get(session_id)
+        if entry is None or entry[0] != updated_at:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(session_id)
+        self.hits += 1
+        return list(entry[1])
+
+    def put(self, session_id: str, updated_at: datetime, messages: List[Dict[str, str]]) -> None:
+        self._entries[session_id] = (updated_at, list(messages[-self.window:]))
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, session_id: str) -> None:
+        self._entries.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Global instance
+conversation_cache = ConversationCache(max_sessions=settings.conversation_cache_size)
@@ -0,0 +1,92 @@
+"""Rolling per-session summaries of the messages that fell out of the chat window."""
+from typing import Optional
+
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.anthropic_service import anthropic_service
+from app.core.config import settings
+from app.core.context_builder import chunk_by_budget
+from app.core.single_flight import SingleFlight
+from app.db import async_session
+from app.models.db_models import ConversationSummary, Message as DBMessage
+
+# One fold per session at a time; a turn arriving meanwhile joins the running fold
+_folds = SingleFlight()
+
+
+async def load_summary(db: AsyncSession, session_id: str) -> Optional[str]:
+    return await db.scalar(select(ConversationSummary.summary).where(ConversationSummary.session_id == session_id))
+
+
+async def drop_summary(db: AsyncSession, session_id: str) -> None:
+    """Forget the summary (the caller commits), e.g. when folded messages were edited or deleted."""
+    await db.execute(delete(ConversationSummary).where(ConversationSummary.session_id == session_id))
+
+
+async def fold_session(session_id: str, keep: int, session_factory=async_session) -> int:
+    """Fold messages older than the newest ``keep`` into the session's summary."""
+    return await _folds.do(session_id, lambda: _fold(session_id, keep, session_factory))
+
+
+async def _fold(session_id: str, keep: int, session_factory) -> int:
+    """
+    Only messages after the summary's (timestamp, id) cursor are read and
+    sent, so each fold costs O(new messages) rather than O(history).
+    Returns the number of messages folded.
+    """
+    async with session_factory() as db:
+        boundary = (await db.execute(
+            select(DBMessage.timestamp, DBMessage.id)
+            .where(DBMessage.session_id == session_id)
+            .order_by(DBMessage.timestamp.desc(), DBMessage.id.desc())
+            .offset(keep)
+            .limit(1)
+        )).first()
+        if boundary is None:
+            return 0
+
+        current = await db.get(ConversationSummary, session_id)
+        query = select(DBMessage).where(
+            DBMessage.session_id == session_id,
+            or_(
+                DBMessage.timestamp < boundary.timestamp,
+                and_(DBMessage.timestamp == boundary.timestamp, DBMessage.id <= boundary.id),
+            ),
+        )
+        if current:
+            query = query.where(or_(
+                DBMessage.timestamp > current.covered_timestamp,
+                and_(DBMessage.timestamp == current.covered_timestamp, DBMessage.id > current.covered_message_id),
+            ))
+        new_messages = (await db.execute(query.order_by(DBMessage.timestamp, DBMessage.id))).scalars().all()
+        if not new_messages:
+            return 0
+
+        summary = current.summary if current else None
+        # A long backlog (first fold of an old session) is folded in budget-sized chunks
+        for chunk in chunk_by_budget(
+            [{"role": m.role, "content": m.content} for m in new_messages], settings.summarize_token_budget
+        ):
+            try:
+                summary = await anthropic_service.summarize(chunk, previous_summary=summary, fallback=False)
+            except Exception as e:
+                # Keep the cursor where it is; the next turn retries rather than folding a stub summary
+                print(f"Error folding summary for session {session_id}: {e}")
+                return 0
+        last = new_messages[-1]
+        if current:
+            current.summary = summary
+            current.covered_timestamp = last.timestamp
+            current.covered_message_id = last.id
+            current.message_count += len(new_messages)
+        else:
+            db.add(ConversationSummary(
+                session_id=session_id,
+                summary=summary,
+                covered_timestamp=last.timestamp,
+                covered_message_id=last.id,
+                message_count=len(new_messages),
+            ))
+        await db.commit()
+        return len(new_messages)
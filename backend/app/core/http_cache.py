@@ -0,0 +1,40 @@
+"""ETags and conditional GET for reads that clients poll."""
+import hashlib
+
+from fastapi import Request, Response
+
+# Clients revalidate every time; an unchanged resource costs a 304 with no body
+CACHE_CONTROL = "private, no-cache"
+# Suffixes the compression middleware adds to the ETag of an encoded body
+ENCODING_SUFFIXES = ("-br", "-gzip")
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from values that change whenever the representation does."""
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip().removeprefix("W/")
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(f'{suffix}"'):
+            return tag[: -len(suffix) - 1] + '"'
+    return tag
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """If-None-Match matches ``etag`` (weak comparison, as RFC 9110 asks for this header)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or any(_opaque(tag) == etag for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -0,0 +1,207 @@
+"""Background processing of insights jobs: job queues and a bounded worker pool.
+
+Jobs (request, progress, result) always live in the insight_jobs table, so
+results survive restarts. The queue only decides which worker runs which job:
+``AsyncioJobQueue`` hands ids to workers of this process, ``DatabaseJobQueue``
+lets workers of several processes claim queued rows directly.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.db import async_session
+from app.models.db_models import InsightJob
+
+Report = Callable[[str], Awaitable[None]]
+Handler = Callable[[str, Report], Awaitable[str]]
+
+
+async def _claim(db, job_id: str) -> bool:
+    """queued -> running, for exactly one worker."""
+    result = await db.execute(
+        update(InsightJob)
+        .where(InsightJob.id == job_id, InsightJob.status == "queued")
+        .values(status="running", progress="running", attempts=InsightJob.attempts + 1, updated_at=datetime.utcnow())
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def _requeue(db, running_before: Optional[datetime] = None) -> None:
+    """Put interrupted running jobs back in the queue; give up on ones that keep failing."""
+    interrupted = InsightJob.status == "running"
+    if running_before is not None:
+        interrupted = interrupted & (InsightJob.updated_at < running_before)
+    await db.execute(
+        update(InsightJob)
+        .where(interrupted, InsightJob.attempts >= settings.insights_job_max_attempts)
+        .values(status="failed", progress="failed", error="Job was interrupted too many times", updated_at=datetime.utcnow())
+    )
+    await db.execute(
+        update(InsightJob).where(interrupted).values(status="queued", progress="queued", updated_at=datetime.utcnow())
+    )
+    await db.commit()
+
+
+class AsyncioJobQueue:
+    """Job ids queued in memory for the workers of this process (single-process deployments)."""
+
+    def __init__(self, session_factory=async_session):
+        self.session_factory = session_factory
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def put(self, job_id: str) -> None:
+        self._queue.put_nowait(job_id)
+
+    async def claim(self) -> Optional[str]:
+        job_id = await self._queue.get()
+        async with self.session_factory() as db:
+            return job_id if await _claim(db, job_id) else None
+
+    async def recover(self) -> int:
+        """After a restart every running job is orphaned: queue it again, with the queued ones."""
+        async with self.session_factory() as db:
+            await _requeue(db)
+            job_ids = (await db.execute(
+                select(InsightJob.id).where(InsightJob.status == "queued").order_by(InsightJob.created_at)
+            )).scalars().all()
+        for job_id in job_ids:
+            self._queue.put_nowait(job_id)
+        return len(job_ids)
+
+
+class DatabaseJobQueue:
+    """
+    Workers poll insight_jobs for the oldest queued row and claim it with a
+    conditional UPDATE, so any number of processes can share the queue.
+    Jobs of a process that died are requeued once their lease expires, by
+    whichever worker sweeps next (every half lease).
+    """
+
+    def __init__(self, session_factory=async_session, poll_interval: Optional[float] = None):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval if poll_interval is not None else settings.insights_job_poll_interval
+        self._next_sweep = 0.0
+
+    async def put(self, job_id: str) -> None:
+        pass  # The queued row is the queue entry
+
+    async def claim(self) -> Optional[str]:
+        if time.monotonic() >= self._next_sweep:
+            await self.recover()
+        async with self.session_factory() as db:
+            job_ids = (await db.execute(
+                select(InsightJob.id).where(InsightJob.status == "queued").order_by(InsightJob.created_at).limit(5)
+            )).scalars().all()
+            for job_id in job_ids:
+                if await _claim(db, job_id):
+                    return job_id
+        await asyncio.sleep(self.poll_interval)
+        return None
+
+    async def recover(self) -> int:
+        """Other processes may still be working, so only requeue jobs whose lease has expired."""
+        self._next_sweep = time.monotonic() + settings.insights_job_lease_seconds / 2
+        async with self.session_factory() as db:
+            await _requeue(db, datetime.utcnow() - timedelta(seconds=settings.insights_job_lease_seconds))
+        return 0
+
+
+def _default_queue():
+    if settings.insights_job_queue == "database":
+        return DatabaseJobQueue()
+    return AsyncioJobQueue()
+
+
+class JobWorkerPool:
+    """
+    A fixed number of worker tasks running ``handler(request_json, report)``
+    for claimed jobs. Workers are started lazily on the running event loop
+    (and again if the loop changes, e.g. between tests).
+    """
+
+    def __init__(self, handler: Handler, workers: Optional[int] = None, queue_factory=_default_queue):
+        self.handler = handler
+        self.workers = workers or settings.insights_job_workers
+        self.queue_factory = queue_factory
+        self.queue = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._running = 0  # Jobs being processed right now
+        self._draining = False
+
+    def ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self.queue = self.queue_factory()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def start(self) -> int:
+        """Start the workers and pick up jobs interrupted by the last shutdown."""
+        self.ensure_started()
+        return await self.queue.recover()
+
+    async def submit(self, job_id: str) -> None:
+        self.ensure_started()
+        await self.queue.put(job_id)
+
+    async def stop(self, grace: float = 0.0) -> None:
+        """
+        Stop the workers. Jobs already running get up to ``grace`` seconds to
+        finish; anything cut short is requeued by the next start.
+        """
+        self._draining = True
+        deadline = time.monotonic() + grace
+        while self._running and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        self._draining = False
+
+    async def _worker(self) -> None:
+        while not self._draining:
+            try:
+                job_id = await self.queue.claim()
+                if job_id:
+                    self._running += 1
+                    try:
+                        await self._run(job_id)
+                    finally:
+                        self._running -= 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Insights worker error: {e}")
+                await asyncio.sleep(1)
+
+    async def _run(self, job_id: str) -> None:
+        session_factory = self.queue.session_factory
+
+        async def report(progress: str) -> None:
+            async with session_factory() as db:
+                await db.execute(
+                    update(InsightJob).where(InsightJob.id == job_id).values(progress=progress, updated_at=datetime.utcnow())
+                )
+                await db.commit()
+
+        async with session_factory() as db:
+            payload = await db.scalar(select(InsightJob.request).where(InsightJob.id == job_id))
+        try:
+            values = {"status": "succeeded", "progress": "done", "result": await self.handler(payload, report)}
+        except Exception as e:
+            print(f"Insights job {job_id} failed: {e}")
+            values = {"status": "failed", "progress": "failed", "error": str(e) or type(e).__name__}
+        async with session_factory() as db:
+            await db.execute(
+                update(InsightJob).where(InsightJob.id == job_id).values(**values, updated_at=datetime.utcnow())
+            )
+            await db.commit()
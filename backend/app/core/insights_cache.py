@@ -0,0 +1,124 @@
+"""Content-addressed cache for parsed unified insights."""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+
+class InsightsCache:
+    """
+    In-memory LRU with TTL, optionally backed by a SQLite file so results
+    survive restarts and are shared between workers. Values are JSON strings.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 256, path: str | None = None, disk_max_entries: int = 5000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self._memory: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS insights_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for(payload: dict) -> str:
+        """sha256 of the canonical JSON form (sorted keys, no whitespace)."""
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    async def get(self, key: str) -> str | None:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._memory[key]
+        if self._db is not None:
+            row = await asyncio.to_thread(self._disk_get, key, now)
+            if row is not None:
+                self._remember(key, row[1], row[0])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[0]
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, expires_at, value)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_set, key, value, expires_at)
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM insights_cache")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._memory),
+            "persistent": self._db is not None,
+        }
+
+    def _remember(self, key: str, expires_at: float, value: str) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, key: str, now: float) -> tuple[str, float] | None:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM insights_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE insights_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return row
+
+    def _disk_set(self, key: str, value: str, expires_at: float) -> None:
+        now = time.time()
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO insights_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            self._db.execute("DELETE FROM insights_cache WHERE expires_at <= ?", (now,))
+            self._db.execute(
+                "DELETE FROM insights_cache WHERE key IN "
+                "(SELECT key FROM insights_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_entries,),
+            )
+
+
+# Global instance
+insights_cache = InsightsCache(
+    ttl_seconds=settings.insights_cache_ttl_seconds,
+    max_entries=settings.insights_cache_max_entries,
+    path=settings.insights_cache_path,
+    disk_max_entries=settings.insights_cache_disk_max_entries,
+)
@@ -0,0 +1,199 @@
+"""Request, database and AI timings: Server-Timing for one request, Prometheus histograms for all.
+
+TimingMiddleware opens a RequestTiming per request (held in a context
+variable), TimedRoute marks when the endpoint runs, SQLAlchemy cursor events
+and AnthropicService add their time to it. Everything is plain counters and
+fixed-bucket histograms updated in the event loop, so no locks are needed.
+"""
+import inspect
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+# Upper bounds in seconds (Prometheus ``le``); one more bucket catches the rest
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> list[str]:
+        sep = "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class RequestTiming:
+    """Time spent by one request, by phase (perf_counter timestamps and totals)."""
+
+    __slots__ = ("start", "handler_start", "handler_end", "responded", "db_seconds", "db_queries", "ai_seconds")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.handler_start = self.handler_end = self.responded = 0.0
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.ai_seconds = 0.0
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing value: ``total`` (to the response start), ``pre`` (routing,
+        middleware, body parsing and dependencies), ``handler`` (endpoint body,
+        including its ``db`` and ``ai`` time) and ``serialize`` (response
+        validation and rendering).
+        """
+        now = self.responded or time.perf_counter()
+        parts = [f"total;dur={(now - self.start) * 1000:.2f}"]
+        if self.handler_start:
+            parts.append(f"pre;dur={(self.handler_start - self.start) * 1000:.2f}")
+        if self.handler_end:
+            parts.append(f"handler;dur={(self.handler_end - self.handler_start) * 1000:.2f}")
+            parts.append(f"serialize;dur={(now - self.handler_end) * 1000:.2f}")
+        if self.db_queries:
+            parts.append(f'db;dur={self.db_seconds * 1000:.2f};desc="queries={self.db_queries}"')
+        if self.ai_seconds:
+            parts.append(f"ai;dur={self.ai_seconds * 1000:.2f}")
+        return ", ".join(parts)
+
+
+current_timing: ContextVar[Optional[RequestTiming]] = ContextVar("current_timing", default=None)
+
+
+class Metrics:
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str, str], Histogram] = {}
+        self.queries: Dict[str, Histogram] = {}
+        self.ai: Dict[Tuple[str, str], Histogram] = {}
+        self.ai_tokens: Dict[str, Counter] = defaultdict(Counter)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (method, route, f"{status // 100}xx")
+        histogram = self.requests.get(key)
+        if histogram is None:
+            histogram = self.requests[key] = Histogram()
+        histogram.observe(seconds)
+
+    def observe_query(self, verb: str, seconds: float) -> None:
+        histogram = self.queries.get(verb)
+        if histogram is None:
+            histogram = self.queries[verb] = Histogram(QUERY_BUCKETS)
+        histogram.observe(seconds)
+        timing = current_timing.get()
+        if timing is not None:
+            timing.db_seconds += seconds
+            timing.db_queries += 1
+
+    def observe_ai(self, metric: str, operation: str, seconds: float) -> None:
+        """``metric`` is 'latency' (whole call) or 'ttft' (time to first streamed token)."""
+        key = (metric, operation)
+        histogram = self.ai.get(key)
+        if histogram is None:
+            histogram = self.ai[key] = Histogram()
+        histogram.observe(seconds)
+        timing = current_timing.get()
+        if metric == "latency" and timing is not None:
+            timing.ai_seconds += seconds
+
+    def count_tokens(self, operation: str, kind: str, tokens: int) -> None:
+        self.ai_tokens[operation][kind] += tokens
+
+    def render(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """Prometheus text exposition format."""
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route template, to the end of the response body.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route, status), histogram in sorted(self.requests.items()):
+            lines += histogram.render("http_request_duration_seconds", f'method="{method}",route="{route}",status="{status}"')
+        lines += ["# HELP db_query_duration_seconds SQL statement latency by verb.", "# TYPE db_query_duration_seconds histogram"]
+        for verb, histogram in sorted(self.queries.items()):
+            lines += histogram.render("db_query_duration_seconds", f'verb="{verb}"')
+        lines += ["# HELP ai_call_duration_seconds Upstream AI latency and time to first token.", "# TYPE ai_call_duration_seconds histogram"]
+        for (metric, operation), histogram in sorted(self.ai.items()):
+            lines += histogram.render("ai_call_duration_seconds", f'metric="{metric}",operation="{operation}"')
+        lines += ["# HELP ai_tokens_total Tokens reported by the AI provider.", "# TYPE ai_tokens_total counter"]
+        for operation, counter in sorted(self.ai_tokens.items()):
+            for kind, count in sorted(counter.items()):
+                lines.append(f'ai_tokens_total{{operation="{operation}",kind="{kind}"}} {count}')
+        for name, value in (gauges or {}).items():
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def instrument_engine(engine) -> None:
+    """Time every SQL statement of an (async) engine."""
+    # The start time rides on the execution context: cheaper than conn.info
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        metrics.observe_query(statement.split(None, 1)[0].upper(), elapsed)
+
+
+def _timed(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """Mark the start and end of the endpoint body on the current RequestTiming."""
+    if getattr(endpoint, "_timed", False):
+        return endpoint  # Already wrapped (include_router re-creates the routes)
+    if inspect.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def timed(*args, **kwargs):
+            timing = current_timing.get()
+            if timing is None:
+                return await endpoint(*args, **kwargs)
+            timing.handler_start = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                timing.handler_end = time.perf_counter()
+    else:
+        @wraps(endpoint)
+        def timed(*args, **kwargs):
+            timing = current_timing.get()
+            if timing is None:
+                return endpoint(*args, **kwargs)
+            timing.handler_start = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                timing.handler_end = time.perf_counter()
+    timed._timed = True
+    return timed
+
+
+class TimedRoute(APIRoute):
+    """APIRoute whose endpoint is timed, separating it from parsing and serialization."""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        super().__init__(path, _timed(endpoint), **kwargs)
+
+
+# Global instance
+metrics = Metrics()
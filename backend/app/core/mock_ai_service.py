@@ -1,5 +1,9 @@
+import asyncio
+import math
 import random
-from typing import List, Dict
+import re
+from typing import AsyncIterator, List, Dict
+from app.core.config import settings
 
 class MockAIService:
     """Mock AI service that returns predefined responses"""
@@ -18,9 +22,35 @@ class MockAIService:
             "I understand. Sometimes just expressing these thoughts can help. How are you taking care of yourself?",
         ]
     
+    def sample_latency(self) -> float:
+        """Seconds of simulated model latency, drawn from MOCK_LATENCY_DISTRIBUTION around MOCK_LATENCY_MS"""
+        median = settings.mock_latency_ms / 1000
+        if median <= 0:
+            return 0.0
+        if settings.mock_latency_distribution == "uniform":
+            return random.uniform(0, 2 * median)
+        if settings.mock_latency_distribution == "lognormal":
+            return random.lognormvariate(math.log(median), settings.mock_latency_sigma)
+        return median
+
+    async def _wait(self) -> None:
+        latency = self.sample_latency()
+        if latency:
+            await asyncio.sleep(latency)
+
     async def chat(self, messages: List[Dict[str, str]]) -> str:
         """Return a random empathetic response"""
+        await self._wait()
         return random.choice(self.responses)
 
+    async def stream_chat(self, messages: List[Dict[str, str]], tokens_per_second: float | None = None) -> AsyncIterator[str]:
+        """Yield a random response word by word, paced at tokens_per_second (0 = unpaced)"""
+        rate = settings.mock_tokens_per_second if tokens_per_second is None else tokens_per_second
+        await self._wait()
+        for token in re.findall(r"\S+\s*", random.choice(self.responses)):
+            if rate > 0:
+                await asyncio.sleep(1 / rate)
+            yield token
+
 # Global instance
 mock_ai_service = MockAIService()
\ No newline at end of file
@@ -0,0 +1,265 @@
+"""Cost-weighted token-bucket rate limiting, per client IP and per user id.
+
+Each user id has a bucket of RATE_LIMIT units ("60/minute" = 60 units,
+refilled at 1/second). A request takes its route's cost from the bucket: a
+session read costs 1, a chat turn 5, an insights run 20. User ids are not
+verified, so every request is also charged to its client IP's (larger,
+RATE_LIMIT_IP) bucket: a client cannot get fresh buckets by rotating ids.
+Buckets live in a store shared by all workers: SQLite (a file in /dev/shm by
+default, so it is effectively shared memory for the workers on one host) or
+Redis (several hosts), or per process in memory.
+"""
+import math
+import os
+import sqlite3
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Type, TypeVar
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+# Cost in bucket units per route template; unlisted routes cost DEFAULT_COST
+ROUTE_COSTS: Dict[str, int] = {
+    "/api/chat": 5,
+    "/api/chat/stream": 5,
+    "/api/sessions/{session_id}/chat": 5,
+    "/api/summarize": 3,
+    "/api/insights/unified": 20,
+    "/api/insights/jobs": 20,
+    "/api/migrate": 10,
+    "/api/search": 2,
+    "/api/sync": 2,
+    "/api/export": 10,
+    "/api/import": 10,
+}
+DEFAULT_COST = 1
+Body = TypeVar("Body", bound=BaseModel)
+PRUNE_INTERVAL = 60.0  # Seconds between sweeps of idle buckets
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    remaining: float
+    retry_after: float = 0.0  # Seconds until the cost would fit
+
+
+def parse_rate(rate: str) -> tuple[float, float]:
+    """'60/minute' -> (capacity 60, refill 1.0 per second)."""
+    count, _, period = rate.partition("/")
+    seconds = PERIODS[period.strip().rstrip("s")]
+    return float(count), float(count) / seconds
+
+
+class MemoryStore:
+    """Buckets in this process only (a single worker, or tests)."""
+
+    def __init__(self):
+        self._buckets: Dict[str, tuple[float, float]] = {}
+
+    async def take(self, key: str, cost: float, capacity: float, refill: float) -> Decision:
+        now = time.time()
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill)
+        if tokens >= cost:
+            self._buckets[key] = (tokens - cost, now)
+            return Decision(True, tokens - cost)
+        self._buckets[key] = (tokens, now)
+        return Decision(False, tokens, (cost - tokens) / refill)
+
+    async def prune(self, before: float) -> int:
+        idle = [key for key, (_, updated) in self._buckets.items() if updated < before]
+        for key in idle:
+            del self._buckets[key]
+        return len(idle)
+
+
+class SQLiteStore:
+    """
+    Buckets in a SQLite file shared by the workers on one host. Each take is
+    one UPSERT ... RETURNING on a tiny WAL table with synchronous=OFF (the
+    state is disposable), run inline: tens of microseconds, cheaper than a
+    thread hop. The busy timeout bounds how long the event loop can wait on
+    another worker's write; past it the check fails open (see RateLimiter.check).
+    """
+
+    _TAKE = """
+        INSERT INTO rate_buckets (key, tokens, updated) VALUES (:key, :capacity - :cost, :now)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = MIN(:capacity, tokens + (:now - updated) * :refill) - :cost,
+            updated = :now
+        WHERE MIN(:capacity, tokens + (:now - updated) * :refill) >= :cost
+        RETURNING tokens
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = 10):
+        self.path = path
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    async def take(self, key: str, cost: float, capacity: float, refill: float) -> Decision:
+        now = time.time()
+        params = {"key": key, "cost": cost, "capacity": capacity, "refill": refill, "now": now}
+        row = self._db.execute(self._TAKE, params).fetchone()
+        if row is not None:
+            return Decision(True, row[0])
+        tokens, updated = self._db.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+        tokens = min(capacity, tokens + (now - updated) * refill)
+        return Decision(False, tokens, (cost - tokens) / refill)
+
+    async def prune(self, before: float) -> int:
+        return self._db.execute("DELETE FROM rate_buckets WHERE updated < ?", (before,)).rowcount
+
+    def clear(self) -> None:
+        self._db.execute("DELETE FROM rate_buckets")
+
+
+class RedisStore:
+    """Buckets in Redis, for workers on several hosts. Needs the optional ``redis`` package."""
+
+    # KEYS[1] bucket; ARGV cost, capacity, refill per second, now. Returns {allowed, tokens}.
+    _TAKE = """
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local cost, capacity, refill, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+        local tokens = tonumber(bucket[1]) or capacity
+        local updated = tonumber(bucket[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill)
+        local allowed = 0
+        if tokens >= cost then
+            tokens = tokens - cost
+            allowed = 1
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+        redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill) + 1)
+        return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_STORE=redis requires the 'redis' package") from e
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(self._TAKE)
+
+    async def take(self, key: str, cost: float, capacity: float, refill: float) -> Decision:
+        allowed, tokens = await self._script(keys=[f"ratelimit:{key}"], args=[cost, capacity, refill, time.time()])
+        tokens = float(tokens)
+        if allowed:
+            return Decision(True, tokens)
+        return Decision(False, tokens, (cost - tokens) / refill)
+
+    async def prune(self, before: float) -> int:
+        return 0  # Keys expire once their bucket would be full again
+
+
+class RateLimiter:
+    def __init__(self, store, rate: str = "60/minute", ip_rate: str = "600/minute"):
+        self.store = store
+        self.capacity, self.refill = parse_rate(rate)
+        self.ip_capacity, self.ip_refill = parse_rate(ip_rate)
+        self.enabled = True
+        self.limited = 0
+        self.store_errors = 0
+        self._next_prune = time.time() + PRUNE_INTERVAL
+
+    @classmethod
+    def from_settings(cls) -> "RateLimiter":
+        if settings.rate_limit_store == "redis":
+            store = RedisStore(settings.rate_limit_redis_url or "redis://localhost:6379/0")
+        elif settings.rate_limit_store == "sqlite":
+            shm = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            store = SQLiteStore(settings.rate_limit_sqlite_path or os.path.join(shm, "mindspace-rate-limit.db"))
+        else:
+            store = MemoryStore()
+        return cls(store, settings.rate_limit, settings.rate_limit_ip)
+
+    async def check(self, key: str, cost: float) -> Decision:
+        """
+        Take ``cost`` from the bucket (never more than it holds in full): the
+        RATE_LIMIT_IP one for ``ip:`` keys, else RATE_LIMIT. Store failures let the request through.
+        """
+        capacity, refill = (self.ip_capacity, self.ip_refill) if key.startswith("ip:") else (self.capacity, self.refill)
+        try:
+            await self._prune_idle()
+            return await self.store.take(key, min(cost, capacity), capacity, refill)
+        except Exception as e:
+            self.store_errors += 1
+            print(f"Rate limit store error, allowing request: {e}")
+            return Decision(True, capacity)
+
+    async def _prune_idle(self) -> None:
+        """Every PRUNE_INTERVAL, drop buckets idle long enough to be full again (a missing bucket is a full one)."""
+        now = time.time()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + PRUNE_INTERVAL
+        await self.store.prune(now - max(self.capacity / self.refill, self.ip_capacity / self.ip_refill))
+
+    def stats(self) -> dict:
+        return {"store": type(self.store).__name__, "limited": self.limited, "store_errors": self.store_errors}
+
+
+def client_keys(request: Request) -> List[str]:
+    """
+    The buckets a request is charged to: the user id in the query string, if
+    any, then always the client address. Routes that take the user id in
+    their JSON body charge it through rate_limited_body.
+    """
+    keys = [f"ip:{request.client.host if request.client else 'unknown'}"]
+    user_id = request.query_params.get("user_id")
+    if user_id:
+        keys.insert(0, f"user:{user_id}")
+    return keys
+
+
+async def _charge(request: Request, keys: List[str]) -> None:
+    """Charge the route's cost to each bucket in turn, or raise 429 with Retry-After."""
+    if not rate_limiter.enabled:
+        return
+    route = request.scope.get("route")
+    cost = ROUTE_COSTS.get(getattr(route, "path", ""), DEFAULT_COST)
+    for key in keys:
+        decision = await rate_limiter.check(key, cost)
+        if not decision.allowed:
+            rate_limiter.limited += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Rate limit exceeded, retry later",
+                headers={"Retry-After": str(max(1, math.ceil(decision.retry_after)))},
+            )
+
+
+async def enforce_rate_limit(request: Request) -> None:
+    """Router dependency: charge the route's cost to the caller's buckets (see client_keys)."""
+    await _charge(request, client_keys(request))
+
+
+def rate_limited_body(model: Type[Body]) -> Callable:
+    """
+    Dependency for routes whose JSON body carries ``user_id``: returns the
+    parsed body after charging that user's bucket (the router dependency has
+    charged the address). Use it in place of the plain body parameter, e.g.
+    ``request: ChatRequest = Depends(rate_limited_body(ChatRequest))``.
+    """
+    async def dependency(request: Request, body: model) -> model:
+        user_id = getattr(body, "user_id", None)
+        if user_id and "user_id" not in request.query_params:  # Otherwise already charged
+            await _charge(request, [f"user:{user_id}"])
+        return body
+
+    return dependency
+
+
+# Global instance
+rate_limiter = RateLimiter.from_settings()
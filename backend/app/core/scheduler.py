@@ -0,0 +1,228 @@
+"""Admission control for upstream AI calls.
+
+Every AnthropicService call takes a slot from the scheduler first. Slots are
+limited by a global concurrency cap and a tokens-per-minute budget; waiting
+calls are served by priority class (interactive chat before summaries before
+insights) and round-robin between users within a class, so one user's batch
+of insights cannot starve everyone's chat. A call whose expected queue wait
+exceeds its class deadline is shed at once with a Retry-After hint.
+"""
+import asyncio
+import math
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from app.core.config import settings
+
+# Priority order: earlier classes are always served first
+PRIORITY_CLASSES = ("interactive", "summarize", "insights")
+OPERATION_CLASSES = {"chat": "interactive", "chat_stream": "interactive", "summarize": "summarize", "insights": "insights"}
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when a call is shed; served as 429 (budget) or 503 (capacity) with Retry-After."""
+
+    def __init__(self, detail: str, retry_after: float, status_code: int = 503):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.status_code = status_code
+
+
+@dataclass(eq=False)
+class _Waiter:
+    kind: str
+    user: str
+    tokens: int
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class Ticket:
+    """An admitted call. ``release`` is idempotent."""
+
+    def __init__(self, scheduler: "AIScheduler", kind: str):
+        self.scheduler = scheduler
+        self.kind = kind
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.scheduler._release(self)
+
+
+class AIScheduler:
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        tokens_per_minute: int = 0,
+        deadlines: Optional[Dict[str, float]] = None,
+        max_queued_per_user: int = 8,
+    ):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute  # 0 = no token budget
+        self.deadlines = deadlines or {"interactive": 10.0, "summarize": 30.0, "insights": 60.0}
+        self.max_queued_per_user = max_queued_per_user
+        self.active = 0
+        self._lanes: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {kind: OrderedDict() for kind in PRIORITY_CLASSES}
+        self._budget = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._service_seconds = 2.0  # Moving average of how long a slot is held
+        self.admitted: Counter = Counter()
+        self.shed: Counter = Counter()
+        self.queue_times: Dict[str, deque] = {kind: deque(maxlen=1000) for kind in PRIORITY_CLASSES}
+
+    @classmethod
+    def from_settings(cls) -> "AIScheduler":
+        return cls(
+            max_concurrency=settings.ai_max_concurrency,
+            tokens_per_minute=settings.ai_tokens_per_minute,
+            deadlines={
+                "interactive": settings.ai_queue_deadline_interactive,
+                "summarize": settings.ai_queue_deadline_summarize,
+                "insights": settings.ai_queue_deadline_insights,
+            },
+            max_queued_per_user=settings.ai_max_queued_per_user,
+        )
+
+    async def acquire(self, operation: str, user_id: Optional[str] = None, tokens: int = 0) -> Ticket:
+        """Wait for a slot for ``operation`` (see OPERATION_CLASSES), or raise SchedulerOverloaded."""
+        kind = OPERATION_CLASSES.get(operation, operation)
+        user = user_id or ""
+        tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+        self._refill()
+        if not self._queued() and self.active < self.max_concurrency and tokens <= self._budget:
+            return self._admit(kind, tokens, 0.0)
+
+        lane = self._lanes[kind].get(user)
+        if lane and len(lane) >= self.max_queued_per_user:
+            self.shed[f"{kind}.per_user"] += 1
+            raise SchedulerOverloaded("Too many AI requests queued for this user", self._service_seconds, 429)
+        wait, budget_bound = self._estimate_wait(kind, tokens)
+        if wait > self.deadlines[kind]:
+            self.shed[f"{kind}.{'tokens' if budget_bound else 'capacity'}"] += 1
+            if budget_bound:
+                raise SchedulerOverloaded("AI token budget exhausted, retry later", wait, 429)
+            raise SchedulerOverloaded("AI service is busy, retry later", wait, 503)
+
+        waiter = _Waiter(kind, user, tokens, asyncio.get_running_loop().create_future())
+        self._lanes[kind].setdefault(user, deque()).append(waiter)
+        self._dispatch()  # Arms the refill timer when only the budget is short (no release would do it)
+        try:
+            return await asyncio.wait_for(waiter.future, timeout=self.deadlines[kind])
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.shed[f"{kind}.deadline"] += 1
+            raise SchedulerOverloaded("AI service is busy, retry later", self._service_seconds, 503)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    @asynccontextmanager
+    async def slot(self, operation: str, user_id: Optional[str] = None, tokens: int = 0) -> AsyncIterator[Ticket]:
+        ticket = await self.acquire(operation, user_id, tokens)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> dict:
+        queue_ms = {}
+        for kind, samples in self.queue_times.items():
+            ordered = sorted(samples)
+            queue_ms[kind] = {
+                "count": len(ordered),
+                "p50": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else 0.0,
+                "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1) if ordered else 0.0,
+            }
+        return {
+            "active": self.active,
+            "queued": {kind: sum(len(lane) for lane in lanes.values()) for kind, lanes in self._lanes.items()},
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+            "queue_ms": queue_ms,
+            "token_budget": round(self._budget) if self.tokens_per_minute else None,
+        }
+
+    def _queued(self) -> bool:
+        return any(self._lanes[kind] for kind in PRIORITY_CLASSES)
+
+    def _admit(self, kind: str, tokens: int, waited: float) -> Ticket:
+        self.active += 1
+        self._budget -= tokens
+        self.admitted[kind] += 1
+        self.queue_times[kind].append(waited)
+        return Ticket(self, kind)
+
+    def _release(self, ticket: Ticket) -> None:
+        self.active -= 1
+        self._service_seconds = 0.8 * self._service_seconds + 0.2 * (time.monotonic() - ticket.started)
+        self._dispatch()
+
+    def _refill(self) -> None:
+        if not self.tokens_per_minute:
+            return
+        now = time.monotonic()
+        self._budget = min(self.tokens_per_minute, self._budget + (now - self._refilled_at) * self.tokens_per_minute / 60)
+        self._refilled_at = now
+
+    def _estimate_wait(self, kind: str, tokens: int) -> tuple[float, bool]:
+        """Expected seconds until a new ``kind`` call is admitted, and whether the token budget is the bottleneck."""
+        ahead = [
+            waiter
+            for cls in PRIORITY_CLASSES[: PRIORITY_CLASSES.index(kind) + 1]
+            for lane in self._lanes[cls].values()
+            for waiter in lane
+        ]
+        capacity_wait = 0.0
+        if self.active >= self.max_concurrency or ahead:
+            capacity_wait = (len(ahead) // self.max_concurrency + 1) * self._service_seconds
+        budget_wait = 0.0
+        if self.tokens_per_minute:
+            deficit = tokens + sum(waiter.tokens for waiter in ahead) - self._budget
+            budget_wait = max(0.0, deficit) * 60 / self.tokens_per_minute
+        return max(capacity_wait, budget_wait), budget_wait > capacity_wait
+
+    def _dispatch(self) -> None:
+        """Admit queued calls while there is room: highest class first, round-robin between its users."""
+        self._refill()
+        while self.active < self.max_concurrency:
+            lanes = next((self._lanes[kind] for kind in PRIORITY_CLASSES if self._lanes[kind]), None)
+            if lanes is None:
+                return
+            user, lane = next(iter(lanes.items()))
+            waiter = lane[0]
+            if waiter.tokens > self._budget:
+                # Strict priority: hold everything until the budget has refilled for the head call
+                delay = (waiter.tokens - self._budget) * 60 / self.tokens_per_minute
+                if self._timer:
+                    self._timer.cancel()
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            lane.popleft()
+            if lane:
+                lanes.move_to_end(user)
+            else:
+                del lanes[user]
+            if not waiter.future.done():
+                waiter.future.set_result(self._admit(waiter.kind, waiter.tokens, time.monotonic() - waiter.enqueued_at))
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """A waiter gave up (deadline or cancellation): leave the queue, or hand back a slot granted meanwhile."""
+        lane = self._lanes[waiter.kind].get(waiter.user)
+        if lane and waiter in lane:
+            lane.remove(waiter)
+            if not lane:
+                del self._lanes[waiter.kind][waiter.user]
+        elif waiter.future.done() and not waiter.future.cancelled():
+            waiter.future.result().release()
+
+
+# Global instance
+ai_scheduler = AIScheduler.from_settings()
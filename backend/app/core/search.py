@@ -0,0 +1,145 @@
+"""Full-text search over a user's messages: SQLite FTS5 in development, tsvector/GIN on PostgreSQL.
+
+SQLite: ``messages_fts`` holds each message's content plus its owner as a
+single token (``u<hex of user_id>x``), so the per-user filter is part of the
+full-text match instead of a join over every message containing the words.
+Rows are keyed by the messages rowid and kept in step by triggers. VACUUM
+may renumber the rowids of ``messages``; run ``rebuild_search_index`` after it.
+
+PostgreSQL: a generated ``search_vector`` column with a GIN index, as in
+supabase/migrations/005_message_search.sql.
+"""
+import html
+import re
+from typing import List
+
+from sqlalchemy import DateTime, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+SNIPPET_TOKENS = 16
+MAX_TERMS = 16
+_MARK_START, _MARK_END = "\x02", "\x03"  # Placeholders, so message text can be escaped before <mark> goes in
+_OWNER_TOKEN_SQL = "'u' || lower(hex({column})) || 'x'"  # Must match owner_token()
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, owner, tokenize = 'porter unicode61')",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, content, owner)
+        SELECT new.rowid, new.content, {_OWNER_TOKEN_SQL.format(column="user_id")} FROM sessions WHERE id = new.session_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        DELETE FROM messages_fts WHERE rowid = old.rowid;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+        UPDATE messages_fts SET content = new.content WHERE rowid = new.rowid;
+    END
+    """,
+]
+
+SQLITE_BACKFILL = f"""
+    INSERT INTO messages_fts (rowid, content, owner)
+    SELECT m.rowid, m.content, {_OWNER_TOKEN_SQL.format(column="s.user_id")}
+    FROM messages m JOIN sessions s ON s.id = m.session_id
+"""
+
+POSTGRES_DDL = [
+    "ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', content)) STORED",
+    # Same name as supabase/migrations/005, so a database set up either way has one index
+    "DROP INDEX IF EXISTS ix_messages_search",
+    "CREATE INDEX IF NOT EXISTS idx_messages_search ON messages USING gin (search_vector)",
+]
+
+# Best matches first; snippets are only built for the page that is returned
+_SQLITE_SEARCH = text(f"""
+    SELECT m.id AS message_id, m.session_id, s.title AS session_title, m.role, m.timestamp,
+           -hits.rank AS score,
+           snippet(messages_fts, 0, char(2), char(3), '…', {SNIPPET_TOKENS}) AS snippet
+    FROM (
+        SELECT rowid, rank FROM messages_fts WHERE messages_fts MATCH :query
+        ORDER BY rank LIMIT :limit OFFSET :offset
+    ) AS hits
+    JOIN messages_fts ON messages_fts.rowid = hits.rowid AND messages_fts MATCH :query
+    JOIN messages m ON m.rowid = hits.rowid
+    JOIN sessions s ON s.id = m.session_id
+    ORDER BY hits.rank
+""").columns(timestamp=DateTime)
+
+_POSTGRES_SEARCH = text(f"""
+    SELECT hits.message_id, hits.session_id, hits.session_title, hits.role, hits.timestamp, hits.score,
+           ts_headline('english', hits.content, websearch_to_tsquery('english', :query),
+                       'StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords={SNIPPET_TOKENS}, MinWords=5') AS snippet
+    FROM (
+        SELECT m.id AS message_id, m.session_id, s.title AS session_title, m.role, m.timestamp, m.content,
+               ts_rank_cd(m.search_vector, websearch_to_tsquery('english', :query)) AS score
+        FROM messages m JOIN sessions s ON s.id = m.session_id
+        WHERE s.user_id = :user_id AND m.search_vector @@ websearch_to_tsquery('english', :query)
+        ORDER BY score DESC, m.id LIMIT :limit OFFSET :offset
+    ) AS hits
+    ORDER BY hits.score DESC, hits.message_id
+""").columns(timestamp=DateTime)
+
+
+def owner_token(user_id: str) -> str:
+    """The user id as one FTS token: hex keeps it a single word, the trailing x keeps the stemmer off it."""
+    return f"u{user_id.encode().hex()}x"
+
+
+def fts_query(user_id: str, q: str) -> str | None:
+    """
+    FTS5 query for ``q`` within one user's messages: every word must match
+    (``walk*`` matches by prefix). Words are quoted, so FTS5 operators in the
+    input are searched for literally. None if ``q`` has nothing to search for.
+    """
+    terms = []
+    for word in q.split()[:MAX_TERMS]:
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if not re.search(r"\w", word):
+            continue
+        terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    if not terms:
+        return None
+    return f"owner : {owner_token(user_id)} AND content : ({' '.join(terms)})"
+
+
+def highlight(snippet: str) -> str:
+    """Escape the message text, then mark the matched words."""
+    return html.escape(snippet).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def create_search_index(conn) -> None:
+    """Create the index (and fill it from existing messages) if missing. Runs inside init_db."""
+    if conn.dialect.name == "postgresql":
+        for ddl in POSTGRES_DDL:
+            conn.exec_driver_sql(ddl)
+        return
+    exists = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").first()
+    for ddl in SQLITE_DDL:
+        conn.exec_driver_sql(ddl)
+    if not exists:
+        conn.exec_driver_sql(SQLITE_BACKFILL)
+
+
+def rebuild_search_index(conn) -> None:
+    """Refill the SQLite index from ``messages`` (e.g. after VACUUM)."""
+    conn.exec_driver_sql("DELETE FROM messages_fts")
+    conn.exec_driver_sql(SQLITE_BACKFILL)
+
+
+async def search_messages(db: AsyncSession, user_id: str, q: str, limit: int, offset: int = 0) -> List[dict]:
+    """Ranked matches (best first) with highlighted snippets; ``score`` is higher for better matches."""
+    if db.bind.dialect.name == "postgresql":
+        params = {"query": q, "user_id": user_id, "limit": limit, "offset": offset}
+        rows = (await db.execute(_POSTGRES_SEARCH, params)).mappings().all()
+    else:
+        query = fts_query(user_id, q)
+        if query is None:
+            return []
+        rows = (await db.execute(_SQLITE_SEARCH, {"query": query, "limit": limit, "offset": offset})).mappings().all()
+    return [{**row, "snippet": highlight(row["snippet"])} for row in rows]
@@ -0,0 +1,203 @@
+"""Change feed behind /api/sync: triggers that record session and message changes, and the delta query.
+
+Every insert, update and delete on ``sessions`` and ``messages`` appends a
+``sync_changes`` row (a tombstone for deletes), whichever code path made it.
+A client first takes a snapshot plus a cursor (the highest ``seq`` at that
+point); afterwards it asks for the changes after its cursor, so a repeat
+load costs O(changes) instead of O(history).
+
+SQLite has one writer at a time, so ``seq`` order is commit order. On
+PostgreSQL the triggers take a per-user transaction lock before taking a
+``seq``, which gives the same guarantee per user (all a feed needs).
+
+Changes older than SYNC_RETENTION_DAYS are pruned (the newest one is always
+kept). A cursor from before the oldest kept change may have missed some, so
+the client must take a new snapshot.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.db_models import Message as DBMessage, Session as DBSession, SyncChange
+
+_CHANGE = "INSERT INTO sync_changes (user_id, entity, entity_id, session_id, deleted, changed_at)"
+
+SQLITE_DDL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sync_sessions_insert AFTER INSERT ON sessions BEGIN
+        {_CHANGE} VALUES (new.user_id, 'session', new.id, new.id, 0, CURRENT_TIMESTAMP);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sync_sessions_update AFTER UPDATE ON sessions BEGIN
+        {_CHANGE} VALUES (new.user_id, 'session', new.id, new.id, 0, CURRENT_TIMESTAMP);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sync_sessions_delete AFTER DELETE ON sessions BEGIN
+        {_CHANGE} VALUES (old.user_id, 'session', old.id, old.id, 1, CURRENT_TIMESTAMP);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sync_messages_insert AFTER INSERT ON messages BEGIN
+        {_CHANGE} SELECT user_id, 'message', new.id, new.session_id, 0, CURRENT_TIMESTAMP FROM sessions WHERE id = new.session_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sync_messages_update AFTER UPDATE ON messages BEGIN
+        {_CHANGE} SELECT user_id, 'message', new.id, new.session_id, 0, CURRENT_TIMESTAMP FROM sessions WHERE id = new.session_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sync_messages_delete AFTER DELETE ON messages BEGIN
+        {_CHANGE} SELECT user_id, 'message', old.id, old.session_id, 1, CURRENT_TIMESTAMP FROM sessions WHERE id = old.session_id;
+    END
+    """,
+]
+
+POSTGRES_DDL = [
+    f"""
+    CREATE OR REPLACE FUNCTION sync_session_change() RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+        s sessions%ROWTYPE;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN s := OLD; ELSE s := NEW; END IF;
+        PERFORM pg_advisory_xact_lock(hashtext(s.user_id::text));
+        {_CHANGE} VALUES (s.user_id, 'session', s.id, s.id, TG_OP = 'DELETE', now());
+        RETURN NULL;
+    END $$
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION sync_message_change() RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+        m messages%ROWTYPE;
+        owner text;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN m := OLD; ELSE m := NEW; END IF;
+        SELECT user_id INTO owner FROM sessions WHERE id = m.session_id;
+        IF owner IS NOT NULL THEN
+            PERFORM pg_advisory_xact_lock(hashtext(owner));
+            {_CHANGE} VALUES (owner, 'message', m.id, m.session_id, TG_OP = 'DELETE', now());
+        END IF;
+        RETURN NULL;
+    END $$
+    """,
+    "DROP TRIGGER IF EXISTS sync_sessions ON sessions",
+    "CREATE TRIGGER sync_sessions AFTER INSERT OR UPDATE OR DELETE ON sessions "
+    "FOR EACH ROW EXECUTE FUNCTION sync_session_change()",
+    "DROP TRIGGER IF EXISTS sync_messages ON messages",
+    "CREATE TRIGGER sync_messages AFTER INSERT OR UPDATE OR DELETE ON messages "
+    "FOR EACH ROW EXECUTE FUNCTION sync_message_change()",
+]
+
+
+def create_change_feed(conn) -> None:
+    """Install the triggers (idempotent). Runs inside init_db, after the sync_changes table exists."""
+    for ddl in POSTGRES_DDL if conn.dialect.name == "postgresql" else SQLITE_DDL:
+        conn.exec_driver_sql(ddl)
+
+
+async def latest_seq(db: AsyncSession) -> int:
+    return await db.scalar(select(func.coalesce(func.max(SyncChange.seq), 0)))
+
+
+async def oldest_cursor(db: AsyncSession) -> int:
+    """
+    The lowest cursor that still gets every later change. Conservative where
+    seq has gaps (rolled-back PostgreSQL transactions): a few cursors just
+    below it are turned away without having missed anything.
+    """
+    return await db.scalar(select(func.coalesce(func.min(SyncChange.seq), 1))) - 1
+
+
+async def prune_changes(db: AsyncSession, before: datetime) -> int:
+    """Delete changes older than ``before``, except the newest change, so oldest_cursor keeps its meaning."""
+    newest = select(func.max(SyncChange.seq)).scalar_subquery()
+    result = await db.execute(delete(SyncChange).where(SyncChange.changed_at < before, SyncChange.seq < newest))
+    await db.commit()
+    return result.rowcount
+
+
+async def prune_forever(session_factory) -> None:
+    """Background task (started by the app lifespan): prune the feed every SYNC_PRUNE_INTERVAL seconds."""
+    while True:
+        try:
+            async with session_factory() as db:
+                await prune_changes(db, datetime.utcnow() - timedelta(days=settings.sync_retention_days))
+        except Exception as e:
+            print(f"Change feed prune failed: {e}")
+        await asyncio.sleep(settings.sync_prune_interval)
+
+
+async def snapshot(db: AsyncSession, user_id: str) -> tuple[List[DBSession], List[DBMessage]]:
+    sessions = (await db.execute(select(DBSession).where(DBSession.user_id == user_id))).scalars().all()
+    messages = (await db.execute(
+        select(DBMessage).join(DBSession, DBSession.id == DBMessage.session_id).where(DBSession.user_id == user_id)
+    )).scalars().all()
+    return sessions, messages
+
+
+async def changes_since(db: AsyncSession, user_id: str, since: int, limit: int) -> tuple[List[SyncChange], bool]:
+    """
+    The user's next ``limit`` changes after ``since``, oldest first, keeping
+    only the latest change of each session or message. Also returns whether
+    more changes follow.
+    """
+    rows = (await db.execute(
+        select(SyncChange)
+        .where(SyncChange.user_id == user_id, SyncChange.seq > since)
+        .order_by(SyncChange.seq)
+        .limit(limit + 1)
+    )).scalars().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {(row.entity, row.entity_id): row for row in rows}
+    return sorted(latest.values(), key=lambda row: row.seq), has_more
+
+
+async def load_changed(
+    db: AsyncSession, user_id: str, changes: List[SyncChange]
+) -> tuple[List[DBSession], List[DBMessage]]:
+    """Current rows of the changed (not deleted) sessions and messages. A row deleted meanwhile is
+    skipped; its tombstone comes with a later page."""
+    session_ids = [c.entity_id for c in changes if c.entity == "session" and not c.deleted]
+    message_ids = [c.entity_id for c in changes if c.entity == "message" and not c.deleted]
+    sessions: List[DBSession] = []
+    messages: List[DBMessage] = []
+    if session_ids:
+        sessions = (await db.execute(
+            select(DBSession).where(DBSession.id.in_(session_ids), DBSession.user_id == user_id)
+        )).scalars().all()
+    if message_ids:
+        messages = (await db.execute(select(DBMessage).where(DBMessage.id.in_(message_ids)))).scalars().all()
+    return sessions, messages
+
+
+def tombstones(changes: List[SyncChange]) -> tuple[List[str], List[str]]:
+    """Deleted session ids, and deleted message ids outside those sessions (their deletion is implied)."""
+    sessions = [c.entity_id for c in changes if c.entity == "session" and c.deleted]
+    gone = set(sessions)
+    messages = [c.entity_id for c in changes if c.entity == "message" and c.deleted and c.session_id not in gone]
+    return sessions, messages
+
+
+def cursor_seq(changes: List[SyncChange], since: int) -> int:
+    return max((c.seq for c in changes), default=since)
+
+
+__all__ = [
+    "changes_since",
+    "create_change_feed",
+    "cursor_seq",
+    "latest_seq",
+    "load_changed",
+    "oldest_cursor",
+    "prune_changes",
+    "prune_forever",
+    "snapshot",
+    "tombstones",
+]
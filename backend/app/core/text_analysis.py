@@ -0,0 +1,133 @@
+"""Local term statistics for the insights dashboard, computed without the model."""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import combinations
+from typing import Dict, List, Sequence, Tuple
+
+TOKEN_RE = re.compile(r"[a-z][a-z']*[a-z]")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are aren't as at be because been before being
+below between both but by can can't cannot could couldn't did didn't do does doesn't doing don't down
+during each even ever every few for from further get gets getting got had hadn't has hasn't have haven't
+having he he'd he'll he's her here here's hers herself him himself his how how's i i'd i'll i'm i've if
+in into is isn't it it's its itself just let's like lot me more most much mustn't my myself no nor not
+now of off on once only or other ought our ours ourselves out over own really same shan't she she'd
+she'll she's should shouldn't so some still such than that that's the their theirs them themselves then
+there there's these they they'd they'll they're they've thing things think this those through to too
+today under until up very was wasn't way we we'd we'll we're we've well were weren't what what's when
+when's where where's which while who who's whom why why's will with won't would wouldn't yeah yes yet
+you you'd you'll you're you've your yours yourself yourselves feel feeling felt know going want day
+""".split())
+
+
+@dataclass
+class CandidateTheme:
+    key: str  # Seed term, used to match the model's labels back to the theme
+    terms: List[str]
+    entries: List[int] = field(default_factory=list)
+
+    @property
+    def frequency(self) -> int:
+        return len(self.entries)
+
+
+@dataclass
+class EntryAnalysis:
+    related_words: List[Tuple[str, int]]  # (word, size 1-5)
+    term_counts: Dict[str, int]
+    themes: List[CandidateTheme]
+    connections: List[Tuple[str, str, int]]  # (theme key, theme key, strength 1-5)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 2 and t not in STOPWORDS]
+
+
+def _scale(value: float, top: float) -> int:
+    """Map value in (0, top] onto 1-5."""
+    return max(1, min(5, math.ceil(5 * value / top))) if top else 1
+
+
+def analyze_entries(
+    entries: Sequence[Sequence[str]],
+    max_words: int = 15,
+    max_themes: int = 5,
+    merge_overlap: float = 0.8,
+    common_share: float = 0.5,
+    salient_lift: float = 2.0,
+    common_min_entries: int = 10,
+) -> EntryAnalysis:
+    """
+    Term frequencies, TF-IDF ranking and co-occurrence themes for a list of
+    entries (each a list of messages). One pass builds per-entry term counts
+    and a postings list; everything else is set arithmetic on those.
+
+    A term found in more than ``common_share`` of the entries says little
+    about any one of them (with hundreds of entries, everyday words are in
+    nearly all, and would merge into a single theme). For themes such a term
+    only counts in the entries where it stands out: its share of the entry's
+    words is at least ``salient_lift`` times its share overall. Journals
+    under ``common_min_entries`` entries are too small to tell, and keep
+    every posting.
+    """
+    docs = [Counter(tokenize(" ".join(messages))) for messages in entries]
+    totals: Counter = Counter()
+    postings: Dict[str, set] = {}
+    for idx, doc in enumerate(docs):
+        totals.update(doc)
+        for term in doc:
+            postings.setdefault(term, set()).add(idx)
+
+    n = len(docs)
+    corpus_length = sum(totals.values())
+    theme_postings = dict(postings)
+    for term, entry_set in postings.items():
+        if n >= common_min_entries and len(entry_set) > common_share * n:
+            rate = salient_lift * totals[term] / corpus_length
+            theme_postings[term] = {i for i in entry_set if docs[i][term] >= rate * sum(docs[i].values())}
+
+    tfidf: Counter = Counter()
+    for doc in docs:
+        length = sum(doc.values())
+        for term, count in doc.items():
+            tfidf[term] += count / length * (math.log((1 + n) / (1 + len(postings[term]))) + 1)
+
+    top_words = sorted(totals, key=lambda t: (-totals[t], -tfidf[t], t))[:max_words]
+    top_count = totals[top_words[0]] if top_words else 0
+    related_words = [(word, _scale(totals[word], top_count)) for word in top_words]
+
+    # Greedy themes: the strongest recurring TF-IDF terms seed themes; a term
+    # whose entries mostly coincide with an existing theme's is folded into it.
+    min_entries = min(2, n)
+    seeds = [t for t in sorted(tfidf, key=lambda t: (-tfidf[t], t)) if len(theme_postings[t]) >= min_entries]
+    themes: List[CandidateTheme] = []
+    for term in seeds[: max_themes * 6]:
+        entry_set = theme_postings[term]
+        for theme in themes:
+            theme_set = set(theme.entries)
+            if len(entry_set & theme_set) / len(entry_set | theme_set) >= merge_overlap:
+                theme.terms.append(term)
+                theme.entries = sorted(theme_set | entry_set)
+                break
+        else:
+            if len(themes) < max_themes:
+                themes.append(CandidateTheme(key=term, terms=[term], entries=sorted(entry_set)))
+
+    pairs = []
+    for a, b in combinations(themes, 2):
+        set_a, set_b = set(a.entries), set(b.entries)
+        shared = len(set_a & set_b)
+        if shared:
+            pairs.append((a.key, b.key, shared / len(set_a | set_b)))
+    pairs.sort(key=lambda p: -p[2])
+    connections = [(a, b, _scale(overlap, 1.0)) for a, b, overlap in pairs[:max_themes]]
+
+    return EntryAnalysis(
+        related_words=related_words,
+        term_counts={word: totals[word] for word in top_words},
+        themes=themes,
+        connections=connections,
+    )
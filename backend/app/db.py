@@ -1,21 +1,95 @@
 """Database engine and session management."""
+import asyncio
+
+from sqlalchemy import event, text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.search import create_search_index
+from app.core.sync import create_change_feed
 from app.models.db_models import Base
 
+
+def _pool_options(url: str) -> dict:
+    """
+    Pool sizing from settings. SQLAlchemy gives SQLite files no pool by default
+    (a new connection, and aiosqlite thread, per checkout), so they get a queue
+    pool too; in-memory SQLite keeps its single static connection.
+    """
+    if ":memory:" in url:
+        return {}
+    return {
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
 engine = create_async_engine(
     settings.database_url,
     echo=False,
     connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {},
+    **_pool_options(settings.database_url),
 )
 
+instrument_engine(engine)
+
+if engine.dialect.name == "sqlite" and ":memory:" not in settings.database_url:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _sqlite_wal(dbapi_connection, _record):
+        """WAL, so that worker processes can keep reading while one of them writes."""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+def insert_ignore(model):
+    """INSERT ... ON CONFLICT DO NOTHING for the configured dialect (SQLite or PostgreSQL)."""
+    dialect_insert = postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert
+    return dialect_insert(model).on_conflict_do_nothing()
+
+
+def _create_missing_indexes(conn) -> None:
+    """create_all skips existing tables, so add indexes introduced since separately."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
 async def init_db():
-    """Create tables if they don't exist."""
+    """Create tables (and any newer indexes, the full-text search index and the sync change feed) if they don't exist."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
+        await conn.run_sync(create_search_index)
+        await conn.run_sync(create_change_feed)
+
+
+async def warm_pool(connections: int | None = None) -> int:
+    """
+    Open pooled connections before the first requests need them, and build
+    the ORM mapper configuration that the first query would otherwise pay for.
+    """
+    configure_mappers()
+    count = min(settings.db_warm_connections if connections is None else connections, settings.db_pool_size)
+
+    async def open_one():
+        conn = await engine.connect()
+        await conn.execute(text("SELECT 1"))
+        return conn
+
+    conns = await asyncio.gather(*(open_one() for _ in range(count)))
+    for conn in conns:
+        await conn.close()  # Back to the pool, still connected
+    return count
 
 
 async def get_db() -> AsyncSession:
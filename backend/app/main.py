@@ -1,33 +1,58 @@
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
-from slowapi.util import get_remote_address
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from app.api import chat, insights, sessions
-from app.db import init_db
+from app.api import chat, export, insights, search, sessions, sync
+from app.db import async_session, engine, init_db, warm_pool
 from app.core.config import settings
+from app.core.anthropic_service import anthropic_service
+from app.core.metrics import TimedRoute, metrics
+from app.core.scheduler import SchedulerOverloaded
+from app.core.sync import prune_forever
 from app.middleware.body_limit import BodyLimitMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.timing import TimingMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    # Connect to the database and the AI provider now rather than in the first requests
+    await asyncio.gather(warm_pool(), anthropic_service.warm_up())
+    await insights.insight_jobs.start()
+    pruner = asyncio.create_task(prune_forever(async_session))
     yield
+    pruner.cancel()
+    # The server has drained in-flight requests and AI streams by now (serve.py sets the grace period)
+    await insights.insight_jobs.stop(grace=settings.shutdown_grace_seconds)
+    await anthropic_service.aclose()
+    await engine.dispose()
 
 
 app = FastAPI(title="MindSpace Journal API", lifespan=lifespan)
+app.router.route_class = TimedRoute
 
-# Rate limiting (per-IP)
-limiter = Limiter(key_func=get_remote_address, default_limits=[settings.rate_limit])
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-app.add_middleware(SlowAPIMiddleware)
 
-# Middleware: body limit first (reject large payloads), then CORS
-app.add_middleware(BodyLimitMiddleware, max_bytes=settings.max_body_bytes)
+async def _ai_overloaded_handler(request: Request, exc: SchedulerOverloaded):
+    """AI calls shed by the scheduler: 429 (token budget / per-user queue) or 503, with Retry-After."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+app.add_exception_handler(SchedulerOverloaded, _ai_overloaded_handler)
+
+# Middleware (all pure ASGI): body limit first (reject large payloads), then CORS, then compression.
+# Rate limiting is a dependency of the API routers (app/core/rate_limit.py), as it needs the user id.
+app.add_middleware(
+    BodyLimitMiddleware,
+    max_bytes=settings.max_body_bytes,
+    path_limits={"/api/import": settings.max_import_bytes},
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -35,11 +60,23 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if settings.compress_min_bytes:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compress_min_bytes,
+        gzip_level=settings.compress_gzip_level,
+        brotli_quality=settings.compress_brotli_quality,
+    )
+# Outermost, so Server-Timing and /metrics include the time spent in the middleware above
+app.add_middleware(TimingMiddleware)
 
 # Include routers
 app.include_router(chat.router, prefix="/api", tags=["chat"])
 app.include_router(insights.router, prefix="/api", tags=["insights"])
 app.include_router(sessions.router, prefix="/api", tags=["sessions"])
+app.include_router(search.router, prefix="/api", tags=["search"])
+app.include_router(sync.router, prefix="/api", tags=["sync"])
+app.include_router(export.router, prefix="/api", tags=["export"])
 
 
 @app.get("/")
@@ -48,4 +85,17 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    """Liveness, plus the AI provider circuit: "degraded" while fallback replies are being served."""
+    circuit = anthropic_service.breaker.stats()
+    return {"status": "healthy" if circuit["state"] == "closed" else "degraded", "ai_circuit": circuit}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Latency histograms per route, SQL and AI calls, in Prometheus text format."""
+    scheduler = anthropic_service.scheduler.stats()
+    return metrics.render({
+        "ai_scheduler_active": scheduler["active"],
+        "ai_scheduler_queued": sum(scheduler["queued"].values()),
+        "ai_circuit_open": int(anthropic_service.breaker.state != "closed"),
+    })
\ No newline at end of file
@@ -1,25 +1,72 @@
 """Request body size limit middleware to prevent large payload abuse."""
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from fastapi import HTTPException
+from starlette.datastructures import Headers
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 
-class BodyLimitMiddleware(BaseHTTPMiddleware):
-    """Reject requests whose Content-Length exceeds max_bytes."""
+class BodyTooLarge(HTTPException):
+    """Raised from ``receive`` once the body passes the limit; FastAPI turns it into the 413 response."""
 
-    def __init__(self, app, max_bytes: int = 1_000_000):
-        super().__init__(app)
+    def __init__(self):
+        super().__init__(status_code=413, detail="Request body too large")
+
+
+class BodyLimitMiddleware:
+    """
+    Reject request bodies larger than max_bytes. A too-large Content-Length
+    is refused before anything is read. Chunked bodies (or a Content-Length
+    that lies) are counted as they arrive and cut off at the limit, so they
+    are never buffered whole. Pure ASGI: no extra task or stream wrapping.
+    ``path_limits`` sets other limits for exact paths (e.g. a streamed import).
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int = 1_000_000, path_limits: dict[str, int] | None = None):
+        self.app = app
         self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
 
-    async def dispatch(self, request: Request, call_next):
-        content_length = request.headers.get("Content-Length")
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.path_limits.get(scope["path"], self.max_bytes)
+        content_length = Headers(scope=scope).get("content-length")
         if content_length:
             try:
-                if int(content_length) > self.max_bytes:
-                    return JSONResponse(
-                        status_code=413,
-                        content={"detail": "Request body too large"},
-                    )
+                if int(content_length) > max_bytes:
+                    await self._reject(scope, receive, send)
+                    return
             except ValueError:
                 pass  # Invalid Content-Length, let downstream handle
-        return await call_next(request)
+
+        received = 0
+        response_started = False
+
+        async def receive_limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise BodyTooLarge()
+            return message
+
+        async def send_tracked(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive_limited, send_tracked)
+        except BodyTooLarge:
+            # Only reached if the body was read outside FastAPI's exception handling
+            if response_started:
+                raise
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send) -> None:
+        response = JSONResponse(status_code=413, content={"detail": "Request body too large"}, headers={"Connection": "close"})
+        await response(scope, receive, send)
@@ -0,0 +1,101 @@
+"""Response compression (brotli when installed, else gzip) for large JSON and text bodies."""
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install brotli
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html", "text/csv")
+
+
+def _accepted(accept_encoding: str) -> set[str]:
+    """Codings the client accepts (q=0 means refused)."""
+    codings = set()
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.partition(";")
+        name, _, value = params.partition("=")
+        try:
+            if name.strip() == "q" and float(value) == 0:
+                continue
+        except ValueError:
+            continue
+        codings.add(coding.strip())
+    return codings
+
+
+class CompressionMiddleware:
+    """
+    Compress complete response bodies of at least ``minimum_size`` bytes,
+    with brotli if the client accepts it and the package is installed,
+    otherwise gzip. Streamed responses (SSE chat tokens, exports) pass
+    through untouched, as buffering them would hold tokens back. Pure ASGI.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 5, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _coding(self, scope: Scope) -> str | None:
+        accepted = _accepted(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _compress(self, coding: str, body: bytes) -> bytes:
+        if coding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = self._coding(scope)
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message  # Held until the first body part shows whether the body is complete
+                return
+            if start is None:
+                await send(message)
+                return
+            response_start, start = start, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(scope=response_start)
+            if (
+                message.get("more_body")
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(response_start)
+                await send(message)
+                return
+
+            compressed = self._compress(coding, body)
+            headers["Content-Encoding"] = coding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and etag.startswith('"'):
+                # A strong ETag names one exact body; is_not_modified strips the suffix again
+                headers["ETag"] = f'{etag[:-1]}-{coding}"'
+            await send(response_start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
@@ -0,0 +1,49 @@
+"""Per-request timing: Server-Timing header and latency histograms by route."""
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import RequestTiming, current_timing, metrics
+
+
+class TimingMiddleware:
+    """
+    Pure ASGI (no BaseHTTPMiddleware task or body buffering). Add it last so it
+    is outermost and its ``total`` covers the other middleware too.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        status = 500
+        finished = 0.0
+
+        async def send_timed(message: Message) -> None:
+            nonlocal status, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing.responded = time.perf_counter()
+                MutableHeaders(scope=message).append("Server-Timing", timing.server_timing())
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                finished = time.perf_counter()  # Background tasks run after this; they are not the client's wait
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            current_timing.reset(token)
+            route = scope.get("route")
+            metrics.observe_request(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status,
+                (finished or time.perf_counter()) - timing.start,
+            )
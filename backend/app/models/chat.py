@@ -10,10 +10,13 @@ class ChatRequest(BaseModel):
     messages: List[ChatMessage] = Field(..., max_length=50)
     user_id: str = Field(..., max_length=128)
     context_summary: str | None = Field(None, max_length=5000)
+    session_id: str | None = Field(None, max_length=64)  # Use the server's rolling summary of this session
 
 
 class SummarizeRequest(BaseModel):
     messages: List[ChatMessage] = Field(..., max_length=50)
+    previous_summary: str | None = Field(None, max_length=5000)  # Fold the messages into this summary
+    user_id: str | None = Field(None, max_length=128)  # For fair scheduling between users
 
 
 class SummarizeResponse(BaseModel):
@@ -21,4 +24,16 @@ class SummarizeResponse(BaseModel):
 
 class ChatResponse(BaseModel):
     message: str
-    timestamp: datetime
\ No newline at end of file
+    timestamp: datetime
+    degraded: bool = False  # The AI provider was unavailable; this is a fallback reply
+
+
+class SessionChatRequest(BaseModel):
+    message: str = Field(..., min_length=1, max_length=10000)
+    id: str | None = Field(None, max_length=64)  # Client-generated id for the user message
+    context_summary: str | None = Field(None, max_length=5000)
+
+
+class SessionChatResponse(ChatResponse):
+    message_id: str
+    user_message_id: str
\ No newline at end of file
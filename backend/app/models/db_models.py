@@ -1,6 +1,6 @@
 """SQLAlchemy models for journaling schema."""
 from datetime import datetime
-from sqlalchemy import String, Text, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Boolean, String, Text, DateTime, ForeignKey, Index, Integer
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 import uuid
@@ -16,18 +16,30 @@ class Base(DeclarativeBase):
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        # Keyset pagination of a user's sessions by (updated_at, id)
+        Index("ix_sessions_user_updated", "user_id", "updated_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=gen_id)
     user_id: Mapped[str] = mapped_column(String(128), index=True, nullable=False)
     title: Mapped[str] = mapped_column(String(256), default="New Entry")
-    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
-    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+    # Set in Python, like every updated_at written by the API: SQLite's now() keeps whole seconds only, which
+    # compares unequal to the same instant bound from a datetime and would stall the keyset cursor
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, server_default=func.now(), onupdate=datetime.utcnow
+    )
 
     messages: Mapped[list["Message"]] = relationship("Message", back_populates="session", cascade="all, delete-orphan", order_by="Message.timestamp")
 
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Message counts, latest-message previews and paging within a session
+        Index("ix_messages_session_timestamp", "session_id", "timestamp", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=gen_id)
     session_id: Mapped[str] = mapped_column(String(36), ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
@@ -36,3 +48,58 @@ class Message(Base):
     timestamp: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
     session: Mapped["Session"] = relationship("Session", back_populates="messages")
+
+
+class InsightJob(Base):
+    """An /api/insights/jobs request and, once processed, its result."""
+    __tablename__ = "insight_jobs"
+    __table_args__ = (
+        # Workers claim the oldest queued job
+        Index("ix_insight_jobs_status_created", "status", "created_at"),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=gen_id)
+    user_id: Mapped[str] = mapped_column(String(128), nullable=False)  # Owner; jobs are only shown to them
+    status: Mapped[str] = mapped_column(String(16), default="queued")  # 'queued' | 'running' | 'succeeded' | 'failed'
+    progress: Mapped[str] = mapped_column(String(32), default="queued")  # Stage shown to pollers
+    request: Mapped[str] = mapped_column(Text, nullable=False)  # InsightsRequest JSON
+    result: Mapped[str | None] = mapped_column(Text, nullable=True)  # UnifiedInsights JSON
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class ConversationSummary(Base):
+    """Rolling summary of the messages of a session that no longer fit the chat window."""
+    __tablename__ = "conversation_summaries"
+
+    session_id: Mapped[str] = mapped_column(String(36), ForeignKey("sessions.id", ondelete="CASCADE"), primary_key=True)
+    summary: Mapped[str] = mapped_column(Text, nullable=False)
+    # Last folded message, as a (timestamp, id) cursor
+    covered_timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    covered_message_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    message_count: Mapped[int] = mapped_column(Integer, default=0)  # Messages folded so far
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class SyncChange(Base):
+    """
+    Change feed for /api/sync: a row per created, updated or deleted session
+    or message, written by database triggers (app/core/sync.py), so every
+    write path is covered. ``seq`` only grows; clients keep the last one seen.
+    """
+    __tablename__ = "sync_changes"
+    __table_args__ = (
+        # A user's changes after a cursor
+        Index("ix_sync_changes_user_seq", "user_id", "seq"),
+        {"sqlite_autoincrement": True},  # Never reuse a seq, even after pruning the newest rows
+    )
+
+    seq: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    user_id: Mapped[str] = mapped_column(String(128), nullable=False)
+    entity: Mapped[str] = mapped_column(String(16), nullable=False)  # 'session' | 'message'
+    entity_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    session_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    deleted: Mapped[bool] = mapped_column(Boolean, default=False)  # Tombstone
+    changed_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
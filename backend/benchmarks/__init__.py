@@ -0,0 +1 @@
+# Benchmarks package (run with `python -m benchmarks.<name>` from backend/)
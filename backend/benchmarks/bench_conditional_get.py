@@ -0,0 +1,134 @@
+"""Conditional GET (ETag / 304) and compression on session reads.
+
+Fills journals of realistic size (``--sizes`` sessions per user, entries of
+a few sentences each) and times GET /api/sessions and GET /api/sessions/{id}
+three ways: a plain full read (Accept-Encoding: identity, as before), a
+compressed full read, and a poll with If-None-Match when nothing changed
+(304). Reports server latency, bytes on the wire (body plus headers) and
+what that transfer takes on a ``--link-mbps`` connection.
+
+    python -m benchmarks.bench_conditional_get --sizes 10,100,500
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import latency_summary, use_temp_database
+
+SENTENCES = [
+    "Slept badly again and woke up before the alarm.",
+    "The walk along the canal helped more than I expected.",
+    "Work felt heavy today; too many meetings and not enough quiet time.",
+    "Called my sister and we laughed about the holiday disaster.",
+    "I keep putting off the conversation with my manager.",
+    "Grateful for the sun this afternoon and a slow coffee.",
+    "It sounds like the week has asked a lot of you. What helped, even a little?",
+    "Noticing that pattern is a real step. How did your body feel when it happened?",
+]
+
+
+def _entry(rng: random.Random) -> str:
+    return " ".join(rng.choices(SENTENCES, k=rng.randint(2, 6)))
+
+
+async def _fill(user: str, sessions: int, messages: int, rng: random.Random) -> list[str]:
+    from sqlalchemy import insert
+
+    from app.db import engine
+    from app.models.db_models import Message, Session
+
+    ids = [str(uuid.uuid4()) for _ in range(sessions)]
+    start = datetime(2024, 1, 1)
+    async with engine.begin() as conn:
+        await conn.execute(insert(Session), [
+            {"id": sid, "user_id": user, "title": "Entry", "updated_at": start + timedelta(days=i)}
+            for i, sid in enumerate(ids)
+        ])
+        for day, sid in enumerate(ids):
+            await conn.execute(insert(Message), [
+                {
+                    "id": str(uuid.uuid4()),
+                    "session_id": sid,
+                    "role": "user" if i % 2 == 0 else "assistant",
+                    "content": _entry(rng),
+                    "timestamp": start + timedelta(days=day, minutes=i),
+                }
+                for i in range(messages)
+            ])
+    return ids
+
+
+def _wire_bytes(response, raw: bytes) -> int:
+    head = sum(len(k) + len(v) + 4 for k, v in response.headers.raw) + len("HTTP/1.1 200 OK\r\n\r\n")
+    return head + len(raw)
+
+
+async def _measure(client, path: str, params: dict, headers: dict, repeats: int, link_mbps: float) -> dict:
+    samples, size, status = [], 0, 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        async with client.stream("GET", path, params=params, headers=headers) as response:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+        samples.append(time.perf_counter() - started)
+        size, status = _wire_bytes(response, raw), response.status_code
+    return {
+        "status": status,
+        **latency_summary(samples),
+        "wire_bytes": size,
+        "transfer_ms": round(size * 8 / (link_mbps * 1_000_000) * 1000, 2),
+    }
+
+
+async def _compare(client, path: str, params: dict, repeats: int, link_mbps: float) -> dict:
+    first = await client.get(path, params=params, headers={"Accept-Encoding": "gzip"})
+    ways = {
+        "full": {"Accept-Encoding": "identity"},
+        "full_gzip": {"Accept-Encoding": "gzip"},
+        "not_modified": {"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]},
+    }
+    return {name: await _measure(client, path, params, headers, repeats, link_mbps) for name, headers in ways.items()}
+
+
+async def run(args) -> dict:
+    use_temp_database("conditional-get")
+    from httpx import ASGITransport, AsyncClient
+
+    from app.core.rate_limit import rate_limiter
+    from app.db import init_db
+    from app.main import app
+
+    rate_limiter.enabled = False
+    await init_db()
+    rng = random.Random(args.seed)
+    results = {"messages_per_session": args.messages, "link_mbps": args.link_mbps, "journals": []}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", timeout=120) as client:
+        for size in map(int, args.sizes.split(",")):
+            user = f"etag-bench-{size}"
+            ids = await _fill(user, size, args.messages, rng)
+            results["journals"].append({
+                "sessions": size,
+                "list_sessions": await _compare(client, "/api/sessions", {"user_id": user}, args.repeats, args.link_mbps),
+                "get_session": await _compare(
+                    client, f"/api/sessions/{ids[-1]}", {"user_id": user}, args.repeats, args.link_mbps
+                ),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,500", help="Comma-separated sessions per journal")
+    parser.add_argument("--messages", type=int, default=30, help="Messages per session")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--link-mbps", type=float, default=20.0, help="Client bandwidth used for transfer_ms")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Context window building for very long sessions.
+
+Times build_context over sessions of increasing length (cold token cache,
+then warm as on the next turn) and compares the tokens sent with the old
+fixed last-30-messages window.
+
+    python -m benchmarks.bench_context_builder --lengths 100 1000 10000 100000
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+
+def _session(n: int, seed: int = 3) -> list[dict]:
+    rng = random.Random(seed)
+    words = "today work sleep family walk tired grateful anxious plan call friend rain".split()
+    return [
+        {
+            "role": "user" if i % 2 == 0 else "assistant",
+            # Mostly one-liners, with the occasional very long entry
+            "content": f"{i} " + " ".join(rng.choice(words) for _ in range(rng.choice([8, 20, 40, 1500]))),
+        }
+        for i in range(n)
+    ]
+
+
+def run(lengths: list[int], repeats: int) -> list[dict]:
+    from app.core.anthropic_service import MIRA_SYSTEM_PROMPT
+    from app.core.config import settings
+    from app.core.context_builder import build_context, estimate_tokens, message_tokens
+
+    results = []
+    for n in lengths:
+        messages = _session(n)
+        estimate_tokens.cache_clear()
+        start = time.perf_counter()
+        window = build_context(messages, system_prompt=MIRA_SYSTEM_PROMPT)
+        cold = time.perf_counter() - start
+        warm = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            build_context(messages, system_prompt=MIRA_SYSTEM_PROMPT)
+            warm.append(time.perf_counter() - start)
+        fixed = messages[-30:]
+        results.append({
+            "messages": n,
+            "build_ms": {"cold": round(cold * 1000, 3), "warm_median": round(statistics.median(warm) * 1000, 3)},
+            "window_messages": len(window.messages),
+            "window_tokens": window.tokens,
+            "budget": settings.context_token_budget,
+            "fixed_30_tokens": estimate_tokens(MIRA_SYSTEM_PROMPT) + sum(message_tokens(m) for m in fixed),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.lengths, args.repeats), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Streamed NDJSON export / import: throughput and memory as the journal grows.
+
+For each size in ``--sizes`` (messages, in sessions of ``--session-messages``)
+fills one user's journal, then
+- streams GET /api/export to a file,
+- streams a journal file of the same size into POST /api/import (new ids, another user),
+and records MB/s and the peak process RSS above what it was before the
+step. Memory should stay flat as the size grows. For sizes up to
+``--legacy-max`` it also measures GET /api/sessions, the previous way to
+get everything out, which holds the whole journal in memory. Legacy runs
+come last, as RSS rarely shrinks after a peak.
+
+    python -m benchmarks.bench_export_import --sizes 10000,100000,1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import use_temp_database
+
+WORDS = "today felt long but the walk helped and I noticed how tired I was after work again".split()
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+class PeakRss:
+    """Peak RSS above the starting point, sampled while the block runs."""
+
+    async def __aenter__(self):
+        self.start = self.peak = _rss_mb()
+        self._task = asyncio.create_task(self._sample())
+        return self
+
+    async def _sample(self):
+        while True:
+            self.peak = max(self.peak, _rss_mb())
+            await asyncio.sleep(0.005)
+
+    async def __aexit__(self, *exc):
+        self._task.cancel()
+        self.peak = max(self.peak, _rss_mb())
+        self.growth_mb = round(self.peak - self.start, 1)
+
+
+def _content(rng: random.Random) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(20, 60)))
+
+
+async def _fill(user: str, messages: int, per_session: int, rng: random.Random) -> None:
+    from sqlalchemy import insert
+
+    from app.db import engine
+    from app.models.db_models import Message, Session
+
+    start = datetime(2024, 1, 1)
+    async with engine.begin() as conn:
+        for first in range(0, messages, 20 * per_session):
+            sessions, rows = [], []
+            for s in range(first, min(messages, first + 20 * per_session), per_session):
+                sid = str(uuid.uuid4())
+                sessions.append({"id": sid, "user_id": user, "title": "Entry", "updated_at": start + timedelta(minutes=s)})
+                rows += [
+                    {"id": str(uuid.uuid4()), "session_id": sid, "role": "user" if i % 2 == 0 else "assistant",
+                     "content": _content(rng), "timestamp": start + timedelta(minutes=s + i)}
+                    for i in range(min(per_session, messages - s))
+                ]
+            await conn.execute(insert(Session), sessions)
+            await conn.execute(insert(Message), rows)
+
+
+def _write_import_file(path: str, messages: int, per_session: int, rng: random.Random) -> int:
+    start = datetime(2024, 1, 1)
+    with open(path, "w") as f:
+        for s in range(0, messages, per_session):
+            sid = str(uuid.uuid4())
+            f.write(json.dumps({"type": "session", "id": sid, "title": "Entry"}) + "\n")
+            for i in range(min(per_session, messages - s)):
+                f.write(json.dumps({
+                    "type": "message", "id": str(uuid.uuid4()), "session_id": sid, "role": "user",
+                    "content": _content(rng), "timestamp": (start + timedelta(minutes=s + i)).isoformat(),
+                }) + "\n")
+    return os.path.getsize(path)
+
+
+async def _get_to_file(app, path: str, user_id: str, out_path: str) -> int:
+    """GET straight through the ASGI app, writing each body chunk to disk as it comes
+    (httpx's ASGITransport would hold the whole response in memory)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": f"user_id={user_id}".encode(), "root_path": "",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    status = 0
+
+    async def receive():
+        await asyncio.Event().wait()  # No body; wait (as a server would) until cancelled
+
+    with open(out_path, "wb") as out:
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                out.write(message.get("body", b""))
+
+        await app(scope, receive, send)
+    if status != 200:
+        raise RuntimeError(f"GET {path}: {status}")
+    return os.path.getsize(out_path)
+
+
+async def _file_chunks(path: str, size: int = 65536):
+    with open(path, "rb") as f:
+        while chunk := f.read(size):
+            yield chunk
+
+
+async def run(args) -> dict:
+    use_temp_database("export-import")
+    from httpx import ASGITransport, AsyncClient
+
+    from app.core.rate_limit import rate_limiter
+    from app.db import init_db
+    from app.main import app
+
+    rate_limiter.enabled = False
+    await init_db()
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix="mindspace-export-")
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = {"session_messages": args.session_messages, "runs": []}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", timeout=3600) as client:
+        for size in sizes:
+            user = f"export-bench-{size}"
+            await _fill(user, size, args.session_messages, rng)
+            run = {"messages": size}
+
+            path = os.path.join(directory, f"export-{size}.ndjson")
+            async with PeakRss() as rss:
+                started = time.perf_counter()
+                exported = await _get_to_file(app, "/api/export", user, path)
+                elapsed = time.perf_counter() - started
+            run["export"] = {
+                "mb": round(exported / 2**20, 1), "seconds": round(elapsed, 2),
+                "mb_per_s": round(exported / 2**20 / elapsed, 1), "rss_growth_mb": rss.growth_mb,
+            }
+            os.remove(path)
+
+            path = os.path.join(directory, f"import-{size}.ndjson")
+            uploaded = _write_import_file(path, size, args.session_messages, rng)
+            async with PeakRss() as rss:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/api/import", params={"user_id": f"import-bench-{size}"}, content=_file_chunks(path),
+                    headers={"Content-Type": "application/x-ndjson"},
+                )
+                response.raise_for_status()
+                elapsed = time.perf_counter() - started
+            run["import"] = {
+                "mb": round(uploaded / 2**20, 1), "seconds": round(elapsed, 2),
+                "mb_per_s": round(uploaded / 2**20 / elapsed, 1), "rows_per_s": round(size / elapsed),
+                "rss_growth_mb": rss.growth_mb, "result": response.json(),
+            }
+            os.remove(path)
+            results["runs"].append(run)
+
+        for run in results["runs"]:
+            if run["messages"] > args.legacy_max:
+                continue
+            path = os.path.join(directory, "list-sessions.json")
+            async with PeakRss() as rss:
+                started = time.perf_counter()
+                listed = await _get_to_file(app, "/api/sessions", f"export-bench-{run['messages']}", path)
+                elapsed = time.perf_counter() - started
+            run["legacy_list_sessions"] = {
+                "mb": round(listed / 2**20, 1), "seconds": round(elapsed, 2), "rss_growth_mb": rss.growth_mb,
+            }
+            os.remove(path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated message counts")
+    parser.add_argument("--session-messages", type=int, default=40)
+    parser.add_argument("--legacy-max", type=int, default=1_000_000, help="Largest size also read with GET /api/sessions")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
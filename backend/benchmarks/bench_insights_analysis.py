@@ -0,0 +1,81 @@
+"""Local insights pre-analysis at 500 entries, and the prompt size it saves.
+
+    python -m benchmarks.bench_insights_analysis --entries 500 --messages 20
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from benchmarks.common import use_temp_database
+
+VOCAB = (
+    "work deadline boss meeting stress tired sleep insomnia coffee morning run walk park calm anxious "
+    "mom dad sister friend dinner call lonely grateful journal therapy breathe weekend trip beach rain "
+    "project promotion money rent budget gym yoga meditation book music guitar garden cooking"
+).split()
+FILLER = "i felt like the and it was so really today because".split()
+LEGACY_TEMPLATE_CHARS = 1759  # Fixed instructions of the prompt before pre-analysis
+LEGACY_MAX_TOKENS = 2000
+
+
+def _entries(count: int, messages: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    entries = []
+    for i in range(count):
+        focus = rng.sample(VOCAB, 4)
+        sample = [
+            " ".join(rng.choice(focus if rng.random() < 0.5 else VOCAB + FILLER) for _ in range(rng.randint(6, 18)))
+            for _ in range(messages)
+        ]
+        entries.append({"date": f"2024-{1 + i // 28 % 12:02d}-{1 + i % 28:02d}", "message_count": messages, "sample_messages": sample})
+    return entries
+
+
+def _legacy_prompt_chars(request) -> int:
+    recent = request.entries[-15:]
+    summary = "\n\n".join(
+        f"Entry {i+1} ({e.date}, {e.message_count} messages):\n  " + "\n  ".join(f'- "{m}"' for m in e.sample_messages[:5])
+        for i, e in enumerate(recent)
+    )
+    full_text = " ".join(m for e in recent for m in e.sample_messages)
+    return LEGACY_TEMPLATE_CHARS + len(summary) + min(len(full_text), 2500)
+
+
+def run(entries: int, messages: int, repeats: int) -> dict:
+    use_temp_database("insights_analysis")
+    from app.api.insights import NARRATIVE_MAX_TOKENS, InsightsRequest, _build_prompt
+    from app.core.text_analysis import analyze_entries
+
+    request = InsightsRequest(entries=_entries(entries, messages), total_days_active=entries, total_messages=entries * messages)
+    texts = [entry.sample_messages for entry in request.entries]
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        analysis = analyze_entries(texts)
+        timings.append(time.perf_counter() - start)
+    prompt = _build_prompt(request, analysis)
+    legacy_chars = _legacy_prompt_chars(request)
+    return {
+        "entries": entries,
+        "messages_per_entry": messages,
+        "analysis_ms": {"median": round(statistics.median(timings) * 1000, 2), "max": round(max(timings) * 1000, 2)},
+        "themes": [theme.key for theme in analysis.themes],
+        "prompt_chars": {"legacy": legacy_chars, "pre_analysed": len(prompt)},
+        "approx_input_tokens": {"legacy": legacy_chars // 4, "pre_analysed": len(prompt) // 4},
+        "max_tokens": {"legacy": LEGACY_MAX_TOKENS, "pre_analysed": NARRATIVE_MAX_TOKENS},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.entries, args.messages, args.repeats), indent=2))
+
+
+if __name__ == "__main__":
+    main()
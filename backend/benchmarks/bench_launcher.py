@@ -0,0 +1,138 @@
+"""start.py (development: auto-reload, one process) vs. serve.py (production launcher).
+
+Starts each launcher as its own process on a fresh SQLite database with the
+mock AI, then measures the time until /health answers, the first session
+read (cold connections vs. warmed ones), a mixed load from
+benchmarks.loadtest against the running server, and SIGTERM while chat
+streams are in flight: how many finish and how long the exit takes.
+
+    python -m benchmarks.bench_launcher --concurrency 32 --duration 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import free_port
+from benchmarks.loadtest import run as run_load
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOAD_MIX = "chat=25,chat_stream=15,session_chat=5,list=25,get=25,save=5"
+
+
+def _start(script: str, port: int, directory: str, args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "PORT": str(port),
+        "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(directory, 'launcher.db')}",
+        "ANTHROPIC_API_KEY": "mock-key",  # Summaries use the local fallback, nothing leaves the machine
+        "USE_MOCK_AI": "true",
+        "MOCK_LATENCY_MS": str(args.latency_ms),
+        "MOCK_LATENCY_DISTRIBUTION": "lognormal",
+        "MOCK_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "RATE_LIMIT": "1000000/second",
+        "RATE_LIMIT_IP": "1000000/second",  # All load comes from 127.0.0.1
+        "RATE_LIMIT_SQLITE_PATH": os.path.join(directory, "rate-limit.db"),
+    }
+    log = open(os.path.join(directory, f"{script}.log"), "w")
+    return subprocess.Popen([sys.executable, script], cwd=BACKEND, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def _wait_ready(client, timeout: float = 60.0) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return time.perf_counter() - started
+        except Exception:
+            pass
+        await asyncio.sleep(0.02)
+    raise RuntimeError("server did not become ready")
+
+
+async def _stream_done(client) -> bool:
+    payload = {"messages": [{"role": "user", "content": "Long day, but a good walk."}], "user_id": "bench-drain"}
+    try:
+        async with client.stream("POST", "/api/chat/stream", json=payload) as response:
+            body = "".join([chunk async for chunk in response.aiter_text()])
+        return "event: done" in body
+    except Exception:
+        return False
+
+
+async def _drain(client, proc: subprocess.Popen, streams: int) -> dict:
+    """SIGTERM with ``streams`` chat streams in flight."""
+    pending = [asyncio.create_task(_stream_done(client)) for _ in range(streams)]
+    await asyncio.sleep(0.3)
+    started = time.perf_counter()
+    proc.send_signal(signal.SIGTERM)
+    completed = await asyncio.gather(*pending)
+    await asyncio.to_thread(proc.wait, 60)
+    return {"streams": streams, "completed": sum(completed), "exit_s": round(time.perf_counter() - started, 2)}
+
+
+async def _measure(script: str, args) -> dict:
+    from httpx import AsyncClient
+
+    directory = tempfile.mkdtemp(prefix="mindspace-launcher-")
+    port = free_port()
+    launched = time.perf_counter()
+    proc = _start(script, port, directory, args)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        async with AsyncClient(base_url=url, timeout=60) as client:
+            await _wait_ready(client)
+            ready = time.perf_counter() - launched
+            started = time.perf_counter()
+            (await client.get("/api/sessions/summaries", params={"user_id": "bench-first"})).raise_for_status()
+            first_request = time.perf_counter() - started
+
+            load = await run_load(argparse.Namespace(
+                url=url, serve=False, mix=LOAD_MIX, concurrency=args.concurrency, duration=args.duration,
+                latency_ms=args.latency_ms, distribution="lognormal", sigma=0.5,
+                tokens_per_second=args.tokens_per_second, users=20, sessions=3, messages=40, seed=1,
+            ))
+            drain = await _drain(client, proc, args.streams)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+    return {
+        "ready_s": round(ready, 2),
+        "first_request_ms": round(first_request * 1000, 1),
+        "load": {
+            "rps": load["rps"],
+            "errors": load["errors"],
+            "latency": load["latency"],
+            "list_p99_ms": load["operations"]["list"]["p99_ms"],
+            "chat_stream_ttft_p99_ms": load["operations"]["chat_stream"]["ttft"]["p99_ms"],
+        },
+        "shutdown": drain,
+    }
+
+
+async def run(args) -> dict:
+    results = {"config": {"cpus": os.cpu_count(), "concurrency": args.concurrency, "duration_s": args.duration}}
+    for script in ("start.py", "serve.py"):
+        results[script] = await _measure(script, args)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="Median mock model latency")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Pace of streamed mock tokens")
+    parser.add_argument("--streams", type=int, default=8, help="Chat streams in flight at SIGTERM")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
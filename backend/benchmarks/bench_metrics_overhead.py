@@ -0,0 +1,108 @@
+"""Cost of the timing instrumentation per request and per SQL statement.
+
+Calls a minimal FastAPI app directly over ASGI (no HTTP client in the way)
+with and without TimingMiddleware + TimedRoute, and runs SELECT 1 on an
+in-memory SQLite engine with and without the cursor event hooks. Reports
+the added microseconds next to a real /api/sessions/summaries request.
+
+    python -m benchmarks.bench_metrics_overhead --requests 20000 --queries 5000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from benchmarks.common import asgi_call, per_call_us, use_temp_database
+
+
+def _minimal_app(instrumented: bool):
+    from fastapi import APIRouter, FastAPI
+    from fastapi.routing import APIRoute
+
+    from app.core.metrics import TimedRoute
+    from app.middleware.timing import TimingMiddleware
+
+    app = FastAPI()
+    router = APIRouter(route_class=TimedRoute if instrumented else APIRoute)
+
+    @router.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id, "title": "Entry"}
+
+    app.include_router(router)
+    if instrumented:
+        app.add_middleware(TimingMiddleware)
+    return app
+
+
+async def _requests(n: int) -> dict:
+    plain, timed = _minimal_app(False), _minimal_app(True)
+    base = await per_call_us(lambda: asgi_call(plain, "GET", "/items/7"), n)
+    instrumented = await per_call_us(lambda: asgi_call(timed, "GET", "/items/7"), n)
+    return {"plain_us": round(base, 2), "instrumented_us": round(instrumented, 2), "overhead_us": round(instrumented - base, 2)}
+
+
+async def _queries(n: int) -> dict:
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.core.metrics import instrument_engine
+
+    results = {}
+    for label, instrumented in (("plain_us", False), ("instrumented_us", True)):
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        if instrumented:
+            instrument_engine(engine)
+        async with engine.connect() as conn:
+            results[label] = round(await per_call_us(lambda: conn.execute(text("SELECT 1")), n), 2)
+        await engine.dispose()
+    results["overhead_us"] = round(results["instrumented_us"] - results["plain_us"], 2)
+    return results
+
+
+async def _real_request(n: int) -> dict:
+    """Median latency of a real, fully instrumented endpoint, for scale."""
+    from httpx import ASGITransport, AsyncClient
+
+    from app.core.rate_limit import rate_limiter
+    from app.db import init_db
+    from app.main import app
+
+    await init_db()
+    samples = []
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        rate_limiter.enabled = False
+        await client.post("/api/sessions", json={"user_id": "bench-metrics", "title": "Bench"})
+        for _ in range(n):
+            start = time.perf_counter()
+            (await client.get("/api/sessions/summaries", params={"user_id": "bench-metrics"})).raise_for_status()
+            samples.append(time.perf_counter() - start)
+    return {"sessions_summaries_median_us": round(statistics.median(samples) * 1e6, 1)}
+
+
+async def run(requests: int, queries: int) -> dict:
+    use_temp_database("metrics_overhead")
+    request_cost = await _requests(requests)
+    query_cost = await _queries(queries)
+    real = await _real_request(500)
+    # A summaries request runs one SQL statement
+    added = request_cost["overhead_us"] + query_cost["overhead_us"]
+    return {
+        "request": request_cost,
+        "sql_statement": query_cost,
+        **real,
+        "overhead_pct_of_summaries_request": round(added / real["sessions_summaries_median_us"] * 100, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=5000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests, args.queries)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
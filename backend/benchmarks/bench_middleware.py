@@ -0,0 +1,93 @@
+"""Per-request cost of the middleware stack: BaseHTTPMiddleware vs. pure ASGI body limit.
+
+Calls a minimal FastAPI app directly over ASGI with a small JSON POST, bare
+and behind each body-limit implementation, alone and in the app's
+middleware stack (body limit, CORS). The previous BaseHTTPMiddleware version
+is reproduced here for comparison.
+
+    python -m benchmarks.bench_middleware --requests 20000
+"""
+import argparse
+import asyncio
+import json
+
+from benchmarks.common import asgi_call, per_call_us
+
+BODY = json.dumps({"user_id": "bench", "title": "Entry"}).encode()
+HEADERS = [(b"content-type", b"application/json"), (b"content-length", str(len(BODY)).encode())]
+
+
+def _legacy_body_limit():
+    from starlette.middleware.base import BaseHTTPMiddleware
+    from starlette.responses import JSONResponse
+
+    class LegacyBodyLimitMiddleware(BaseHTTPMiddleware):
+        """The Content-Length-only BaseHTTPMiddleware this replaced."""
+
+        def __init__(self, app, max_bytes: int = 1_000_000):
+            super().__init__(app)
+            self.max_bytes = max_bytes
+
+        async def dispatch(self, request, call_next):
+            content_length = request.headers.get("Content-Length")
+            if content_length and int(content_length) > self.max_bytes:
+                return JSONResponse(status_code=413, content={"detail": "Request body too large"})
+            return await call_next(request)
+
+    return LegacyBodyLimitMiddleware
+
+
+def _app(body_limit=None, full_stack: bool = False):
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from pydantic import BaseModel
+
+    class Item(BaseModel):
+        user_id: str
+        title: str
+
+    app = FastAPI()
+
+    @app.post("/items")
+    async def create(item: Item):
+        return item
+
+    if body_limit:
+        app.add_middleware(body_limit, max_bytes=1_000_000)
+    if full_stack:
+        app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    return app
+
+
+async def run(n: int) -> dict:
+    from app.middleware.body_limit import BodyLimitMiddleware
+
+    legacy = _legacy_body_limit()
+    variants = {
+        "bare": _app(),
+        "body_limit_base_http": _app(legacy),
+        "body_limit_pure_asgi": _app(BodyLimitMiddleware),
+        "stack_base_http": _app(legacy, full_stack=True),
+        "stack_pure_asgi": _app(BodyLimitMiddleware, full_stack=True),
+    }
+    timings = {}
+    for name, app in variants.items():
+        assert await asgi_call(app, "POST", "/items", BODY, HEADERS) == 200
+        timings[name] = await per_call_us(lambda app=app: asgi_call(app, "POST", "/items", BODY, HEADERS), n)
+    bare = timings["bare"]
+    return {
+        "requests_per_variant": n,
+        "us_per_request": {name: round(us, 2) for name, us in timings.items()},
+        "overhead_us": {name: round(us - bare, 2) for name, us in timings.items() if name != "bare"},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Large /api/migrate imports: set-based pipeline vs. the old per-session loop.
+
+Calls the endpoint function directly (the HTTP body limit would reject
+payloads this large) and reports wall time and statements executed for each
+pipeline; ``--memory`` adds peak traced allocations (and slows both down).
+
+    python -m benchmarks.bench_migrate --sizes 100x100 500x500
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+import uuid
+
+from benchmarks.common import legacy_parse_timestamp, use_temp_database
+
+
+def _payload(user_id: str, sessions: int, messages: int):
+    from app.api.sessions import MigrateRequest
+
+    return MigrateRequest(
+        user_id=user_id,
+        sessions=[
+            {
+                "id": str(uuid.uuid4()),
+                "title": f"Imported {s}",
+                "messages": [
+                    {"id": str(uuid.uuid4()), "role": "user" if m % 2 == 0 else "assistant",
+                     "content": f"Line {m} of entry {s}", "timestamp": "2024-01-15T12:00:00Z"}
+                    for m in range(messages)
+                ],
+            }
+            for s in range(sessions)
+        ],
+    )
+
+
+async def legacy_migrate(req, db):
+    """The previous migrate body: one SELECT per session, one ORM object per message."""
+    from sqlalchemy import select
+    from app.models.db_models import Message as DBMessage, Session as DBSession, gen_id
+
+    for item in req.sessions:
+        result = await db.execute(select(DBSession).where(DBSession.id == item.id, DBSession.user_id == req.user_id))
+        if result.scalar_one_or_none():
+            continue
+        db.add(DBSession(id=item.id, user_id=req.user_id, title=item.title or "New Entry"))
+        for msg in item.messages:
+            db.add(DBMessage(id=msg.id or gen_id(), session_id=item.id, role=msg.role,
+                             content=msg.content, timestamp=legacy_parse_timestamp(msg.timestamp)))
+    await db.commit()
+
+
+async def run(sizes: list[tuple[int, int]], include_legacy: bool, trace_memory: bool) -> list[dict]:
+    use_temp_database("migrate")
+    from sqlalchemy import event
+
+    from app.api.sessions import migrate_sessions
+    from app.db import async_session, engine, init_db
+
+    await init_db()
+    statements = {"count": 0}
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count(*args):
+        statements["count"] += 1
+
+    async def measure(fn, req) -> dict:
+        statements["count"] = 0
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        async with async_session() as db:
+            await fn(req, db)
+        elapsed = time.perf_counter() - start
+        rows = len(req.sessions) * (1 + len(req.sessions[0].messages))
+        stats = {"seconds": round(elapsed, 3), "statements": statements["count"], "rows_per_s": round(rows / elapsed)}
+        if trace_memory:
+            stats["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            tracemalloc.stop()
+        return stats
+
+    results = []
+    for sessions, messages in sizes:
+        row = {"sessions": sessions, "messages_per_session": messages}
+        row["bulk"] = await measure(migrate_sessions, _payload("bench-bulk", sessions, messages))
+        if include_legacy:
+            row["legacy"] = await measure(legacy_migrate, _payload("bench-legacy", sessions, messages))
+        results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["100x100", "500x500"], help="SESSIONSxMESSAGES")
+    parser.add_argument("--no-legacy", action="store_true", help="skip the old per-session pipeline")
+    parser.add_argument("--memory", action="store_true", help="trace peak Python allocations")
+    args = parser.parse_args()
+    sizes = [tuple(int(n) for n in size.split("x")) for size in args.sizes]
+    print(json.dumps(asyncio.run(run(sizes, not args.no_legacy, args.memory)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
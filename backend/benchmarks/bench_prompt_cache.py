@@ -0,0 +1,60 @@
+"""Time to first token of a long conversation with prompt caching on and off.
+
+Drives stream_chat through a multi-turn conversation against the stub model
+server, whose prefill time grows with the input tokens not read from cache.
+
+    python -m benchmarks.bench_prompt_cache --turns 30 --prefill-ms-per-1k 40
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import latency_summary, use_temp_database
+
+
+async def _conversation(cache: bool, turns: int, prefill: float) -> dict:
+    from app.core.context_builder import build_context
+    from tests.stub_model_server import create_stub_app, stub_service
+
+    stub = create_stub_app(reply="That sounds like a lot to carry. What helped you get through it? " * 3)
+    stub.state.prefill_seconds_per_1k_tokens = prefill
+    service = stub_service(stub)
+    history: list[dict] = []
+    ttft = []
+    try:
+        for turn in range(turns):
+            history.append({"role": "user", "content": f"Turn {turn}: " + "today I kept thinking about work and home " * 12})
+            window = build_context(history).messages
+            started = time.perf_counter()
+            parts = []
+            async for token in service.stream_chat(window, cache=cache):
+                if not parts:
+                    ttft.append(time.perf_counter() - started)
+                parts.append(token)
+            history.append({"role": "assistant", "content": "".join(parts)})
+    finally:
+        await service.aclose()
+    return {"ttft": latency_summary(ttft), "tokens": service.usage.stats()["tokens"]["chat_stream"]}
+
+
+async def run(turns: int, prefill: float) -> dict:
+    use_temp_database("prompt_cache")
+    return {
+        "turns": turns,
+        "prefill_ms_per_1k_uncached_tokens": prefill * 1000,
+        "cache_off": await _conversation(False, turns, prefill),
+        "cache_on": await _conversation(True, turns, prefill),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=40.0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.turns, args.prefill_ms_per_1k / 1000)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Cost of a rate-limit check, per store, alone and with workers contending.
+
+Times RateLimiter.check against the memory and SQLite stores in one process,
+then runs several worker processes hammering one shared SQLite file (as
+uvicorn workers would) and reports per-check latency and how many checks
+failed open on a busy lock, and finally the time a real request takes with
+the limiter off and on. Run no more workers than cores: a worker preempted
+while holding the write lock stalls the others up to the busy timeout.
+
+    python -m benchmarks.bench_rate_limit --checks 20000 --workers 2
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.common import asgi_call, latency_summary, per_call_us, use_temp_database
+
+
+async def _timed_checks(limiter, n: int, users: int = 100) -> list[float]:
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        await limiter.check(f"user:{i % users}", 1)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _worker(path: str, n: int, queue) -> None:
+    from app.core.rate_limit import RateLimiter, SQLiteStore
+
+    limiter = RateLimiter(SQLiteStore(path), "1000000/second")
+    queue.put((asyncio.run(_timed_checks(limiter, n)), limiter.store_errors))
+
+
+def _contended(path: str, workers: int, n: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(path, n, queue)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    samples, failed_open = [], 0
+    for _ in procs:
+        worker_samples, errors = queue.get()
+        samples += worker_samples
+        failed_open += errors
+    for proc in procs:
+        proc.join()
+    return {**latency_summary(samples), "failed_open": failed_open}
+
+
+async def _request_us(n: int, directory: str) -> dict:
+    """Mean time of GET /api/sessions/summaries over ASGI with the limiter off and on."""
+    from app.core.rate_limit import MemoryStore, SQLiteStore, rate_limiter
+    from app.db import init_db
+    from app.main import app
+
+    await init_db()
+
+    async def get():
+        assert await asgi_call(app, "GET", "/api/sessions/summaries", query_string=b"user_id=bench-rl") == 200
+
+    rate_limiter.capacity = rate_limiter.refill = rate_limiter.ip_capacity = rate_limiter.ip_refill = 1e12
+    rate_limiter.enabled = False
+    results = {"off": await per_call_us(get, n)}
+    rate_limiter.enabled = True
+    for name, store in (("memory", MemoryStore()), ("sqlite", SQLiteStore(os.path.join(directory, "app.db")))):
+        rate_limiter.store = store
+        results[name] = await per_call_us(get, n)
+    return {f"{name}_us": round(us, 1) for name, us in results.items()}
+
+
+async def _single_process(n: int, directory: str) -> dict:
+    from app.core.rate_limit import MemoryStore, RateLimiter, SQLiteStore
+
+    return {
+        "memory": latency_summary(await _timed_checks(RateLimiter(MemoryStore(), "1000000/second"), n)),
+        "sqlite": latency_summary(await _timed_checks(RateLimiter(SQLiteStore(os.path.join(directory, "one.db")), "1000000/second"), n)),
+    }
+
+
+def run(checks: int, workers: int, requests: int) -> dict:
+    use_temp_database("rate_limit")
+    directory = tempfile.mkdtemp(prefix="mindspace-rate-limit-")
+    return {
+        "check_single_process": asyncio.run(_single_process(checks, directory)),
+        f"check_sqlite_{workers}_workers": _contended(os.path.join(directory, "shared.db"), workers, checks),
+        "request_summaries": asyncio.run(_request_us(requests, directory)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checks", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.checks, args.workers, args.requests), indent=2))
+
+
+if __name__ == "__main__":
+    main()
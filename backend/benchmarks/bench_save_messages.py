@@ -0,0 +1,94 @@
+"""Write amplification of saving one new line, as a function of session length.
+
+Compares the old delete-all-and-reinsert save, the diff-aware PUT and the
+append endpoint. "rows_written" counts rows touched by INSERT/UPDATE/DELETE.
+
+    python -m benchmarks.bench_save_messages --lengths 50 100 200 400
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from benchmarks.common import legacy_parse_timestamp, use_temp_database
+
+
+def _messages(n: int) -> list[dict]:
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"Journal line {i} " + "words " * 20,
+            "timestamp": f"2024-01-15T{10 + i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z",
+        }
+        for i in range(n)
+    ]
+
+
+async def run(lengths: list[int]) -> list[dict]:
+    use_temp_database("save_messages")
+    from httpx import ASGITransport, AsyncClient
+    from sqlalchemy import delete, event, select
+
+    from app.main import app
+    from app.db import async_session, engine, init_db
+    from app.models.db_models import Message as DBMessage, Session as DBSession
+
+    await init_db()
+    counter = {"rows": 0, "statements": 0}
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _count(conn, cursor, statement, params, context, executemany):
+        if statement.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE")):
+            counter["rows"] += max(cursor.rowcount, 0)
+            counter["statements"] += 1
+
+    async def legacy_save(session_id: str, messages: list[dict]):
+        """The previous save_messages body: delete everything, re-add row by row."""
+        async with async_session() as db:
+            await db.execute(select(DBSession).where(DBSession.id == session_id))
+            await db.execute(delete(DBMessage).where(DBMessage.session_id == session_id))
+            for msg in messages:
+                db.add(DBMessage(id=msg["id"], session_id=session_id, role=msg["role"],
+                                 content=msg["content"], timestamp=legacy_parse_timestamp(msg["timestamp"])))
+            await db.commit()
+
+    async def measure(fn) -> dict:
+        counter.update(rows=0, statements=0)
+        start = time.perf_counter()
+        await fn()
+        return {"rows_written": counter["rows"], "write_statements": counter["statements"],
+                "ms": round((time.perf_counter() - start) * 1000, 2)}
+
+    results = []
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        for n in lengths:
+            row = {"session_length": n}
+            for mode in ("legacy_replace", "diff_put", "append"):
+                sid = (await client.post("/api/sessions", json={"user_id": "bench"})).json()["id"]
+                history = _messages(n)
+                await client.put(f"/api/sessions/{sid}/messages?user_id=bench", json={"messages": history})
+                new_line = _messages(1)[0] | {"timestamp": "2024-01-16T00:00:00Z"}
+                if mode == "legacy_replace":
+                    row[mode] = await measure(lambda: legacy_save(sid, history + [new_line]))
+                elif mode == "diff_put":
+                    row[mode] = await measure(lambda: client.put(
+                        f"/api/sessions/{sid}/messages?user_id=bench&delta=true",
+                        json={"messages": history + [new_line]}))
+                else:
+                    row[mode] = await measure(lambda: client.post(
+                        f"/api/sessions/{sid}/messages:append?user_id=bench", json={"messages": [new_line]}))
+            results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[50, 100, 200, 400])
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.lengths)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
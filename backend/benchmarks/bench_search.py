@@ -0,0 +1,168 @@
+"""Full-text search latency over a large message table.
+
+Fills a fresh SQLite database through the real insert path (the triggers keep
+the FTS index in step) with ``--messages`` messages spread over ``--users``
+users, plus one heavy user, with a Zipf-like word distribution. Then times
+GET /api/search for common, rare, two-word and prefix queries, and compares
+with the old way of searching: GET /api/sessions and filtering every message
+on the client. Ranking (bm25) walks every message in the table containing a
+query word, so each query reports the share of all messages that contain it.
+
+    python -m benchmarks.bench_search --messages 1000000 --users 1000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import latency_summary, use_temp_database
+
+COMMON = (
+    "today work sleep family walk tired grateful anxious plan call friend rain morning coffee run "
+    "meeting mother garden music book dinner stress calm hope weekend"
+).split()
+VOCABULARY = COMMON + [f"term{i}" for i in range(5000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+SESSION_MESSAGES = 50
+QUERIES = {
+    "common": "work",
+    "medium": "garden",
+    "rare": "term4000",
+    "two_words": "coffee morning",
+    "prefix": "gard*",
+}
+
+
+def _content(rng: random.Random) -> str:
+    return " ".join(rng.choices(VOCABULARY, WEIGHTS, k=rng.randint(8, 40)))
+
+
+async def _fill(messages: int, users: list[str], heavy_user: str, heavy_messages: int, seed: int) -> float:
+    from sqlalchemy import insert
+
+    from app.db import engine
+    from app.models.db_models import Message, Session
+
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    owners = [heavy_user] * (heavy_messages // SESSION_MESSAGES) + [
+        users[i % len(users)] for i in range(messages // SESSION_MESSAGES)
+    ]
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        for batch in range(0, len(owners), 400):
+            sessions, rows = [], []
+            for owner in owners[batch:batch + 400]:
+                sid = str(uuid.uuid4())
+                sessions.append({"id": sid, "user_id": owner, "title": "Entry"})
+                rows += [
+                    {
+                        "id": str(uuid.uuid4()),
+                        "session_id": sid,
+                        "role": "user" if i % 2 == 0 else "assistant",
+                        "content": _content(rng),
+                        "timestamp": start + timedelta(minutes=i),
+                    }
+                    for i in range(SESSION_MESSAGES)
+                ]
+            await conn.execute(insert(Session), sessions)
+            await conn.execute(insert(Message), rows)
+    return time.perf_counter() - started
+
+
+async def _time(client, path: str, params: dict, repeats: int) -> list[float]:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        response = await client.get(path, params=params)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def _share_of_messages(q: str, total: int) -> float:
+    """Percentage of all messages (every user) containing the query, which bm25's IDF pass has to walk."""
+    from sqlalchemy import text
+
+    from app.db import engine
+
+    words = " ".join(f'"{word.rstrip("*")}"' + ("*" if word.endswith("*") else "") for word in q.split())
+    async with engine.connect() as conn:
+        count = await conn.scalar(
+            text("SELECT count(*) FROM messages_fts WHERE messages_fts MATCH :q"), {"q": f"content : ({words})"}
+        )
+    return round(count / total * 100, 1)
+
+
+async def _scan_search(client, user: str, q: str) -> int:
+    """What a client had to do before: fetch every session with all messages, then filter."""
+    sessions = (await client.get("/api/sessions", params={"user_id": user})).json()
+    return sum(q in message["content"] for session in sessions for message in session["messages"])
+
+
+async def run(args) -> dict:
+    use_temp_database("search")
+    from httpx import ASGITransport, AsyncClient
+
+    from app.core.rate_limit import rate_limiter
+    from app.db import init_db
+    from app.main import app
+
+    rate_limiter.enabled = False
+    await init_db()
+    rng = random.Random(args.seed)
+    users = [f"search-user-{i}" for i in range(args.users)]
+    heavy_user = "search-heavy-user"
+    fill_s = await _fill(args.messages, users, heavy_user, args.heavy_user_messages, args.seed)
+    total = args.messages + args.heavy_user_messages
+
+    results = {
+        "messages": total,
+        "users": args.users,
+        "heavy_user_messages": args.heavy_user_messages,
+        "insert_rows_per_s": round(total / fill_s),
+    }
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", timeout=120) as client:
+        per_query = {}
+        for name, q in QUERIES.items():
+            samples = []
+            for user in rng.sample(users, min(args.sample_users, len(users))):
+                samples += await _time(client, "/api/search", {"user_id": user, "q": q, "limit": 20}, 1)
+            hits = len((await client.get("/api/search", params={"user_id": users[0], "q": q})).json()["items"])
+            heavy = await _time(client, "/api/search", {"user_id": heavy_user, "q": q, "limit": 20}, args.repeats)
+            per_query[name] = {
+                "q": q,
+                "pct_of_all_messages": await _share_of_messages(q, total),
+                "typical_user": latency_summary(samples),
+                "first_page_hits": hits,
+                "heavy_user": latency_summary(heavy),
+            }
+        results["search"] = per_query
+
+        started = time.perf_counter()
+        for user in users[:args.repeats]:
+            await _scan_search(client, user, "garden")
+        results["old_list_and_filter_ms_per_search"] = round((time.perf_counter() - started) / args.repeats * 1000, 1)
+        started = time.perf_counter()
+        await _scan_search(client, heavy_user, "garden")
+        results["old_list_and_filter_heavy_user_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--heavy-user-messages", type=int, default=50_000, help="Messages of one very active user")
+    parser.add_argument("--sample-users", type=int, default=200, help="Users queried per query type")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
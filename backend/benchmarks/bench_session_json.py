@@ -0,0 +1,158 @@
+"""Session JSON on the hot paths: schema objects + response_model vs. one-pass serialization.
+
+On a session of ``--messages`` messages measures:
+- response building alone: the previous way (MessageSchema / SessionMessagesPage
+  objects from ORM rows, then FastAPI's response_model validation and
+  JSONResponse) against the current one (dicts from SQL row tuples written by
+  pydantic-core's to_json);
+- GET /api/sessions/{id} end to end through the app, against the previous
+  endpoint body (selectinload + schema objects) mounted on the same app;
+- parsing a save request: ``List[dict]`` plus the hand-rolled timestamp parsing
+  against the typed MessageIn model.
+
+    python -m benchmarks.bench_session_json --messages 500
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import asgi_call, legacy_parse_timestamp, per_call_us, use_temp_database
+
+WORDS = "today felt long but the walk helped and I noticed how tired I was after work again".split()
+
+
+def _messages(count: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    start = datetime(2024, 3, 1, 8)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": " ".join(rng.choices(WORDS, k=rng.randint(20, 90))),
+            "timestamp": (start + timedelta(minutes=i)).isoformat() + "Z",
+        }
+        for i in range(count)
+    ]
+
+
+async def run(args) -> dict:
+    use_temp_database("session-json")
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    from pydantic import BaseModel, Field
+    from pydantic_core import to_json
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from app.api import sessions as api
+    from app.core.rate_limit import rate_limiter
+    from app.db import async_session, get_db, init_db
+    from app.main import app
+    from app.models.db_models import Message as DBMessage, Session as DBSession
+
+    rate_limiter.enabled = False
+    await init_db()
+    user = "bench-json"
+    messages = _messages(args.messages, args.seed)
+    async with async_session() as db:
+        session = DBSession(user_id=user, title="Bench")
+        db.add(session)
+        await db.commit()
+        sid = session.id
+    await asgi_call(
+        app, "PUT", f"/api/sessions/{sid}/messages", json.dumps({"messages": messages}).encode(),
+        [(b"content-type", b"application/json")], f"user_id={user}".encode(),
+    )
+
+    async with async_session() as db:
+        orm = (await db.execute(
+            select(DBSession).where(DBSession.id == sid).options(selectinload(DBSession.messages))
+        )).scalar_one()
+        rows = (await db.execute(
+            select(*api._MESSAGE_COLUMNS).where(DBMessage.session_id == sid).order_by(DBMessage.timestamp, DBMessage.id)
+        )).all()
+    field = create_model_field("Response_get_session", api.SessionMessagesPage, mode="serialization")
+
+    async def schema_objects():
+        page = api.SessionMessagesPage(
+            id=orm.id, title=orm.title, created_at=orm.created_at, updated_at=orm.updated_at, older_cursor=None,
+            messages=[api.MessageSchema(id=m.id, role=m.role, content=m.content, timestamp=m.timestamp)
+                      for m in orm.messages],
+        )
+        return JSONResponse(await serialize_response(field=field, response_content=page)).body
+
+    async def one_pass():
+        return to_json({
+            "id": orm.id, "title": orm.title, "messages": [api._message_json(row) for row in rows],
+            "created_at": orm.created_at, "updated_at": orm.updated_at, "older_cursor": None,
+        })
+
+    assert json.loads(await schema_objects()) == json.loads(await one_pass())
+
+    async def legacy_get_session(session_id: str, user_id: str, db=api.Depends(get_db)):
+        result = await db.execute(
+            select(DBSession).where(DBSession.id == session_id, DBSession.user_id == user_id)
+            .options(selectinload(DBSession.messages))
+        )
+        s = result.scalar_one()
+        return api.SessionMessagesPage(
+            id=s.id, title=s.title, created_at=s.created_at, updated_at=s.updated_at, older_cursor=None,
+            messages=[api.MessageSchema(id=m.id, role=m.role, content=m.content, timestamp=m.timestamp)
+                      for m in s.messages],
+        )
+
+    app.add_api_route("/bench/legacy/sessions/{session_id}", legacy_get_session, response_model=api.SessionMessagesPage)
+    query = f"user_id={user}".encode()
+
+    class LegacySaveRequest(BaseModel):
+        messages: list[dict] = Field(..., max_length=500)
+
+    body = json.dumps({"messages": messages}).encode()
+
+    async def parse_loose():
+        req = LegacySaveRequest.model_validate(json.loads(body))
+        return [
+            {"id": m.get("id"), "role": m["role"], "content": m["content"], "timestamp": legacy_parse_timestamp(m.get("timestamp"))}
+            for m in req.messages
+        ]
+
+    async def parse_typed():
+        return api._message_rows(sid, api.SaveMessagesRequest.model_validate(json.loads(body)).messages)
+
+    n = args.iterations
+    results = {
+        "messages": args.messages,
+        "response_body_bytes": len(await one_pass()),
+        "build_response_us": {
+            "schema_objects_and_response_model": round(await per_call_us(schema_objects, n), 1),
+            "one_pass_to_json": round(await per_call_us(one_pass, n), 1),
+        },
+        "get_session_us": {
+            "previous_endpoint": round(await per_call_us(
+                lambda: asgi_call(app, "GET", f"/bench/legacy/sessions/{sid}", query_string=query), n), 1),
+            "current_endpoint": round(await per_call_us(
+                lambda: asgi_call(app, "GET", f"/api/sessions/{sid}", query_string=query), n), 1),
+        },
+        "parse_save_request_us": {
+            "dict_and_parse_timestamp": round(await per_call_us(parse_loose, n), 1),
+            "typed_message_in": round(await per_call_us(parse_typed, n), 1),
+        },
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Delta sync vs. a full reload, and what the change feed costs on writes.
+
+For each history size (sessions of ``--messages`` messages each) one user's
+journal is filled through the normal insert path, a device takes a sync
+cursor, and another device appends a turn and edits a message. Then the
+first device catches up twice: GET /api/sessions (the whole history, as
+clients did before) and GET /api/sync?since=<cursor>. Reports latency and
+response bytes for both. Finally times PUT /api/sessions/{id}/messages with
+the change-feed triggers installed and with them dropped.
+
+    python -m benchmarks.bench_sync --sizes 10,100,1000 --messages 20
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import latency_summary, use_temp_database
+
+
+def _messages(count: int, start: datetime) -> list[dict]:
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"Entry line {i}: slept, walked, wrote a little about the week ahead.",
+            "timestamp": (start + timedelta(minutes=i)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+async def _fill(user: str, sessions: int, messages: int) -> list[str]:
+    from sqlalchemy import insert
+
+    from app.db import engine
+    from app.models.db_models import Message, Session
+
+    ids = [str(uuid.uuid4()) for _ in range(sessions)]
+    start = datetime(2024, 1, 1)
+    async with engine.begin() as conn:
+        await conn.execute(insert(Session), [{"id": sid, "user_id": user, "title": "Entry"} for sid in ids])
+        for sid in ids:
+            rows = _messages(messages, start)
+            for row in rows:
+                row.update(session_id=sid, timestamp=datetime.fromisoformat(row["timestamp"]))
+            await conn.execute(insert(Message), rows)
+    return ids
+
+
+async def _time(client, path: str, params: dict, repeats: int) -> tuple[list[float], int]:
+    samples, size = [], 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        response = await client.get(path, params=params)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+        size = len(response.content)
+    return samples, size
+
+
+async def _catch_up(client, sessions: int, messages: int, repeats: int) -> dict:
+    user = f"sync-bench-{sessions}"
+    ids = await _fill(user, sessions, messages)
+    cursor = (await client.get("/api/sync", params={"user_id": user})).json()["cursor"]
+
+    # Another device: one new turn in the newest session and an edit in an old one
+    params = {"user_id": user}
+    await client.post(
+        f"/api/sessions/{ids[-1]}/messages:append", params=params,
+        json={"messages": _messages(2, datetime(2024, 6, 1))},
+    )
+    old = (await client.get(f"/api/sessions/{ids[0]}", params=params)).json()["messages"]
+    old[0]["content"] = "Edited on the phone."
+    await client.put(f"/api/sessions/{ids[0]}/messages", params=params, json={"messages": old})
+
+    full, full_bytes = await _time(client, "/api/sessions", params, repeats)
+    delta, delta_bytes = await _time(client, "/api/sync", {**params, "since": cursor}, repeats)
+    return {
+        "sessions": sessions,
+        "messages": sessions * messages,
+        "full_reload": {**latency_summary(full), "bytes": full_bytes},
+        "sync_delta": {**latency_summary(delta), "bytes": delta_bytes},
+    }
+
+
+async def _save_cost(client, saves: int) -> list[float]:
+    user = f"sync-save-{uuid.uuid4()}"
+    sid = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+    messages = []
+    samples = []
+    for i in range(saves):
+        messages += _messages(2, datetime(2024, 1, 1) + timedelta(hours=i))
+        started = time.perf_counter()
+        response = await client.put(f"/api/sessions/{sid}/messages", params={"user_id": user}, json={"messages": messages})
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def run(args) -> dict:
+    use_temp_database("sync")
+    from httpx import ASGITransport, AsyncClient
+
+    from app.core.rate_limit import rate_limiter
+    from app.core.sync import SQLITE_DDL
+    from app.db import engine, init_db
+    from app.main import app
+
+    rate_limiter.enabled = False
+    await init_db()
+    results = {"messages_per_session": args.messages}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", timeout=300) as client:
+        results["catch_up"] = [
+            await _catch_up(client, int(size), args.messages, args.repeats) for size in args.sizes.split(",")
+        ]
+
+        with_feed = await _save_cost(client, args.saves)
+        async with engine.begin() as conn:
+            for ddl in SQLITE_DDL:
+                name = ddl.split("EXISTS", 1)[1].split()[0]
+                await conn.exec_driver_sql(f"DROP TRIGGER {name}")
+        without_feed = await _save_cost(client, args.saves)
+        results["save_messages"] = {
+            "with_change_feed": latency_summary(with_feed),
+            "without_change_feed": latency_summary(without_feed),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000", help="Comma-separated session counts")
+    parser.add_argument("--messages", type=int, default=20, help="Messages per session")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--saves", type=int, default=200, help="Saves timed with and without the triggers")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Load test: session reads stay fast while many chats wait on a slow model.
+
+Starts the stub model server on a real socket, points AnthropicService at it,
+fires N concurrent /api/chat requests and samples GET /api/sessions/{id}
+latency until they finish.
+
+    python -m benchmarks.chat_load --chats 50 --model-latency 2.0
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import free_port, latency_summary, use_temp_database
+
+
+async def run(chats: int, model_latency: float, read_interval: float) -> dict:
+    use_temp_database("chat_load")
+    import uvicorn
+    from httpx import ASGITransport, AsyncClient
+    from unittest.mock import patch
+
+    from app.main import app
+    from app.db import init_db
+    from app.core.anthropic_service import AnthropicService
+    from app.core.rate_limit import rate_limiter
+    from tests.stub_model_server import create_stub_app
+
+    rate_limiter.enabled = False  # Every request comes from one address and one user
+    await init_db()
+    port = free_port()
+    stub = create_stub_app(latency=model_latency)
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    service = AnthropicService(api_key="stub-key", base_url=f"http://127.0.0.1:{port}")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        created = await client.post("/api/sessions", json={"user_id": "bench-user", "title": "Load"})
+        sid = created.json()["id"]
+
+        with patch("app.api.chat.anthropic_service", service), patch("app.api.chat.settings.use_mock_ai", False):
+            chat_latencies: list[float] = []
+
+            async def one_chat(i: int):
+                start = time.perf_counter()
+                res = await client.post(
+                    "/api/chat",
+                    json={"messages": [{"role": "user", "content": f"Entry {i}"}], "user_id": "bench-user"},
+                )
+                res.raise_for_status()
+                chat_latencies.append(time.perf_counter() - start)
+
+            chat_tasks = [asyncio.create_task(one_chat(i)) for i in range(chats)]
+            read_latencies: list[float] = []
+            wall_start = time.perf_counter()
+            while not all(t.done() for t in chat_tasks):
+                start = time.perf_counter()
+                res = await client.get(f"/api/sessions/{sid}?user_id=bench-user")
+                res.raise_for_status()
+                read_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(read_interval)
+            await asyncio.gather(*chat_tasks)
+            wall = time.perf_counter() - wall_start
+
+    await service.aclose()
+    server.should_exit = True
+    await server_task
+    return {
+        "chats_in_flight": chats,
+        "model_latency_s": model_latency,
+        "wall_s": round(wall, 3),
+        "chat": latency_summary(chat_latencies),
+        "session_reads": latency_summary(read_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--model-latency", type=float, default=2.0)
+    parser.add_argument("--read-interval", type=float, default=0.02)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.chats, args.model_latency, args.read_interval)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Shared helpers for the benchmark scripts."""
+import os
+import socket
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+
+
+def use_temp_database(name: str = "bench") -> str:
+    """Point DATABASE_URL at a throwaway SQLite file. Call before importing ``app``."""
+    path = os.path.join(tempfile.mkdtemp(prefix="mindspace-bench-"), f"{name}.db")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    return path
+
+
+def legacy_parse_timestamp(ts) -> datetime:
+    """The hand-rolled timestamp parsing of the pre-MessageIn endpoints, for the legacy baselines."""
+    if ts is None:
+        return datetime.utcnow()
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts.replace("Z", "+00:00")) if "T" in ts else datetime.fromisoformat(ts)
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def latency_summary(seconds: list[float]) -> dict:
+    """p50/p95/p99/max in milliseconds."""
+    ms = [s * 1000 for s in seconds]
+    return {
+        "count": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 2) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(max(ms), 2) if ms else 0.0,
+    }
+
+
+async def asgi_call(
+    app, method: str, path: str, body: bytes = b"", headers: list[tuple[bytes, bytes]] = (), query_string: bytes = b""
+) -> int:
+    """Call an ASGI app directly (no HTTP client or server); returns the response status."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query_string, "root_path": "",
+        "headers": [(b"host", b"bench"), *headers], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    sent = False
+    status = 0
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def per_call_us(call, n: int, rounds: int = 5) -> float:
+    """Best-of-rounds mean microseconds per awaited ``call()``, after a warm-up."""
+    for _ in range(min(n, 500)):
+        await call()
+    means = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(n):
+            await call()
+        means.append((time.perf_counter() - start) / n * 1e6)
+    return min(means)
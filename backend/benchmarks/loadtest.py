@@ -0,0 +1,361 @@
+"""Load test: mixed API traffic at fixed concurrency, latency percentiles to JSON.
+
+Drives ``app.main:app`` with closed-loop workers issuing a weighted mix of
+chat, streamed chat, session chat, session list/get/save, migrate and
+insights requests. Chat runs in mock AI mode with a sampled latency
+distribution and paced token streaming; insights and background summary
+folds, which have no mock mode, go to the stub model server with the same
+latency distribution. Reports
+p50/p95/p99 per operation, throughput, and SQL statement counts and timings.
+
+    python -m benchmarks.loadtest --concurrency 32 --duration 20 --latency-ms 300 \\
+        --distribution lognormal --output loadtest.json
+
+With ``--url`` an already running server is driven instead (DB statistics
+are then not collected). In-process, responses are buffered, so stream
+time to first token equals its total time unless ``--serve`` is used.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from benchmarks.common import free_port, latency_summary, use_temp_database
+
+OPERATIONS = ("chat", "chat_stream", "session_chat", "list", "get", "save", "migrate", "insights")
+DEFAULT_MIX = "chat=25,chat_stream=15,session_chat=5,list=20,get=20,save=10,migrate=2,insights=3"
+WORDS = "work sleep family anxious calm walk friend deadline tired grateful music morning stress hope".split()
+MAX_SAVED_MESSAGES = 400  # Trim a session's client-side history past this (the API accepts 500 per save)
+
+
+def _parse_mix(mix: str) -> dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = int(weight or 1)
+    unknown = set(weights) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _messages(rng: random.Random, count: int, start: datetime) -> list[dict]:
+    return [
+        {
+            "id": uuid.uuid4().hex,
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": _sentence(rng),
+            "timestamp": (start + timedelta(seconds=i)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+class DBStats:
+    """SQL statements and time spent in them, via engine cursor events."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.statements: Counter = Counter()
+        self.seconds: Counter = Counter()
+        self.slowest = 0.0
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def after(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["query_started"].pop()
+            verb = statement.lstrip().split(None, 1)[0].upper()
+            self.statements[verb] += 1
+            self.seconds[verb] += elapsed
+            self.slowest = max(self.slowest, elapsed)
+
+    def reset(self) -> None:
+        self.statements.clear()
+        self.seconds.clear()
+        self.slowest = 0.0
+
+    def summary(self, requests: int) -> dict:
+        total = sum(self.statements.values())
+        return {
+            "statements": total,
+            "statements_per_request": round(total / requests, 2) if requests else 0.0,
+            "by_verb": {
+                verb: {"count": count, "total_ms": round(self.seconds[verb] * 1000, 1)}
+                for verb, count in self.statements.most_common()
+            },
+            "total_ms": round(sum(self.seconds.values()) * 1000, 1),
+            "slowest_ms": round(self.slowest * 1000, 2),
+        }
+
+
+class Harness:
+    """Seeded users and sessions, plus the per-operation request makers."""
+
+    def __init__(self, client, users: int, sessions_per_user: int, messages_per_session: int, seed: int):
+        self.client = client
+        self.rng = random.Random(seed)
+        self.users = [f"load-{seed}-{i}" for i in range(users)]
+        self.sessions_per_user = sessions_per_user
+        self.messages_per_session = messages_per_session
+        self.sessions: dict[str, list[tuple[str, list[dict]]]] = {}
+
+    async def seed(self) -> None:
+        start = datetime.now() - timedelta(days=30)
+        for user in self.users:
+            owned = []
+            for _ in range(self.sessions_per_user):
+                created = await self.client.post("/api/sessions", json={"user_id": user, "title": "Load"})
+                created.raise_for_status()
+                sid = created.json()["id"]
+                messages = _messages(self.rng, self.messages_per_session, start)
+                saved = await self.client.put(
+                    f"/api/sessions/{sid}/messages", params={"user_id": user}, json={"messages": messages}
+                )
+                saved.raise_for_status()
+                owned.append((sid, messages))
+            self.sessions[user] = owned
+
+    def _session(self, rng: random.Random) -> tuple[str, str, list[dict]]:
+        user = rng.choice(self.users)
+        sid, messages = rng.choice(self.sessions[user])
+        return user, sid, messages
+
+    async def chat(self, rng):
+        history = [{"role": "user" if i % 2 == 0 else "assistant", "content": _sentence(rng)} for i in range(5)]
+        return await self.client.post("/api/chat", json={"messages": history, "user_id": rng.choice(self.users)})
+
+    async def chat_stream(self, rng):
+        """Returns (response, seconds to the first token event)."""
+        payload = {"messages": [{"role": "user", "content": _sentence(rng)}], "user_id": rng.choice(self.users)}
+        started = time.perf_counter()
+        first_token = None
+        async with self.client.stream("POST", "/api/chat/stream", json=payload) as response:
+            async for chunk in response.aiter_text():
+                if first_token is None and "event: token" in chunk:
+                    first_token = time.perf_counter() - started
+        return response, first_token
+
+    async def session_chat(self, rng):
+        user, sid, messages = self._session(rng)
+        text = _sentence(rng)
+        response = await self.client.post(f"/api/sessions/{sid}/chat", params={"user_id": user}, json={"message": text})
+        if response.status_code == 200:
+            # Keep the client-side copy in step, so a later save does not delete these turns
+            body = response.json()
+            messages.extend([
+                {"id": body["user_message_id"], "role": "user", "content": text, "timestamp": body["timestamp"]},
+                {"id": body["message_id"], "role": "assistant", "content": body["message"], "timestamp": body["timestamp"]},
+            ])
+        return response
+
+    async def list(self, rng):
+        return await self.client.get("/api/sessions/summaries", params={"user_id": rng.choice(self.users)})
+
+    async def get(self, rng):
+        user, sid, _ = self._session(rng)
+        return await self.client.get(f"/api/sessions/{sid}", params={"user_id": user, "limit": 50})
+
+    async def save(self, rng):
+        user, sid, messages = self._session(rng)
+        messages.extend(_messages(rng, 2, datetime.now()))
+        if len(messages) > MAX_SAVED_MESSAGES:
+            del messages[: len(messages) - self.messages_per_session]
+        return await self.client.put(
+            f"/api/sessions/{sid}/messages", params={"user_id": user}, json={"messages": messages}
+        )
+
+    async def migrate(self, rng):
+        sessions = [
+            {"id": uuid.uuid4().hex, "title": "Imported", "messages": _messages(rng, 20, datetime.now() - timedelta(days=90))}
+            for _ in range(5)
+        ]
+        return await self.client.post("/api/migrate", json={"user_id": rng.choice(self.users), "sessions": sessions})
+
+    async def insights(self, rng):
+        # Fresh sample text each time, so the request misses the insights cache
+        entries = [
+            {"date": f"2025-01-{day:02d}", "message_count": 6, "sample_messages": [_sentence(rng) for _ in range(4)]}
+            for day in range(1, 15)
+        ]
+        return await self.client.post(
+            "/api/insights/unified",
+            json={"entries": entries, "total_days_active": 14, "total_messages": 84, "user_id": rng.choice(self.users)},
+        )
+
+
+async def _drive(harness: Harness, mix: dict[str, int], concurrency: int, duration: float, seed: int) -> dict:
+    latencies: dict[str, list[float]] = defaultdict(list)
+    ttft: list[float] = []
+    statuses: dict[str, Counter] = defaultdict(Counter)
+    names, weights = list(mix), list(mix.values())
+    deadline = time.perf_counter() + duration
+
+    async def worker(i: int):
+        rng = random.Random(seed * 1000 + i)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                result = await getattr(harness, name)(rng)
+            except Exception as e:  # Connection errors count against the operation, not the run
+                statuses[name][type(e).__name__] += 1
+                continue
+            if name == "chat_stream":
+                result, first_token = result
+                if first_token is not None:
+                    ttft.append(first_token)
+            latencies[name].append(time.perf_counter() - started)
+            statuses[name][str(result.status_code)] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    operations = {}
+    for name in names:
+        count = sum(statuses[name].values())
+        errors = sum(n for status, n in statuses[name].items() if not status.startswith("2"))
+        operations[name] = {
+            **latency_summary(latencies[name]),
+            "rps": round(count / wall, 1),
+            "errors": errors,
+            "status": dict(statuses[name]),
+        }
+    if "chat_stream" in operations:
+        operations["chat_stream"]["ttft"] = latency_summary(ttft)
+    total = sum(sum(counter.values()) for counter in statuses.values())
+    return {
+        "wall_s": round(wall, 3),
+        "requests": total,
+        "rps": round(total / wall, 1),
+        "errors": sum(op["errors"] for op in operations.values()),
+        "latency": latency_summary([s for samples in latencies.values() for s in samples]),
+        "operations": operations,
+    }
+
+
+async def run(args) -> dict:
+    mix = _parse_mix(args.mix)
+    config = {
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "mix": mix,
+        "mock_latency_ms": args.latency_ms,
+        "mock_latency_distribution": args.distribution,
+        "mock_latency_sigma": args.sigma,
+        "mock_tokens_per_second": args.tokens_per_second,
+        "users": args.users,
+        "target": args.url or ("uvicorn" if args.serve else "in-process"),
+    }
+    from httpx import ASGITransport, AsyncClient, Limits
+
+    limits = Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.url:
+        async with AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+            harness = Harness(client, args.users, args.sessions, args.messages, args.seed)
+            await harness.seed()
+            return {"config": config, **await _drive(harness, mix, args.concurrency, args.duration, args.seed)}
+
+    db_path = use_temp_database("loadtest")
+    from unittest.mock import patch
+
+    from app.core.config import settings
+
+    settings.use_mock_ai = True
+    settings.mock_latency_ms = args.latency_ms
+    settings.mock_latency_distribution = args.distribution
+    settings.mock_latency_sigma = args.sigma
+    settings.mock_tokens_per_second = args.tokens_per_second
+
+    from app.main import app
+    from app.core.mock_ai_service import mock_ai_service
+    from app.core.rate_limit import rate_limiter
+    from app.db import engine, init_db
+    from tests.stub_model_server import create_stub_app, stub_service
+
+    rate_limiter.enabled = False  # Measure the service, not the per-user limit
+    await init_db()
+    db_stats = DBStats(engine)
+    stub = create_stub_app(reply=json.dumps({"narrative": "You keep returning to rest.", "themes": []}))
+    stub.state.latency = mock_ai_service.sample_latency
+    stub_ai = stub_service(stub)
+
+    server = server_task = None
+    if args.serve:
+        import uvicorn
+
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+        server_task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+        client = AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits)
+    else:
+        client = AsyncClient(transport=ASGITransport(app=app), base_url="http://load", timeout=60)
+
+    try:
+        with patch("app.api.insights.anthropic_service", stub_ai), \
+                patch("app.core.conversation_summaries.anthropic_service", stub_ai):
+            harness = Harness(client, args.users, args.sessions, args.messages, args.seed)
+            await harness.seed()
+            db_stats.reset()
+            result = await _drive(harness, mix, args.concurrency, args.duration, args.seed)
+            ai_stats = (await client.get("/api/ai/stats")).json()
+    finally:
+        await client.aclose()
+        await stub_ai.aclose()
+        if server:
+            server.should_exit = True
+            await server_task
+    return {
+        "config": config,
+        **result,
+        "db": {
+            **db_stats.summary(result["requests"]),
+            "pool": engine.pool.status(),
+            "file_mb": round(os.path.getsize(db_path) / 1e6, 2),
+        },
+        "ai": {"scheduler": ai_stats["scheduler"], "context": ai_stats["context"]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent closed-loop clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load after seeding")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Median mock model latency")
+    parser.add_argument("--distribution", choices=("fixed", "uniform", "lognormal"), default="lognormal")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Spread of the lognormal latency")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Pace of streamed mock tokens")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=5, help="Seeded sessions per user")
+    parser.add_argument("--messages", type=int, default=40, help="Seeded messages per session")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--serve", action="store_true", help="Serve the app with uvicorn on a local socket")
+    parser.add_argument("--url", help="Drive an already running server instead of the in-process app")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    report = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
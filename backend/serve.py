@@ -0,0 +1,62 @@
+"""Production entry point: one uvicorn worker per CPU core, uvloop and httptools when installed.
+
+    python serve.py
+
+Workers, access log and the shutdown grace period come from settings
+(WEB_CONCURRENCY, SERVER_ACCESS_LOG, SHUTDOWN_GRACE_SECONDS). On SIGTERM
+the workers stop accepting connections and let in-flight requests and AI
+streams finish within the grace period. start.py is the auto-reloading
+development server.
+"""
+import asyncio
+import importlib.util
+import os
+
+import uvicorn
+
+from app.core.config import settings
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def share_job_queue(workers: int) -> bool:
+    """
+    With several workers, the in-memory insights queue would let each worker
+    requeue jobs its siblings are still running at startup; switch them all
+    to the database queue. True when switched.
+    """
+    if workers <= 1 or settings.insights_job_queue != "memory":
+        return False
+    os.environ["INSIGHTS_JOB_QUEUE"] = "database"  # Read by the worker processes' settings
+    settings.insights_job_queue = "database"
+    return True
+
+
+def server_options() -> dict:
+    return {
+        "host": settings.host,
+        "port": settings.port,
+        "workers": settings.web_concurrency or os.cpu_count() or 1,
+        "loop": "uvloop" if _installed("uvloop") else "asyncio",
+        "http": "httptools" if _installed("httptools") else "h11",
+        "access_log": settings.server_access_log,
+        "timeout_graceful_shutdown": settings.shutdown_grace_seconds,
+        "proxy_headers": True,
+    }
+
+
+if __name__ == "__main__":
+    from app.db import engine, init_db
+
+    async def create_tables():
+        await init_db()
+        await engine.dispose()
+
+    # Once, before the workers start, so they do not race each other on DDL
+    asyncio.run(create_tables())
+    options = server_options()
+    if share_job_queue(options["workers"]):
+        print(f"{options['workers']} workers: insights jobs use the database queue")
+    uvicorn.run("app.main:app", **options)
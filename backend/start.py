@@ -1,4 +1,6 @@
 import uvicorn
 
+from app.core.config import settings
+
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("app.main:app", host="0.0.0.0", port=settings.port, reload=True)
@@ -13,6 +13,15 @@ async def ensure_db():
     await init_db()
 
 
+@pytest.fixture(autouse=True)
+def fresh_rate_limits():
+    """Full rate-limit buckets for every test (they would otherwise carry over between tests and runs)."""
+    from app.core.rate_limit import MemoryStore, rate_limiter
+
+    with patch.object(rate_limiter, "store", MemoryStore()):
+        yield
+
+
 @pytest.fixture
 async def client():
     """Async HTTP client for testing FastAPI app."""
@@ -36,7 +45,7 @@ def mock_settings():
 @pytest.fixture
 def mock_anthropic_client():
     """Mock Anthropic client for testing."""
-    with patch("app.core.anthropic_service.anthropic.Anthropic") as mock:
+    with patch("app.core.anthropic_service.anthropic.AsyncAnthropic") as mock:
         instance = MagicMock()
         mock.return_value = instance
         yield instance
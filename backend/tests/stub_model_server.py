@@ -0,0 +1,139 @@
+"""Local stand-in for the Anthropic Messages API, used by tests and benchmarks.
+
+Serve it with uvicorn for real-socket load tests, or mount it in-process with
+``httpx.ASGITransport`` via ``stub_service``.
+"""
+import asyncio
+import hashlib
+import json
+import re
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+
+def _blocks(body: dict) -> list[dict]:
+    """System and message content as text blocks, in prompt order."""
+    blocks = []
+    for part in [body.get("system") or []] + [m.get("content", "") for m in body.get("messages", [])]:
+        blocks.extend([{"type": "text", "text": part}] if isinstance(part, str) else part)
+    return [block for block in blocks if block.get("text")]
+
+
+def _usage(app: Starlette, body: dict, output_text: str) -> dict:
+    """
+    Token usage with simulated prompt caching: the prefix up to the last
+    ``cache_control`` block is written to the cache, and a request whose
+    prefix up to some earlier block boundary was written before reads it.
+    """
+    blocks = _blocks(body)
+    sizes = [max(1, len(block["text"]) // 4) for block in blocks]
+    marks = [i for i, block in enumerate(blocks) if block.get("cache_control")]
+    read = created = 0
+    if marks:
+        texts = [block["text"] for block in blocks]  # Markers themselves are not part of the cached content
+        prefix_keys = [hashlib.sha256(json.dumps(texts[: i + 1]).encode()).hexdigest() for i in range(marks[-1] + 1)]
+        hit = next((i for i in range(marks[-1], -1, -1) if prefix_keys[i] in app.state.prompt_cache), None)
+        read = sum(sizes[: hit + 1]) if hit is not None else 0
+        created = sum(sizes[: marks[-1] + 1]) - read
+        app.state.prompt_cache.add(prefix_keys[marks[-1]])
+    return {
+        "input_tokens": max(1, sum(sizes) - read - created),
+        "output_tokens": max(1, len(output_text) // 4),
+        "cache_creation_input_tokens": created,
+        "cache_read_input_tokens": read,
+    }
+
+
+def _message(app: Starlette, body: dict, text: str, usage: dict | None = None) -> dict:
+    return {
+        "id": "msg_stub",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "stub"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": usage or _usage(app, body, text),
+    }
+
+
+async def _prefill(app: Starlette, usage: dict) -> None:
+    """Time to first token grows with the input tokens not served from cache."""
+    uncached = usage["input_tokens"] + usage["cache_creation_input_tokens"]
+    if app.state.prefill_seconds_per_1k_tokens:
+        await asyncio.sleep(uncached / 1000 * app.state.prefill_seconds_per_1k_tokens)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _stream_events(app: Starlette, body: dict):
+    """Messages API streaming events for the configured reply, one word per delta."""
+    text = app.state.reply
+    usage = _usage(app, body, text)
+    started = dict(_message(app, body, "", usage), content=[], stop_reason=None)
+    try:
+        await _prefill(app, usage)
+        yield _sse("message_start", {"type": "message_start", "message": started})
+        yield _sse("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+        for token in re.findall(r"\S+\s*", text):
+            if app.state.token_delay:
+                await asyncio.sleep(app.state.token_delay)
+            yield _sse("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}})
+        yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+        yield _sse("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": max(1, len(text) // 4)}})
+        yield _sse("message_stop", {"type": "message_stop"})
+        app.state.streams_completed += 1
+    except (asyncio.CancelledError, GeneratorExit):
+        app.state.streams_cancelled += 1
+        raise
+
+
+def create_stub_app(reply: str = "That sounds meaningful. What stands out to you most?", latency: float = 0.0) -> Starlette:
+    """
+    Build the stub app. ``app.state`` holds the knobs and the recorded request
+    bodies; ``latency`` may also be a callable returning seconds per call.
+    """
+
+    async def messages(request: Request):
+        body = await request.json()
+        app.state.requests.append(body)
+        if app.state.errors_remaining:
+            # Fault injection: fail the next N calls the way an overloaded provider does
+            app.state.errors_remaining -= 1
+            error = {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}
+            return JSONResponse(error, status_code=app.state.error_status)
+        latency = app.state.latency() if callable(app.state.latency) else app.state.latency
+        if latency:
+            await asyncio.sleep(latency)
+        if body.get("stream"):
+            return StreamingResponse(_stream_events(app, body), media_type="text/event-stream")
+        message = _message(app, body, app.state.reply)
+        await _prefill(app, message["usage"])
+        return JSONResponse(message)
+
+    app = Starlette(routes=[Route("/v1/messages", messages, methods=["POST"])])
+    app.state.reply = reply
+    app.state.latency = latency
+    app.state.token_delay = 0.0  # Seconds between streamed deltas
+    app.state.prefill_seconds_per_1k_tokens = 0.0  # Added latency per 1k uncached input tokens
+    app.state.prompt_cache = set()  # Hashes of cached prompt prefixes
+    app.state.errors_remaining = 0  # Calls to fail with error_status before answering again
+    app.state.error_status = 529
+    app.state.requests = []
+    app.state.streams_completed = 0
+    app.state.streams_cancelled = 0
+    return app
+
+
+def stub_service(app: Starlette):
+    """AnthropicService whose pooled client talks to ``app`` in-process."""
+    from app.core.anthropic_service import AnthropicService
+
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    return AnthropicService(api_key="stub-key", base_url="http://stub", http_client=http_client)
@@ -1,4 +1,5 @@
 """Tests for AnthropicService."""
+import json
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 
@@ -20,20 +21,183 @@ async def test_anthropic_service_returns_message_when_no_client():
 @pytest.mark.asyncio
 async def test_anthropic_service_calls_api_when_client_exists():
     """When client exists, chat calls Anthropic API and returns text."""
-    with patch("app.core.anthropic_service.settings") as mock_settings:
-        mock_settings.anthropic_api_key = "real-key"
-        mock_settings.use_mock_ai = False
+    from app.core.config import settings
 
+    with patch.object(settings, "anthropic_api_key", "real-key"):
         mock_msg = MagicMock()
         mock_msg.content = [MagicMock(text="AI says hi")]
         mock_client = MagicMock()
-        mock_client.messages.create = MagicMock(return_value=mock_msg)
+        mock_client.messages.create = AsyncMock(return_value=mock_msg)
 
-        with patch("anthropic.Anthropic", return_value=mock_client):
+        with patch("anthropic.AsyncAnthropic", return_value=mock_client):
             from app.core.anthropic_service import AnthropicService
 
             service = AnthropicService()
             response = await service.chat([{"role": "user", "content": "Hi"}])
 
         assert response == "AI says hi"
-        mock_client.messages.create.assert_called_once()
+        mock_client.messages.create.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_anthropic_service_talks_to_stub_server():
+    """The async client sends a Messages API request and parses the reply."""
+    from tests.stub_model_server import create_stub_app, stub_service
+
+    stub = create_stub_app(reply="Stubbed Mira reply")
+    service = stub_service(stub)
+    try:
+        response = await service.chat([{"role": "user", "content": "Hi"}], timeout=5)
+    finally:
+        await service.aclose()
+
+    assert response == "Stubbed Mira reply"
+    assert stub.state.requests[0]["messages"] == [{"role": "user", "content": "Hi"}]
+
+
+@pytest.mark.asyncio
+async def test_anthropic_service_does_not_block_event_loop():
+    """Concurrent upstream calls overlap instead of serializing the event loop."""
+    import asyncio
+    import time
+    from tests.stub_model_server import create_stub_app, stub_service
+
+    stub = create_stub_app(latency=0.2)
+    service = stub_service(stub)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    tick_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(service.chat([{"role": "user", "content": f"Hi {i}"}]) for i in range(10)))
+    finally:
+        tick_task.cancel()
+        await service.aclose()
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1.0  # 10 x 0.2s calls run concurrently
+    assert ticks >= 5  # the loop kept serving other work meanwhile
+
+
+@pytest.mark.asyncio
+async def test_anthropic_service_stream_chat_yields_deltas():
+    """stream_chat relays the upstream text deltas in order."""
+    from tests.stub_model_server import create_stub_app, stub_service
+
+    stub = create_stub_app(reply="One two three")
+    service = stub_service(stub)
+    try:
+        tokens = [t async for t in service.stream_chat([{"role": "user", "content": "Hi"}])]
+    finally:
+        await service.aclose()
+
+    assert tokens == ["One ", "two ", "three"]
+    assert stub.state.requests[0]["stream"] is True
+    assert stub.state.streams_completed == 1
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_calls_are_coalesced():
+    """Duplicate in-flight chat/summarize payloads reach the provider once."""
+    import asyncio
+    from tests.stub_model_server import create_stub_app, stub_service
+
+    stub = create_stub_app(latency=0.05)
+    service = stub_service(stub)
+    messages = [{"role": "user", "content": "Generate insights"}]
+    try:
+        replies = await asyncio.gather(*(service.chat(messages) for _ in range(3)))
+        summaries = await asyncio.gather(service.summarize(messages), service.summarize(messages))
+    finally:
+        await service.aclose()
+
+    assert len(set(replies)) == 1 and len(set(summaries)) == 1
+    assert len(stub.state.requests) == 2
+    assert service.flights.stats()["deduplicated"] == 3
+
+
+@pytest.mark.asyncio
+async def test_summarize_folds_into_previous_summary():
+    """An incremental summarize sends the running summary plus only the new messages."""
+    from tests.stub_model_server import create_stub_app, stub_service
+
+    app = create_stub_app(reply="Updated summary.")
+    service = stub_service(app)
+    summary = await service.summarize([{"role": "user", "content": "New worry"}], previous_summary="Old summary")
+    assert summary == "Updated summary."
+    prompt = app.state.requests[0]["messages"][0]["content"]
+    assert "Old summary" in prompt
+    assert "New worry" in prompt
+    await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_chat_marks_system_prompt_and_history_prefix_for_caching():
+    """The static system prompt, the summary and the end of the stable history carry cache breakpoints."""
+    from tests.stub_model_server import create_stub_app, stub_service
+
+    stub = create_stub_app(reply="Noted.")
+    service = stub_service(stub)
+    history = [
+        {"role": "user", "content": "I moved house"},
+        {"role": "assistant", "content": "How does the new place feel?"},
+        {"role": "user", "content": "Quiet"},
+    ]
+    try:
+        await service.chat(history, context_summary="Moving stress", cache=True)
+    finally:
+        await service.aclose()
+
+    body = stub.state.requests[0]
+    assert [block.get("cache_control") for block in body["system"]] == [{"type": "ephemeral"}] * 2
+    assert body["messages"][1]["content"] == [
+        {"type": "text", "text": "How does the new place feel?", "cache_control": {"type": "ephemeral"}}
+    ]
+    assert body["messages"][2] == {"role": "user", "content": "Quiet"}
+
+
+@pytest.mark.asyncio
+async def test_chat_without_caching_sends_plain_prompt():
+    from tests.stub_model_server import create_stub_app, stub_service
+
+    stub = create_stub_app()
+    service = stub_service(stub)
+    try:
+        await service.chat([{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello"}, {"role": "user", "content": "Bye"}], cache=False)
+    finally:
+        await service.aclose()
+
+    body = stub.state.requests[0]
+    assert isinstance(body["system"], str)
+    assert "cache_control" not in json.dumps(body)
+
+
+@pytest.mark.asyncio
+async def test_cache_usage_and_timings_are_recorded():
+    """The second turn reads the prefix written by the first; usage and TTFT are kept per cache mode."""
+    from tests.stub_model_server import create_stub_app, stub_service
+
+    stub = create_stub_app(reply="Tell me more.")
+    service = stub_service(stub)
+    turn = [{"role": "user", "content": "Long day " * 200}, {"role": "assistant", "content": "Tell me more."}]
+    try:
+        await service.chat(turn + [{"role": "user", "content": "Work"}], cache=True)
+        await service.chat(turn + [{"role": "user", "content": "Work"}, {"role": "assistant", "content": "Tell me more."}, {"role": "user", "content": "Then gym"}], cache=True)
+        [t async for t in service.stream_chat([{"role": "user", "content": "Hi"}], cache=False)]
+    finally:
+        await service.aclose()
+
+    stats = service.usage.stats()
+    chat = stats["tokens"]["chat"]
+    assert chat["calls"] == 2
+    assert chat["cache_creation_input_tokens"] > 0
+    assert chat["cache_read_input_tokens"] >= chat["cache_creation_input_tokens"] // 2
+    assert stats["tokens"]["chat_stream"]["calls"] == 1
+    assert stats["timings"]["latency.chat.cache_on"]["count"] == 2
+    assert stats["timings"]["ttft.chat_stream.cache_off"]["count"] == 1
@@ -0,0 +1,103 @@
+"""Tests for the streaming request body limit."""
+import pytest
+from fastapi import FastAPI, Request
+from httpx import ASGITransport, AsyncClient
+
+from app.middleware.body_limit import BodyLimitMiddleware
+
+
+def _chunks(count: int, size: int):
+    async def gen():
+        for _ in range(count):
+            yield b"x" * size
+    return gen()
+
+
+def _echo_app(max_bytes: int) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"bytes": len(await request.body())}
+
+    app.add_middleware(BodyLimitMiddleware, max_bytes=max_bytes)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_content_length_over_limit_is_rejected_without_reading():
+    app = _echo_app(100)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/echo", content=b"x" * 101)
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Request body too large"}
+
+
+@pytest.mark.asyncio
+async def test_chunked_body_under_limit_passes():
+    app = _echo_app(100)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/echo", content=_chunks(4, 25))
+    assert response.status_code == 200
+    assert response.json() == {"bytes": 100}
+
+
+@pytest.mark.asyncio
+async def test_chunked_body_over_limit_is_rejected():
+    app = _echo_app(100)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/echo", content=_chunks(10, 25))
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_chunked_body_stops_being_read_at_the_limit():
+    """Messages after the one that crosses the limit are never pulled from the server."""
+    app = _echo_app(100)
+    pulled = 0
+    sent = []
+
+    async def receive():
+        nonlocal pulled
+        pulled += 1
+        return {"type": "http.request", "body": b"x" * 40, "more_body": pulled < 1000}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/echo", "raw_path": b"/echo", "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"test"), (b"transfer-encoding", b"chunked")],
+        "client": ("127.0.0.1", 1), "server": ("test", 80),
+    }
+    await app(scope, receive, send)
+    assert pulled == 3
+    assert sent[0]["status"] == 413
+
+
+@pytest.mark.asyncio
+async def test_chunked_upload_to_api_is_limited(client: AsyncClient):
+    from app.main import app
+
+    limit = next(m.kwargs["max_bytes"] for m in app.user_middleware if m.cls is BodyLimitMiddleware)
+    response = await client.post(
+        "/api/sessions", content=_chunks(limit // 65536 + 2, 65536), headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_path_limit_overrides_default():
+    app = FastAPI()
+
+    @app.post("/echo")
+    @app.post("/upload")
+    async def echo(request: Request):
+        return {"bytes": len(await request.body())}
+
+    app.add_middleware(BodyLimitMiddleware, max_bytes=100, path_limits={"/upload": 1000})
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.post("/upload", content=_chunks(8, 100))).json() == {"bytes": 800}
+        assert (await client.post("/upload", content=b"x" * 1001)).status_code == 413
+        assert (await client.post("/echo", content=_chunks(8, 100))).status_code == 413
@@ -132,3 +132,172 @@ async def test_chat_with_context_summary(client: AsyncClient):
             mock_anthropic.chat.assert_called_once()
             call_kwargs = mock_anthropic.chat.call_args[1]
             assert call_kwargs["context_summary"] == "Earlier: user felt stressed about work."
+
+
+def _parse_sse(body: str) -> list[tuple[str, dict]]:
+    import json
+
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_with_mock_ai(client: AsyncClient):
+    """Streaming endpoint emits token events followed by a done event."""
+    with patch("app.api.chat.settings") as mock_settings:
+        mock_settings.use_mock_ai = True
+        response = await client.post(
+            "/api/chat/stream",
+            json={"messages": [{"role": "user", "content": "Hello"}], "user_id": "test"},
+        )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(response.text)
+    tokens = [data["text"] for name, data in events if name == "token"]
+    assert events[-1][0] == "done"
+    assert events[-1][1]["message"] == "".join(tokens)
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_reports_upstream_errors(client: AsyncClient):
+    """An upstream failure mid-stream becomes an error event."""
+    async def failing_stream(*args, **kwargs):
+        yield "Partial "
+        raise RuntimeError("upstream broke")
+
+    with patch("app.api.chat.settings") as mock_settings:
+        mock_settings.use_mock_ai = False
+        with patch("app.api.chat.anthropic_service") as mock_anthropic:
+            mock_anthropic.admit = AsyncMock()
+            mock_anthropic.stream_chat = failing_stream
+            response = await client.post(
+                "/api/chat/stream",
+                json={"messages": [{"role": "user", "content": "Hi"}], "user_id": "test"},
+            )
+    events = _parse_sse(response.text)
+    assert events[0] == ("token", {"text": "Partial "})
+    assert events[-1] == ("error", {"detail": "upstream broke"})
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_closes_upstream_on_disconnect():
+    """When the client disconnects, the token source is closed immediately."""
+    from app.api.chat import _sse_events
+
+    closed = []
+
+    async def upstream():
+        try:
+            for i in range(100):
+                yield f"t{i} "
+        finally:
+            closed.append(True)
+
+    class DisconnectingRequest:
+        def __init__(self):
+            self.checks = 0
+
+        async def is_disconnected(self):
+            self.checks += 1
+            return self.checks > 2
+
+    events = [e async for e in _sse_events(upstream(), DisconnectingRequest())]
+    assert len(events) == 2
+    assert closed == [True]
+
+
+@pytest.mark.asyncio
+async def test_session_chat_persists_both_turns(client: AsyncClient):
+    """Session chat stores the user message and the reply server-side."""
+    create = await client.post("/api/sessions", json={"user_id": "chat-user"})
+    sid = create.json()["id"]
+    with patch("app.api.chat.settings") as mock_settings:
+        mock_settings.use_mock_ai = True
+        res = await client.post(
+            f"/api/sessions/{sid}/chat?user_id=chat-user",
+            json={"message": "Today was long"},
+        )
+    assert res.status_code == 200
+    data = res.json()
+    session = (await client.get(f"/api/sessions/{sid}?user_id=chat-user")).json()
+    assert [m["role"] for m in session["messages"]] == ["user", "assistant"]
+    assert session["messages"][0]["id"] == data["user_message_id"]
+    assert session["messages"][1]["content"] == data["message"]
+    assert session["title"] == "Today was long"
+
+
+@pytest.mark.asyncio
+async def test_session_chat_sends_stored_history(client: AsyncClient):
+    """Follow-up turns reuse the stored history instead of a client payload."""
+    create = await client.post("/api/sessions", json={"user_id": "chat-user"})
+    sid = create.json()["id"]
+    with patch("app.api.chat.settings") as mock_settings:
+        mock_settings.use_mock_ai = True
+        with patch("app.api.chat.mock_ai_service") as mock_ai:
+            mock_ai.chat = AsyncMock(side_effect=["First reply", "Second reply"])
+            await client.post(f"/api/sessions/{sid}/chat?user_id=chat-user", json={"message": "One"})
+            await client.post(f"/api/sessions/{sid}/chat?user_id=chat-user", json={"message": "Two"})
+    sent = mock_ai.chat.call_args[0][0]
+    assert [m["content"] for m in sent] == ["One", "First reply", "Two"]
+
+
+@pytest.mark.asyncio
+async def test_session_chat_sees_replaced_history(client: AsyncClient):
+    """Replacing messages via PUT invalidates the cached conversation."""
+    create = await client.post("/api/sessions", json={"user_id": "chat-user"})
+    sid = create.json()["id"]
+    with patch("app.api.chat.settings") as mock_settings:
+        mock_settings.use_mock_ai = True
+        await client.post(f"/api/sessions/{sid}/chat?user_id=chat-user", json={"message": "Old"})
+        await client.put(
+            f"/api/sessions/{sid}/messages?user_id=chat-user",
+            json={"messages": [{"role": "user", "content": "Rewritten", "timestamp": "2024-01-15T12:00:00Z"}]},
+        )
+        with patch("app.api.chat.mock_ai_service") as mock_ai:
+            mock_ai.chat = AsyncMock(return_value="Ok")
+            await client.post(f"/api/sessions/{sid}/chat?user_id=chat-user", json={"message": "New"})
+    sent = mock_ai.chat.call_args[0][0]
+    assert [m["content"] for m in sent] == ["Rewritten", "New"]
+
+
+@pytest.mark.asyncio
+async def test_session_chat_404_wrong_user(client: AsyncClient):
+    """Session chat rejects sessions owned by someone else."""
+    create = await client.post("/api/sessions", json={"user_id": "owner"})
+    sid = create.json()["id"]
+    res = await client.post(f"/api/sessions/{sid}/chat?user_id=intruder", json={"message": "Hi"})
+    assert res.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_ai_stats_reports_single_flight_counters(client: AsyncClient):
+    """AI stats expose how many upstream calls were deduplicated."""
+    response = await client.get("/api/ai/stats")
+    assert response.status_code == 200
+    assert set(response.json()["single_flight"]) == {"calls", "deduplicated", "in_flight"}
+
+
+@pytest.mark.asyncio
+async def test_chat_fits_long_messages_into_token_budget(client: AsyncClient):
+    """Thirty very long messages are cut down to what fits the input-token budget."""
+    from app.core.context_builder import estimate_tokens
+    from app.core.config import settings as real_settings
+
+    with patch("app.api.chat.settings") as mock_settings:
+        mock_settings.use_mock_ai = True
+        with patch("app.api.chat.mock_ai_service") as mock_ai:
+            mock_ai.chat = AsyncMock(return_value="Thanks for sharing.")
+            messages = [
+                {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i} " + "long " * 1990}
+                for i in range(30)
+            ]
+            response = await client.post("/api/chat", json={"messages": messages, "user_id": "test"})
+    assert response.status_code == 200
+    sent = mock_ai.chat.call_args[0][0]
+    assert len(sent) < 30
+    assert sent[0]["role"] == "user"
+    assert sent[-1]["content"] == messages[-1]["content"]
+    assert sum(estimate_tokens(m["content"]) for m in sent) <= real_settings.context_token_budget
@@ -0,0 +1,137 @@
+"""Tests for the AI provider circuit breaker and degraded mode."""
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpen, ProviderUnavailable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def _call(breaker: CircuitBreaker, error: BaseException | None = None) -> None:
+    async with breaker.guard(lambda e: isinstance(e, ProviderUnavailable)):
+        if error:
+            raise error
+
+
+def _failing_stub_service(errors: int, threshold: int = 2):
+    """Service over a stub that fails the next ``errors`` calls, without SDK retries."""
+    from tests.stub_model_server import create_stub_app, stub_service
+
+    stub = create_stub_app(reply="Tell me more.")
+    stub.state.errors_remaining = errors
+    service = stub_service(stub)
+    service.client = service.client.with_options(max_retries=0)
+    service.breaker = CircuitBreaker(failure_threshold=threshold, reset_seconds=30.0)
+    return stub, service
+
+
+@pytest.mark.asyncio
+async def test_opens_after_consecutive_failures_and_fails_fast():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=10.0, clock=clock)
+    for _ in range(3):
+        with pytest.raises(ProviderUnavailable):
+            await _call(breaker, ProviderUnavailable("down"))
+    assert breaker.state == "open"
+
+    clock.now += 4
+    with pytest.raises(CircuitOpen) as exc:
+        await _call(breaker)
+    assert exc.value.retry_after == 6
+    assert breaker.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, clock=FakeClock())
+    with pytest.raises(ProviderUnavailable):
+        await _call(breaker, ProviderUnavailable("down"))
+    await _call(breaker)
+    with pytest.raises(ProviderUnavailable):
+        await _call(breaker, ProviderUnavailable("down"))
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_other_errors_do_not_count():
+    breaker = CircuitBreaker(failure_threshold=1, clock=FakeClock())
+    with pytest.raises(ValueError):
+        await _call(breaker, ValueError("bad request"))
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_closes_or_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10.0, clock=clock)
+    with pytest.raises(ProviderUnavailable):
+        await _call(breaker, ProviderUnavailable("down"))
+
+    clock.now += 10
+    with pytest.raises(ProviderUnavailable):
+        await _call(breaker, ProviderUnavailable("still down"))
+    assert breaker.state == "open"
+    assert breaker.times_opened == 2  # A failed probe reopens it
+
+    clock.now += 10
+    async with breaker.guard(lambda e: True):
+        assert breaker.state == "half_open"
+        with pytest.raises(CircuitOpen):
+            breaker.check()  # Only one probe at a time
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_provider_errors_open_the_circuit_and_stop_upstream_calls():
+    stub, service = _failing_stub_service(errors=5)
+    messages = [{"role": "user", "content": "Hello"}]
+    for _ in range(2):
+        with pytest.raises(ProviderUnavailable):
+            await service.chat(messages)
+    with pytest.raises(CircuitOpen):
+        await service.chat(messages)
+    assert len(stub.state.requests) == 2
+
+    # Summaries degrade to the local heuristic instead of failing
+    summary = await service.summarize([{"role": "user", "content": "I slept badly again."}])
+    assert "slept badly" in summary
+    assert len(stub.state.requests) == 2
+    await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_chat_degrades_to_fallback_reply_while_circuit_is_open(client):
+    stub, service = _failing_stub_service(errors=5, threshold=1)
+    payload = {"messages": [{"role": "user", "content": "Hi"}], "user_id": "breaker-user"}
+    with patch("app.api.chat.settings") as mock_settings, patch("app.api.chat.anthropic_service", service):
+        mock_settings.use_mock_ai = False
+        first = await client.post("/api/chat", json=payload)
+        second = await client.post("/api/chat", json=payload)
+        stream = await client.post("/api/chat/stream", json=payload)
+    assert first.status_code == second.status_code == 200
+    assert first.json()["degraded"] and second.json()["degraded"]
+    assert len(stub.state.requests) == 1
+
+    done = [block for block in stream.text.split("\n\n") if block.startswith("event: done")]
+    assert json.loads(done[0].split("data: ", 1)[1])["degraded"] is True
+    await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_health_reports_degraded_while_circuit_is_open(client):
+    from app.core.anthropic_service import anthropic_service
+
+    with patch.object(anthropic_service, "breaker", CircuitBreaker(failure_threshold=1)) as breaker:
+        breaker._failure()
+        response = await client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "degraded"
+    assert response.json()["ai_circuit"]["state"] == "open"
@@ -0,0 +1,73 @@
+"""Tests for response compression."""
+import gzip
+
+import pytest
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+from httpx import ASGITransport, AsyncClient
+
+from app.core.http_cache import is_not_modified, make_etag, set_etag
+from app.middleware.compression import CompressionMiddleware
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/big")
+    async def big(request: Request, response: Response):
+        etag = make_etag("big")
+        if is_not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        set_etag(response, etag)
+        return {"text": "journal " * 500}
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/stream")
+    async def stream():
+        async def events():
+            for _ in range(3):
+                yield "data: " + "token " * 300 + "\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return app
+
+
+async def _get(path: str, **headers):
+    async with AsyncClient(transport=ASGITransport(app=_app()), base_url="http://test") as client:
+        # Read the raw bytes, so the test sees what goes on the wire
+        async with client.stream("GET", path, headers=headers) as response:
+            return response, b"".join([chunk async for chunk in response.aiter_raw()])
+
+
+@pytest.mark.asyncio
+async def test_large_json_is_gzipped():
+    response, raw = await _get("/big", **{"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == len(raw) < 4000
+    assert gzip.decompress(raw).startswith(b'{"text":"journal ')
+
+
+@pytest.mark.asyncio
+async def test_compressed_etag_still_revalidates():
+    response, _ = await _get("/big", **{"Accept-Encoding": "gzip"})
+    etag = response.headers["etag"]
+    assert etag == make_etag("big")[:-1] + '-gzip"'
+    cached, raw = await _get("/big", **{"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert raw == b""
+
+
+@pytest.mark.asyncio
+async def test_small_refused_and_streamed_bodies_pass_through():
+    response, _ = await _get("/small", **{"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    response, _ = await _get("/big", **{"Accept-Encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in response.headers
+    response, raw = await _get("/stream", **{"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert raw.count(b"data: ") == 3
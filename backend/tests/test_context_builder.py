@@ -0,0 +1,56 @@
+"""Tests for the token-budget context builder."""
+from app.core.context_builder import (
+    MESSAGE_OVERHEAD_TOKENS,
+    build_context,
+    chunk_by_budget,
+    estimate_tokens,
+)
+
+
+def _turns(contents):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": c} for i, c in enumerate(contents)]
+
+
+def test_estimate_tokens_is_about_four_bytes_per_token():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("a" * 4000) == 1000
+    assert estimate_tokens("日本") == 2  # 6 UTF-8 bytes
+
+
+def test_short_messages_are_capped_by_max_messages():
+    window = build_context(_turns([f"m{i}" for i in range(50)]), budget=100_000, max_messages=30)
+    assert len(window.messages) == 30
+    assert window.messages[0]["content"] == "m20"
+    assert window.dropped == 20
+
+
+def test_long_messages_are_capped_by_token_budget():
+    messages = _turns(["x" * 10_000 for _ in range(30)])  # 2500 tokens each
+    window = build_context(messages, budget=12_000, max_messages=30)
+    assert window.tokens <= 12_000
+    assert window.messages[0]["role"] == "user"
+    assert window.messages[-1] is messages[-1]
+    assert window.dropped == 30 - len(window.messages)
+    assert window.dropped_tokens == window.dropped * (2500 + MESSAGE_OVERHEAD_TOKENS)
+
+
+def test_system_prompt_and_summary_reserve_budget():
+    messages = _turns(["y" * 400 for _ in range(10)])  # 104 tokens each
+    plain = build_context(messages, budget=1000, max_messages=30)
+    reserved = build_context(messages, budget=1000, max_messages=30, system_prompt="s" * 800, summary="z" * 800)
+    assert len(reserved.messages) < len(plain.messages)
+    assert reserved.tokens <= 1000
+
+
+def test_newest_message_is_kept_even_when_over_budget():
+    window = build_context(_turns(["huge" * 10_000]), budget=100, max_messages=30)
+    assert len(window.messages) == 1
+    assert window.dropped == 0
+
+
+def test_chunk_by_budget_keeps_order_and_limits():
+    messages = _turns(["w" * 400 for _ in range(7)])  # 104 tokens each
+    chunks = chunk_by_budget(messages, budget=250)
+    assert [len(chunk) for chunk in chunks] == [2, 2, 2, 1]
+    assert [m for chunk in chunks for m in chunk] == messages
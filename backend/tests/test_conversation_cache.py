@@ -0,0 +1,28 @@
+"""Tests for the in-process conversation LRU."""
+from datetime import datetime, timedelta
+
+from app.core.conversation_cache import ConversationCache
+
+
+def test_cache_hit_requires_matching_updated_at():
+    """An entry tagged with a stale updated_at is treated as a miss."""
+    cache = ConversationCache(max_sessions=2, window=3)
+    stamp = datetime(2024, 1, 15, 12, 0, 0)
+    cache.put("s1", stamp, [{"role": "user", "content": "Hi"}])
+    assert cache.get("s1", stamp) == [{"role": "user", "content": "Hi"}]
+    assert cache.get("s1", stamp + timedelta(seconds=1)) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_keeps_window_and_evicts_least_recent():
+    """Entries are trimmed to the window and evicted in LRU order."""
+    cache = ConversationCache(max_sessions=2, window=2)
+    stamp = datetime(2024, 1, 15)
+    msgs = [{"role": "user", "content": str(i)} for i in range(5)]
+    cache.put("a", stamp, msgs)
+    cache.put("b", stamp, msgs)
+    cache.get("a", stamp)
+    cache.put("c", stamp, msgs)
+    assert cache.get("b", stamp) is None
+    assert [m["content"] for m in cache.get("a", stamp)] == ["3", "4"]
+    assert len(cache) == 2
@@ -0,0 +1,143 @@
+"""Tests for rolling conversation summaries."""
+import uuid
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.conversation_summaries import fold_session, load_summary
+from app.db import async_session
+
+
+async def _session_with_messages(client: AsyncClient, user_id: str, count: int, start: int = 0) -> str:
+    sid = (await client.post("/api/sessions", json={"user_id": user_id})).json()["id"]
+    await _append(client, sid, user_id, count, start)
+    return sid
+
+
+async def _append(client: AsyncClient, sid: str, user_id: str, count: int, start: int) -> None:
+    messages = [
+        {
+            "id": f"{sid}-{i}",
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"message {i}",
+            "timestamp": f"2024-01-01T{i // 60:02d}:{i % 60:02d}:00Z",
+        }
+        for i in range(start, start + count)
+    ]
+    res = await client.post(f"/api/sessions/{sid}/messages:append?user_id={user_id}", json={"messages": messages})
+    assert res.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_fold_only_sends_messages_new_since_last_fold(client: AsyncClient):
+    user_id = f"fold-{uuid.uuid4()}"
+    sid = await _session_with_messages(client, user_id, 40)
+
+    with patch("app.core.conversation_summaries.anthropic_service") as service:
+        service.summarize = AsyncMock(side_effect=["first summary", "second summary"])
+        assert await fold_session(sid, keep=29) == 11
+        await _append(client, sid, user_id, 4, start=40)
+        assert await fold_session(sid, keep=29) == 4
+        assert await fold_session(sid, keep=29) == 0
+
+    first, second = service.summarize.call_args_list
+    assert [m["content"] for m in first.args[0]] == [f"message {i}" for i in range(11)]
+    assert first.kwargs["previous_summary"] is None
+    assert [m["content"] for m in second.args[0]] == [f"message {i}" for i in range(11, 15)]
+    assert second.kwargs["previous_summary"] == "first summary"
+    async with async_session() as db:
+        assert await load_summary(db, sid) == "second summary"
+
+
+@pytest.mark.asyncio
+async def test_short_session_is_not_summarized(client: AsyncClient):
+    sid = await _session_with_messages(client, f"fold-{uuid.uuid4()}", 10)
+    with patch("app.core.conversation_summaries.anthropic_service") as service:
+        service.summarize = AsyncMock()
+        assert await fold_session(sid, keep=29) == 0
+    service.summarize.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_stored_summary_is_injected_into_chat(client: AsyncClient):
+    """Session chat and /api/chat with a session_id send the stored summary as context."""
+    user_id = f"fold-{uuid.uuid4()}"
+    sid = await _session_with_messages(client, user_id, 40)
+    with patch("app.core.conversation_summaries.anthropic_service") as service:
+        service.summarize = AsyncMock(return_value="They talked about moving house.")
+        await fold_session(sid, keep=29)
+
+    with patch("app.api.chat.settings") as mock_settings, patch("app.api.chat.anthropic_service") as mock_anthropic, \
+            patch("app.api.chat.fold_session", AsyncMock()) as fold:
+        mock_settings.use_mock_ai = False
+        mock_anthropic.chat = AsyncMock(return_value="Tell me more.")
+        res = await client.post(f"/api/sessions/{sid}/chat?user_id={user_id}", json={"message": "Boxes everywhere"})
+        assert res.status_code == 200
+        assert mock_anthropic.chat.call_args.kwargs["context_summary"] == "They talked about moving house."
+        fold.assert_awaited_once_with(sid, 30)  # The 29 messages sent, and the reply
+
+        res = await client.post(
+            "/api/chat",
+            json={"messages": [{"role": "user", "content": "Hi"}], "user_id": user_id, "session_id": sid},
+        )
+        assert res.status_code == 200
+        assert mock_anthropic.chat.call_args.kwargs["context_summary"] == "They talked about moving house."
+
+        # Another user naming the session gets no summary, and does not start a fold of it
+        fold.reset_mock()
+        await client.post(
+            "/api/chat",
+            json={"messages": [{"role": "user", "content": "Hi"}], "user_id": "someone-else", "session_id": sid},
+        )
+        assert mock_anthropic.chat.call_args.kwargs["context_summary"] is None
+        mock_settings.use_mock_ai = True
+        await client.post(
+            "/api/chat/stream",
+            json={"messages": [{"role": "user", "content": "Hi"}], "user_id": "someone-else", "session_id": sid,
+                  "context_summary": "Mine"},
+        )
+        fold.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_long_messages_left_out_by_the_token_budget_are_folded(client: AsyncClient):
+    """Every stored message is either in the next window or in the summary, however few fit the budget."""
+    from sqlalchemy import select
+
+    from app.models.db_models import ConversationSummary
+
+    user_id = f"fold-{uuid.uuid4()}"
+    sid = (await client.post("/api/sessions", json={"user_id": user_id})).json()["id"]
+    await client.post(f"/api/sessions/{sid}/messages:append?user_id={user_id}", json={"messages": [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"long {i} " + "x" * 4000,
+         "timestamp": f"2024-01-01T00:{i:02d}:00Z"}
+        for i in range(20)
+    ]})
+
+    with patch("app.api.chat.settings") as mock_settings, patch("app.api.chat.anthropic_service") as mock_anthropic, \
+            patch("app.core.conversation_summaries.anthropic_service") as summarizer:
+        mock_settings.use_mock_ai = False
+        mock_anthropic.chat = AsyncMock(return_value="Go on.")
+        summarizer.summarize = AsyncMock(return_value="Earlier: long days.")
+        res = await client.post(f"/api/sessions/{sid}/chat?user_id={user_id}", json={"message": "And today?"})
+        assert res.status_code == 200
+
+    sent = mock_anthropic.chat.call_args.args[0]
+    assert len(sent) < 20  # The budget, not the message cap, cut the window
+    async with async_session() as db:
+        summary = await db.scalar(select(ConversationSummary).where(ConversationSummary.session_id == sid))
+    assert summary.message_count + len(sent) + 1 == 22  # 20 stored, the new turn and its reply
+
+
+@pytest.mark.asyncio
+async def test_deleting_session_deletes_its_summary(client: AsyncClient):
+    user_id = f"fold-{uuid.uuid4()}"
+    sid = await _session_with_messages(client, user_id, 35)
+    with patch("app.core.conversation_summaries.anthropic_service") as service:
+        service.summarize = AsyncMock(return_value="Summary")
+        await fold_session(sid, keep=29)
+
+    assert (await client.delete(f"/api/sessions/{sid}?user_id={user_id}")).status_code == 200
+    async with async_session() as db:
+        assert await load_summary(db, sid) is None
@@ -0,0 +1,133 @@
+"""Tests for the NDJSON journal export and import."""
+import json
+import uuid
+
+import pytest
+from httpx import AsyncClient
+
+
+def _msg(content: str, minute: int) -> dict:
+    return {"id": str(uuid.uuid4()), "role": "user", "content": content, "timestamp": f"2024-02-01T09:{minute:02d}:00Z"}
+
+
+async def _journal(client: AsyncClient, user: str, sessions: int, messages: int) -> list[str]:
+    ids = []
+    for s in range(sessions):
+        sid = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+        batch = [_msg(f"Session {s} line {i}", i) for i in range(messages)]
+        await client.put(f"/api/sessions/{sid}/messages", params={"user_id": user}, json={"messages": batch})
+        ids.append(sid)
+    return ids
+
+
+async def _export(client: AsyncClient, user: str) -> list[dict]:
+    res = await client.get("/api/export", params={"user_id": user})
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in res.text.splitlines()]
+
+
+def _ndjson(lines: list[dict]):
+    async def chunks():
+        body = "".join(json.dumps(line) + "\n" for line in lines).encode()
+        for i in range(0, len(body), 100):  # Lines split across chunks
+            yield body[i:i + 100]
+    return chunks()
+
+
+@pytest.mark.asyncio
+async def test_export_streams_sessions_with_their_messages(client: AsyncClient):
+    user = f"export-{uuid.uuid4()}"
+    ids = await _journal(client, user, 3, 4)
+    await client.post("/api/sessions", json={"user_id": user})  # Empty sessions are exported too
+    lines = await _export(client, user)
+
+    sessions = [line for line in lines if line["type"] == "session"]
+    assert len(sessions) == 4
+    assert set(ids) <= {s["id"] for s in sessions}
+    current = None
+    for line in lines:
+        if line["type"] == "session":
+            current = line["id"]
+        else:
+            assert line["session_id"] == current
+    assert sum(line["type"] == "message" for line in lines) == 12
+
+
+@pytest.mark.asyncio
+async def test_export_import_round_trip(client: AsyncClient):
+    source, target = f"export-{uuid.uuid4()}", f"import-{uuid.uuid4()}"
+    await _journal(client, source, 2, 3)
+    lines = await _export(client, source)
+    # The same ids cannot move to another user, so give the copy fresh ones
+    renamed = {line["id"]: str(uuid.uuid4()) for line in lines}
+    copied = [
+        {**line, "id": renamed[line["id"]], **({"session_id": renamed[line["session_id"]]} if "session_id" in line else {})}
+        for line in lines
+    ]
+    res = await client.post("/api/import", params={"user_id": target}, content=_ndjson(copied))
+    assert res.status_code == 200
+    assert res.json() == {"sessions_imported": 2, "sessions_skipped": 0, "messages_imported": 6, "messages_skipped": 0}
+
+    exported = await _export(client, target)
+    assert [{k: v for k, v in line.items() if k not in ("id", "session_id")} for line in exported] == [
+        {k: v for k, v in line.items() if k not in ("id", "session_id")} for line in lines
+    ]
+
+    # Importing again changes nothing
+    again = await client.post("/api/import", params={"user_id": target}, content=_ndjson(copied))
+    assert again.json()["sessions_skipped"] == 2
+    assert len(await _export(client, target)) == len(exported)
+
+
+@pytest.mark.asyncio
+async def test_import_never_writes_into_other_users_sessions(client: AsyncClient):
+    owner, intruder = f"owner-{uuid.uuid4()}", f"intruder-{uuid.uuid4()}"
+    [sid] = await _journal(client, owner, 1, 1)
+    lines = [
+        {"type": "session", "id": sid, "title": "Mine now"},
+        {"type": "message", "session_id": sid, "role": "user", "content": "Injected"},
+    ]
+    res = await client.post("/api/import", params={"user_id": intruder}, content=_ndjson(lines))
+    assert res.json() == {"sessions_imported": 0, "sessions_skipped": 1, "messages_imported": 0, "messages_skipped": 1}
+    assert [m["content"] for m in (await client.get(f"/api/sessions/{sid}", params={"user_id": owner})).json()["messages"]] == [
+        "Session 0 line 0"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_import_reports_the_bad_line(client: AsyncClient):
+    user = f"import-{uuid.uuid4()}"
+    lines = [
+        {"type": "session", "id": str(uuid.uuid4())},
+        {"type": "message", "session_id": "x", "role": "user", "content": "Hi", "timestamp": 12},
+    ]
+    res = await client.post("/api/import", params={"user_id": user}, content=_ndjson(lines))
+    assert res.status_code == 422
+    assert res.json()["detail"][0]["loc"][:3] == ["body", "line", 2]
+
+    res = await client.post("/api/import", params={"user_id": user}, content=b'{"type": "session", "id": "a"}\nnot json\n')
+    assert res.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_import_merges_new_messages_into_own_sessions(client: AsyncClient):
+    from datetime import datetime
+
+    from app.core.conversation_cache import conversation_cache
+
+    user = f"merge-{uuid.uuid4()}"
+    [sid] = await _journal(client, user, 1, 2)
+    lines = await _export(client, user)
+    before = (await client.get(f"/api/sessions/{sid}", params={"user_id": user})).json()
+    conversation_cache.put(sid, datetime.fromisoformat(before["updated_at"]), before["messages"])
+
+    added = {"type": "message", "id": str(uuid.uuid4()), "session_id": sid, "role": "user", "content": "From my phone"}
+    res = await client.post("/api/import", params={"user_id": user}, content=_ndjson([*lines, added, added]))
+    # The two messages already present and the repeated line are not counted as imported
+    assert res.json() == {"sessions_imported": 0, "sessions_skipped": 1, "messages_imported": 1, "messages_skipped": 0}
+
+    after = (await client.get(f"/api/sessions/{sid}", params={"user_id": user})).json()
+    assert len(after["messages"]) == 3
+    assert after["updated_at"] > before["updated_at"]
+    assert conversation_cache.get(sid, datetime.fromisoformat(before["updated_at"])) is None
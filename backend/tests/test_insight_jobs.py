@@ -0,0 +1,133 @@
+"""Tests for the insights job queues and worker pool."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.insight_jobs import AsyncioJobQueue, DatabaseJobQueue, JobWorkerPool
+from app.models.db_models import Base, InsightJob
+
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    """Isolated database, so queued jobs left by other tests are not claimed."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def _add_job(session_factory, **values) -> str:
+    async with session_factory() as db:
+        job = InsightJob(user_id="jobs-user", request="{}", **values)
+        db.add(job)
+        await db.commit()
+        return job.id
+
+
+@pytest.mark.asyncio
+async def test_database_queue_claims_each_job_once(session_factory):
+    """Concurrent claimers never get the same job."""
+    job_ids = {await _add_job(session_factory) for _ in range(3)}
+    queue = DatabaseJobQueue(session_factory, poll_interval=0)
+
+    claimed = await asyncio.gather(*(queue.claim() for _ in range(6)))
+
+    assert {job_id for job_id in claimed if job_id} == job_ids
+    assert len([job_id for job_id in claimed if job_id]) == 3
+
+
+@pytest.mark.asyncio
+async def test_database_queue_requeues_only_expired_running_jobs(session_factory):
+    stale = await _add_job(session_factory, status="running", attempts=1)
+    fresh = await _add_job(session_factory, status="running", attempts=1)
+    async with session_factory() as db:
+        await db.execute(
+            update(InsightJob).where(InsightJob.id == stale).values(updated_at=datetime.utcnow() - timedelta(hours=1))
+        )
+        await db.commit()
+
+    await DatabaseJobQueue(session_factory).recover()
+
+    async with session_factory() as db:
+        assert (await db.get(InsightJob, stale)).status == "queued"
+        assert (await db.get(InsightJob, fresh)).status == "running"
+
+
+@pytest.mark.asyncio
+async def test_database_queue_reclaims_expired_leases_while_running(session_factory):
+    """A job orphaned after startup (its process died) is picked up without a restart."""
+    queue = DatabaseJobQueue(session_factory, poll_interval=0)
+    await queue.recover()
+    orphaned = await _add_job(
+        session_factory, status="running", attempts=1, updated_at=datetime.utcnow() - timedelta(hours=1)
+    )
+    assert await queue.claim() is None  # Not due for a sweep yet
+
+    queue._next_sweep = 0.0
+    assert await queue.claim() == orphaned
+
+
+@pytest.mark.asyncio
+async def test_memory_queue_recovery_requeues_interrupted_jobs(session_factory):
+    running = await _add_job(session_factory, status="running", attempts=1)
+    queued = await _add_job(session_factory)
+    exhausted = await _add_job(session_factory, status="running", attempts=3)
+    queue = AsyncioJobQueue(session_factory)
+
+    assert await queue.recover() == 2
+    assert {await queue.claim(), await queue.claim()} == {running, queued}
+    async with session_factory() as db:
+        assert (await db.get(InsightJob, exhausted)).status == "failed"
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_bounds_concurrency_and_stores_results(session_factory):
+    active = 0
+    peak = 0
+
+    async def handler(payload, report):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await report("working")
+        await asyncio.sleep(0.02)
+        active -= 1
+        return '{"ok": true}'
+
+    pool = JobWorkerPool(handler, workers=2, queue_factory=lambda: AsyncioJobQueue(session_factory))
+    job_ids = [await _add_job(session_factory) for _ in range(5)]
+    for job_id in job_ids:
+        await pool.submit(job_id)
+    for _ in range(200):
+        async with session_factory() as db:
+            jobs = [await db.get(InsightJob, job_id) for job_id in job_ids]
+        if all(job.status == "succeeded" for job in jobs):
+            break
+        await asyncio.sleep(0.01)
+    await pool.stop()
+
+    assert [job.result for job in jobs] == ['{"ok": true}'] * 5
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_stop_lets_running_jobs_finish_within_grace(session_factory):
+    started = asyncio.Event()
+
+    async def handler(payload, report):
+        started.set()
+        await asyncio.sleep(0.1)
+        return '{"ok": true}'
+
+    pool = JobWorkerPool(handler, workers=1, queue_factory=lambda: AsyncioJobQueue(session_factory))
+    job_id = await _add_job(session_factory)
+    await pool.submit(job_id)
+    await started.wait()
+    await pool.stop(grace=5)
+
+    async with session_factory() as db:
+        assert (await db.get(InsightJob, job_id)).status == "succeeded"
@@ -1,9 +1,20 @@
 """Tests for insights API endpoint."""
+import uuid
+
 import pytest
 from unittest.mock import patch, AsyncMock, MagicMock
 from httpx import AsyncClient
 
 
+@pytest.fixture(autouse=True)
+async def stop_job_workers():
+    """Workers belong to the test's event loop; stop them before it closes."""
+    yield
+    from app.api.insights import insight_jobs
+
+    await insight_jobs.stop()
+
+
 @pytest.mark.asyncio
 async def test_insights_unified_returns_503_when_no_api_key(client: AsyncClient):
     """Insights returns 503 when Anthropic client is not configured."""
@@ -31,23 +42,15 @@ async def test_insights_unified_returns_503_when_no_api_key(client: AsyncClient)
 
 @pytest.mark.asyncio
 async def test_insights_unified_success_with_mocked_anthropic(client: AsyncClient):
-    """Insights endpoint returns unified insights when Anthropic is mocked."""
+    """Counts come from local analysis; the model only labels themes and writes prose."""
     mock_response = """
     {
       "central_theme": "Work Stress",
       "central_emoji": "💼",
       "theme_description": "Work-related stress dominates your reflections.",
       "theme_color": "#9333ea",
-      "related_words": [
-        {"word": "work", "size": 5},
-        {"word": "stress", "size": 4},
-        {"word": "deadline", "size": 3}
-      ],
-      "core_themes": [
-        {"theme": "Work Stress", "emoji": "💼", "frequency": 3, "sentiment": "negative", "dates": ["Jan 15"]}
-      ],
-      "connections": [
-        {"from_theme": "Work Stress", "to_theme": "Anxiety", "strength": 4}
+      "themes": [
+        {"key": "work", "theme": "Work Stress", "emoji": "💼", "sentiment": "negative"}
       ],
       "narrative": "Your journal reveals patterns of work-related stress.",
       "hidden_pattern": "You tend to journal more on Mondays.",
@@ -62,19 +65,28 @@ async def test_insights_unified_success_with_mocked_anthropic(client: AsyncClien
             "/api/insights/unified",
             json={
                 "entries": [
-                    {"date": "2024-01-15", "message_count": 2, "sample_messages": ["Work is hard", "Deadline tomorrow"]},
+                    {"date": "2024-01-15", "message_count": 2, "sample_messages": ["Work deadline stress", "Work is hard"]},
+                    {"date": "2024-01-16", "message_count": 1, "sample_messages": ["Deadline tomorrow at work"]},
                 ],
-                "total_days_active": 1,
-                "total_messages": 2,
+                "total_days_active": 2,
+                "total_messages": 3,
             },
         )
         assert response.status_code == 200
         data = response.json()
         assert data["central_theme"] == "Work Stress"
         assert data["central_emoji"] == "💼"
-        assert len(data["related_words"]) == 3
-        assert len(data["core_themes"]) == 1
-        assert len(data["connections"]) == 1
+        assert data["related_words"][0] == {"word": "work", "size": 5}
+        assert {w["word"] for w in data["related_words"]} == {"work", "deadline", "stress", "hard", "tomorrow"}
+        assert data["core_themes"] == [
+            {"theme": "Work Stress", "emoji": "💼", "frequency": 2, "sentiment": "negative", "dates": ["2024-01-15", "2024-01-16"]}
+        ]
+        assert data["connections"] == []
+
+        prompt = mock_anthropic.chat.call_args[0][0][0]["content"]
+        assert "FULL TEXT" not in prompt
+        assert 'key "work"' in prompt
+        assert mock_anthropic.chat.call_args[1]["max_tokens"] <= 700
 
 
 @pytest.mark.asyncio
@@ -107,3 +119,144 @@ async def test_insights_invalid_payload(client: AsyncClient):
         json={"entries": "not-a-list", "total_days_active": 1, "total_messages": 0},
     )
     assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_insights_unified_repeat_request_is_served_from_cache(client: AsyncClient):
+    """An identical request is answered from the cache without calling the model."""
+    from app.core.insights_cache import insights_cache
+
+    insights_cache.clear()
+    mock_response = '{"central_theme":"Calm","central_emoji":"🌿","theme_description":"D","theme_color":"#0f0","related_words":[],"core_themes":[],"connections":[],"narrative":"N","hidden_pattern":"P","future_prompt":"Q"}'
+    payload = {
+        "entries": [{"date": "2024-02-01", "message_count": 1, "sample_messages": ["A quiet walk"]}],
+        "total_days_active": 1,
+        "total_messages": 1,
+    }
+    with patch("app.api.insights.anthropic_service") as mock_anthropic:
+        mock_anthropic.client = object()
+        mock_anthropic.chat = AsyncMock(return_value=mock_response)
+        first = await client.post("/api/insights/unified", json=payload)
+        second = await client.post("/api/insights/unified", json=payload)
+
+    assert first.json() == second.json()
+    mock_anthropic.chat.assert_awaited_once()
+    stats = (await client.get("/api/insights/cache/stats")).json()
+    assert stats["hits"] >= 1
+
+
+async def _wait_for_job(client: AsyncClient, job_id: str, user_id: str, timeout: float = 5.0) -> dict:
+    import asyncio
+
+    for _ in range(int(timeout / 0.02)):
+        job = (await client.get(f"/api/insights/jobs/{job_id}", params={"user_id": user_id})).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish: {job}")
+
+
+@pytest.mark.asyncio
+async def test_insights_job_is_accepted_immediately_and_processed_in_background(client: AsyncClient):
+    """POST returns a queued job; a worker fills in the result."""
+    from app.core.insights_cache import insights_cache
+
+    insights_cache.clear()
+    mock_response = '{"central_theme":"Growth","central_emoji":"🌱","theme_description":"D","theme_color":"#0f0","themes":[],"narrative":"N","hidden_pattern":"P","future_prompt":"Q"}'
+    payload = {
+        "entries": [{"date": "2024-03-01", "message_count": 1, "sample_messages": ["Started a garden today"]}],
+        "total_days_active": 1,
+        "total_messages": 1,
+        "user_id": "jobs-user",
+    }
+    with patch("app.api.insights.anthropic_service") as mock_anthropic:
+        mock_anthropic.client = object()
+        mock_anthropic.chat = AsyncMock(return_value=mock_response)
+        response = await client.post("/api/insights/jobs", json=payload)
+        assert response.status_code == 202
+        created = response.json()
+        assert created["status"] == "queued"
+        assert created["result"] is None
+
+        job = await _wait_for_job(client, created["id"], "jobs-user")
+
+    assert job["status"] == "succeeded"
+    assert job["progress"] == "done"
+    assert job["result"]["central_theme"] == "Growth"
+    mock_anthropic.chat.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_insights_job_failure_is_recorded(client: AsyncClient):
+    """A model error marks the job failed with the error message."""
+    from app.core.insights_cache import insights_cache
+
+    insights_cache.clear()
+    payload = {
+        "entries": [{"date": "2024-03-02", "message_count": 1, "sample_messages": ["Rainy and slow"]}],
+        "total_days_active": 1,
+        "total_messages": 1,
+        "user_id": "jobs-user",
+    }
+    with patch("app.api.insights.anthropic_service") as mock_anthropic:
+        mock_anthropic.client = object()
+        mock_anthropic.chat = AsyncMock(side_effect=RuntimeError("upstream overloaded"))
+        created = (await client.post("/api/insights/jobs", json=payload)).json()
+        job = await _wait_for_job(client, created["id"], "jobs-user")
+
+    assert job["status"] == "failed"
+    assert job["error"] == "upstream overloaded"
+
+
+@pytest.mark.asyncio
+async def test_insights_job_events_stream_until_done(client: AsyncClient):
+    """The events endpoint ends with a done event carrying the result."""
+    from app.core.insights_cache import insights_cache
+
+    insights_cache.clear()
+    mock_response = '{"central_theme":"Rest","central_emoji":"😴","theme_description":"D","theme_color":"#00f","themes":[],"narrative":"N","hidden_pattern":"P","future_prompt":"Q"}'
+    payload = {
+        "entries": [{"date": "2024-03-03", "message_count": 1, "sample_messages": ["Slept in and read"]}],
+        "total_days_active": 1,
+        "total_messages": 1,
+        "user_id": "jobs-user",
+    }
+    with patch("app.api.insights.anthropic_service") as mock_anthropic:
+        mock_anthropic.client = object()
+        mock_anthropic.chat = AsyncMock(return_value=mock_response)
+        created = (await client.post("/api/insights/jobs", json=payload)).json()
+        response = await client.get(f"/api/insights/jobs/{created['id']}/events", params={"user_id": "jobs-user"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: done" in response.text
+    assert '"central_theme":"Rest"' in response.text
+
+
+@pytest.mark.asyncio
+async def test_insights_job_unknown_id_returns_404(client: AsyncClient):
+    params = {"user_id": "jobs-user"}
+    assert (await client.get("/api/insights/jobs/no-such-job", params=params)).status_code == 404
+    assert (await client.get("/api/insights/jobs/no-such-job/events", params=params)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_insights_job_is_only_visible_to_its_owner(client: AsyncClient):
+    """Jobs need a user_id, and another user's job reads as not found."""
+    payload = {
+        "entries": [{"date": "2024-03-04", "message_count": 1, "sample_messages": ["Long walk by the river"]}],
+        "total_days_active": 1,
+        "total_messages": 1,
+    }
+    with patch("app.api.insights.anthropic_service") as mock_anthropic, \
+            patch("app.api.insights.insight_jobs.submit", AsyncMock()):
+        mock_anthropic.client = object()
+        assert (await client.post("/api/insights/jobs", json=payload)).status_code == 422
+        owner = f"owner-{uuid.uuid4()}"
+        created = (await client.post("/api/insights/jobs", json={**payload, "user_id": owner})).json()
+
+    job_url = f"/api/insights/jobs/{created['id']}"
+    assert (await client.get(job_url, params={"user_id": owner})).status_code == 200
+    assert (await client.get(job_url, params={"user_id": "someone-else"})).status_code == 404
+    assert (await client.get(f"{job_url}/events", params={"user_id": "someone-else"})).status_code == 404
+    assert (await client.get(job_url)).status_code == 422
@@ -0,0 +1,42 @@
+"""Tests for the insights result cache."""
+import pytest
+
+from app.core.insights_cache import InsightsCache
+
+
+def test_key_is_canonical():
+    """Dict ordering does not change the key; content does."""
+    a = InsightsCache.key_for({"entries": [{"date": "Jan 1", "n": 1}], "v": 1})
+    b = InsightsCache.key_for({"v": 1, "entries": [{"n": 1, "date": "Jan 1"}]})
+    c = InsightsCache.key_for({"v": 1, "entries": [{"n": 2, "date": "Jan 1"}]})
+    assert a == b
+    assert a != c
+
+
+@pytest.mark.asyncio
+async def test_ttl_expiry_and_lru_eviction():
+    """Expired entries miss; the least recently used entry is evicted first."""
+    cache = InsightsCache(ttl_seconds=60, max_entries=2)
+    await cache.set("a", "A")
+    await cache.set("b", "B")
+    assert await cache.get("a") == "A"
+    await cache.set("c", "C")
+    assert await cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    expired = InsightsCache(ttl_seconds=-1)
+    await expired.set("k", "V")
+    assert await expired.get("k") is None
+    assert expired.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_persistent_tier_survives_new_instance(tmp_path):
+    """A fresh cache reads entries written by another instance from SQLite."""
+    path = str(tmp_path / "insights.db")
+    await InsightsCache(path=path).set("k", '{"x": 1}')
+    fresh = InsightsCache(path=path)
+    assert await fresh.get("k") == '{"x": 1}'
+    assert fresh.stats()["disk_hits"] == 1
+    assert await fresh.get("k") == '{"x": 1}'
+    assert fresh.stats()["disk_hits"] == 1  # second read is served from memory
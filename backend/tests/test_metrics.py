@@ -0,0 +1,49 @@
+"""Tests for request timing, Server-Timing headers and /metrics."""
+import uuid
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.metrics import Histogram, Metrics
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((0.1, 1.0))
+    for seconds in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(seconds)
+    lines = histogram.render("latency", 'route="/x"')
+    assert lines[:3] == [
+        'latency_bucket{route="/x",le="0.1"} 1',
+        'latency_bucket{route="/x",le="1.0"} 3',
+        'latency_bucket{route="/x",le="+Inf"} 4',
+    ]
+    assert lines[-1] == 'latency_count{route="/x"} 4'
+
+
+def test_render_includes_ai_tokens_and_gauges():
+    registry = Metrics()
+    registry.observe_ai("ttft", "chat_stream", 0.2)
+    registry.count_tokens("chat", "output_tokens", 12)
+    text = registry.render({"ai_circuit_open": 0})
+    assert 'ai_call_duration_seconds_count{metric="ttft",operation="chat_stream"} 1' in text
+    assert 'ai_tokens_total{operation="chat",kind="output_tokens"} 12' in text
+    assert "ai_circuit_open 0" in text
+
+
+@pytest.mark.asyncio
+async def test_server_timing_splits_request_phases(client: AsyncClient):
+    user = f"timing-{uuid.uuid4().hex[:8]}"
+    await client.post("/api/sessions", json={"user_id": user})
+    response = await client.get("/api/sessions/summaries", params={"user_id": user})
+    phases = {part.split(";")[0] for part in response.headers["server-timing"].split(", ")}
+    assert {"total", "pre", "handler", "serialize", "db"} <= phases
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_route_templates(client: AsyncClient):
+    await client.get(f"/api/sessions/{uuid.uuid4().hex}", params={"user_id": "nobody"})
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/api/sessions/{session_id}",status="4xx"' in response.text
+    assert 'db_query_duration_seconds_count{verb="SELECT"}' in response.text
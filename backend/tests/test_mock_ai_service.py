@@ -31,3 +31,46 @@ async def test_mock_ai_accepts_various_message_formats():
     r1 = await service.chat([{"role": "user", "content": "Short"}])
     r2 = await service.chat([{"role": "user", "content": "Long message with many words"}])
     assert isinstance(r1, str) and isinstance(r2, str)
+
+
+@pytest.mark.asyncio
+async def test_mock_ai_stream_chat_reassembles_a_response():
+    """Streamed mock tokens join back into one predefined response."""
+    service = MockAIService()
+    tokens = [t async for t in service.stream_chat([{"role": "user", "content": "Hi"}], tokens_per_second=0)]
+    assert len(tokens) > 1
+    assert "".join(tokens) in service.responses
+
+
+@pytest.mark.asyncio
+async def test_mock_ai_stream_chat_is_paced():
+    """tokens_per_second spaces out the emitted tokens."""
+    import time
+
+    service = MockAIService()
+    start = time.perf_counter()
+    tokens = [t async for t in service.stream_chat([{"role": "user", "content": "Hi"}], tokens_per_second=200)]
+    assert time.perf_counter() - start >= len(tokens) / 200 * 0.9
+
+
+def test_mock_ai_latency_distributions():
+    """sample_latency follows MOCK_LATENCY_MS and MOCK_LATENCY_DISTRIBUTION."""
+    from unittest.mock import patch
+
+    service = MockAIService()
+    with patch("app.core.mock_ai_service.settings") as mock_settings:
+        mock_settings.mock_latency_ms = 0
+        assert service.sample_latency() == 0.0
+
+        mock_settings.mock_latency_ms = 100
+        mock_settings.mock_latency_distribution = "fixed"
+        assert service.sample_latency() == 0.1
+
+        mock_settings.mock_latency_distribution = "uniform"
+        assert all(0 <= service.sample_latency() <= 0.2 for _ in range(100))
+
+        mock_settings.mock_latency_distribution = "lognormal"
+        mock_settings.mock_latency_sigma = 0.5
+        samples = sorted(service.sample_latency() for _ in range(2000))
+        assert 0.08 < samples[1000] < 0.12
+        assert samples[-20] > 0.2  # Long tail
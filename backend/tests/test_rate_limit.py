@@ -0,0 +1,115 @@
+"""Tests for the cost-weighted token-bucket rate limiter."""
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.rate_limit import PRUNE_INTERVAL, MemoryStore, RateLimiter, SQLiteStore, parse_rate, rate_limiter
+
+
+def test_parse_rate():
+    assert parse_rate("60/minute") == (60.0, 1.0)
+    assert parse_rate("7200/hours") == (7200.0, 2.0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("make_store", [lambda tmp: MemoryStore(), lambda tmp: SQLiteStore(str(tmp / "buckets.db"))])
+async def test_bucket_spends_and_refills(tmp_path, make_store):
+    store = make_store(tmp_path)
+    with patch("app.core.rate_limit.time.time", return_value=1000.0):
+        assert (await store.take("u", 5, 10, 1.0)).allowed
+        assert (await store.take("u", 5, 10, 1.0)).remaining == 0
+        denied = await store.take("u", 5, 10, 1.0)
+        assert not denied.allowed and denied.retry_after == 5
+        assert (await store.take("other", 5, 10, 1.0)).allowed
+    with patch("app.core.rate_limit.time.time", return_value=1003.0):
+        assert (await store.take("u", 3, 10, 1.0)).allowed
+        assert not (await store.take("u", 1, 10, 1.0)).allowed
+
+
+@pytest.mark.asyncio
+async def test_sqlite_buckets_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "shared.db")
+    worker_a, worker_b = SQLiteStore(path), SQLiteStore(path)
+    assert (await worker_a.take("u", 8, 10, 0.01)).allowed
+    assert not (await worker_b.take("u", 8, 10, 0.01)).allowed
+
+
+@pytest.mark.asyncio
+async def test_store_failure_lets_requests_through():
+    class BrokenStore:
+        async def take(self, *args):
+            raise sqlite3.OperationalError("database is locked")
+
+    limiter = RateLimiter(BrokenStore(), "1/minute")
+    assert (await limiter.check("u", 1)).allowed
+    assert limiter.store_errors == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("make_store", [lambda tmp: MemoryStore(), lambda tmp: SQLiteStore(str(tmp / "buckets.db"))])
+async def test_idle_buckets_are_pruned(tmp_path, make_store):
+    store = make_store(tmp_path)
+    limiter = RateLimiter(store, "10/minute", "100/minute")
+    with patch("app.core.rate_limit.time.time", return_value=1000.0):
+        await limiter.check("user:old", 5)
+    with patch("app.core.rate_limit.time.time", return_value=1050.0):
+        await limiter.check("user:recent", 5)
+    # A minute after 'old' was last charged both rates have refilled it: dropping it changes nothing
+    limiter._next_prune = 0.0
+    with patch("app.core.rate_limit.time.time", return_value=1070.0):
+        await limiter.check("user:recent", 1)
+        assert (await store.take("user:recent", 5, 10, 10 / 60)).allowed
+        assert not (await store.take("user:recent", 5, 10, 10 / 60)).allowed  # Kept, still part spent
+    assert limiter._next_prune == 1070.0 + PRUNE_INTERVAL
+    if isinstance(store, MemoryStore):
+        assert set(store._buckets) == {"user:recent"}
+    else:
+        assert [key for (key,) in store._db.execute("SELECT key FROM rate_buckets")] == ["user:recent"]
+
+
+@pytest.mark.asyncio
+async def test_requests_are_limited_per_user_and_weighted_by_route(client: AsyncClient):
+    with patch.object(rate_limiter, "capacity", 10.0), patch.object(rate_limiter, "refill", 0.01):
+        for _ in range(5):
+            search = await client.get("/api/search", params={"user_id": "rl-a", "q": "walk"})
+            assert search.status_code == 200
+        # Five searches (cost 2 each) used user rl-a's bucket; a read (cost 1) is now refused
+        read = await client.get("/api/sessions/summaries", params={"user_id": "rl-a"})
+        assert read.status_code == 429
+        assert int(read.headers["retry-after"]) >= 1
+        # Same address, different user: separate bucket
+        other = await client.get("/api/sessions/summaries", params={"user_id": "rl-b"})
+        assert other.status_code == 200
+        # Unauthenticated health checks are not limited
+        assert (await client.get("/health")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_rotating_user_ids_still_hits_the_address_limit(client: AsyncClient):
+    """User ids are unverified, so every request is also charged to its client address."""
+    with patch.object(rate_limiter, "ip_capacity", 4.0), patch.object(rate_limiter, "ip_refill", 0.01):
+        statuses = [
+            (await client.get("/api/sessions/summaries", params={"user_id": f"rotating-{i}"})).status_code
+            for i in range(5)
+        ]
+        chat = await client.post("/api/chat", json={"messages": [{"role": "user", "content": "Hi"}], "user_id": "rotating-x"})
+    assert statuses == [200, 200, 200, 200, 429]
+    assert chat.status_code == 429
+
+
+@pytest.mark.asyncio
+async def test_body_user_id_routes_are_limited_per_user(client: AsyncClient):
+    """Chat takes user_id in its JSON body; that user's bucket is charged as well as the address."""
+    def chat(user: str):
+        return client.post("/api/chat", json={"messages": [{"role": "user", "content": "Hi"}], "user_id": user})
+
+    with patch.object(rate_limiter, "capacity", 10.0), patch.object(rate_limiter, "refill", 0.01):
+        assert [(await chat("body-a")).status_code for _ in range(3)] == [200, 200, 429]
+        assert (await chat("body-b")).status_code == 200  # Same address, other user: own bucket
+        # The user bucket was spent by chats, so the user's reads are limited too
+        assert (await client.get("/api/sessions/summaries", params={"user_id": "body-a"})).status_code == 429
+        # A body that fails validation is rejected before any user bucket is charged
+        assert (await client.post("/api/chat", json={"user_id": "body-c"})).status_code == 422
+        assert (await client.get("/api/sessions/summaries", params={"user_id": "body-c"})).status_code == 200
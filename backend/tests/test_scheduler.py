@@ -0,0 +1,113 @@
+"""Tests for the AI call scheduler."""
+import asyncio
+
+import pytest
+
+from app.core.scheduler import AIScheduler, SchedulerOverloaded
+
+
+async def _queue_behind(scheduler: AIScheduler, calls: list[tuple[str, str]]) -> list[str]:
+    """Hold the only slot, queue ``calls`` (operation, user), release and record the admission order."""
+    order = []
+    holder = await scheduler.acquire("chat", "holder")
+
+    async def call(operation: str, user: str, label: str):
+        async with scheduler.slot(operation, user):
+            order.append(label)
+
+    tasks = []
+    for i, (operation, user) in enumerate(calls):
+        tasks.append(asyncio.create_task(call(operation, user, f"{operation}:{user}:{i}")))
+        await asyncio.sleep(0)
+    holder.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_interactive_chat_is_served_before_insights_and_summaries():
+    scheduler = AIScheduler(max_concurrency=1)
+    order = await _queue_behind(scheduler, [("insights", "a"), ("summarize", "b"), ("chat", "c")])
+    assert order == ["chat:c:2", "summarize:b:1", "insights:a:0"]
+
+
+@pytest.mark.asyncio
+async def test_users_are_served_round_robin_within_a_class():
+    scheduler = AIScheduler(max_concurrency=1)
+    order = await _queue_behind(scheduler, [("insights", "a"), ("insights", "a"), ("insights", "a"), ("insights", "b")])
+    assert order == ["insights:a:0", "insights:b:3", "insights:a:1", "insights:a:2"]
+
+
+@pytest.mark.asyncio
+async def test_call_is_shed_when_expected_wait_exceeds_deadline():
+    scheduler = AIScheduler(max_concurrency=1, deadlines={"interactive": 1.0, "summarize": 1.0, "insights": 1.0})
+    scheduler._service_seconds = 5.0
+    holder = await scheduler.acquire("chat")
+    with pytest.raises(SchedulerOverloaded) as exc:
+        await scheduler.acquire("insights")
+    holder.release()
+    assert exc.value.status_code == 503
+    assert exc.value.retry_after == 5
+    assert scheduler.stats()["shed"] == {"insights.capacity": 1}
+
+
+@pytest.mark.asyncio
+async def test_token_budget_exhaustion_is_a_429():
+    scheduler = AIScheduler(tokens_per_minute=1000, deadlines={"interactive": 5.0, "summarize": 5.0, "insights": 5.0})
+    ticket = await scheduler.acquire("chat", tokens=1000)
+    ticket.release()
+    with pytest.raises(SchedulerOverloaded) as exc:
+        await scheduler.acquire("chat", tokens=500)  # ~30s until the budget refills
+    assert exc.value.status_code == 429
+    assert 25 <= exc.value.retry_after <= 31
+
+
+@pytest.mark.asyncio
+async def test_budget_only_wait_is_admitted_once_refilled():
+    """Nothing active to release: the refill timer alone admits the call."""
+    scheduler = AIScheduler(tokens_per_minute=60_000, deadlines={"interactive": 2.0, "summarize": 2.0, "insights": 2.0})
+    (await scheduler.acquire("chat", tokens=60_000)).release()
+    started = asyncio.get_running_loop().time()
+    ticket = await scheduler.acquire("chat", tokens=200)  # ~0.2s of refill
+    assert asyncio.get_running_loop().time() - started < 1.0
+    ticket.release()
+    assert scheduler.stats()["shed"] == {}
+
+
+@pytest.mark.asyncio
+async def test_per_user_queue_is_capped():
+    scheduler = AIScheduler(max_concurrency=1, max_queued_per_user=1)
+    holder = await scheduler.acquire("chat")
+    waiting = asyncio.create_task(scheduler.acquire("insights", "a"))
+    await asyncio.sleep(0)
+    with pytest.raises(SchedulerOverloaded) as exc:
+        await scheduler.acquire("insights", "a")
+    assert exc.value.status_code == 429
+    holder.release()
+    (await waiting).release()
+    assert scheduler.active == 0
+
+
+@pytest.mark.asyncio
+async def test_waiter_past_its_deadline_leaves_the_queue():
+    scheduler = AIScheduler(max_concurrency=1, deadlines={"interactive": 0.05, "summarize": 0.05, "insights": 0.05})
+    scheduler._service_seconds = 0.01
+    holder = await scheduler.acquire("chat")
+    with pytest.raises(SchedulerOverloaded):
+        await scheduler.acquire("chat", "late")
+    assert scheduler.stats()["queued"]["interactive"] == 0
+    holder.release()
+    assert scheduler.active == 0
+
+
+@pytest.mark.asyncio
+async def test_shed_chat_returns_status_with_retry_after(client):
+    from unittest.mock import AsyncMock, patch
+
+    with patch("app.api.chat.settings") as mock_settings, patch("app.api.chat.anthropic_service") as mock_anthropic:
+        mock_settings.use_mock_ai = False
+        mock_anthropic.chat = AsyncMock(side_effect=SchedulerOverloaded("AI service is busy, retry later", 3.2))
+        response = await client.post("/api/chat", json={"messages": [{"role": "user", "content": "Hi"}], "user_id": "u"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "4"
+    assert response.json() == {"detail": "AI service is busy, retry later"}
@@ -0,0 +1,97 @@
+"""Tests for full-text search over messages."""
+import uuid
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.search import fts_query
+
+
+async def _session(client: AsyncClient, user_id: str, *contents: str) -> tuple[str, list[dict]]:
+    sid = (await client.post("/api/sessions", json={"user_id": user_id})).json()["id"]
+    messages = [
+        {"id": str(uuid.uuid4()), "role": "user", "content": content, "timestamp": f"2024-03-0{i + 1}T09:00:00Z"}
+        for i, content in enumerate(contents)
+    ]
+    res = await client.put(f"/api/sessions/{sid}/messages", params={"user_id": user_id}, json={"messages": messages})
+    assert res.status_code == 200
+    return sid, messages
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_and_highlights(client: AsyncClient):
+    user = f"search-{uuid.uuid4()}"
+    sid, messages = await _session(
+        client, user,
+        "Went walking by the river after work.",
+        "Walked, walked and walked again: the long walk home was calming.",
+        "Nothing about that today.",
+    )
+    res = await client.get("/api/search", params={"user_id": user, "q": "walk"})
+    assert res.status_code == 200
+    items = res.json()["items"]
+    # Stemming: walking, walked and walk all match; the message that says it most ranks first
+    assert [item["message_id"] for item in items] == [messages[1]["id"], messages[0]["id"]]
+    assert items[0]["session_id"] == sid
+    assert "<mark>walk</mark>" in items[0]["snippet"]
+    assert items[0]["score"] > items[1]["score"]
+
+
+@pytest.mark.asyncio
+async def test_search_only_sees_own_messages(client: AsyncClient):
+    """User ids that share a prefix or words do not match each other."""
+    user = f"owner-{uuid.uuid4()}"
+    await _session(client, user, "A quiet evening with tea.")
+    await _session(client, f"{user}-2", "Another quiet evening.")
+    await _session(client, f"x-{user}", "Quiet again.")
+
+    res = await client.get("/api/search", params={"user_id": user, "q": "quiet"})
+    assert [item["snippet"] for item in res.json()["items"]] == ["A <mark>quiet</mark> evening with tea."]
+
+
+@pytest.mark.asyncio
+async def test_search_follows_edits_and_deletes(client: AsyncClient):
+    user = f"sync-{uuid.uuid4()}"
+    sid, messages = await _session(client, user, "Thinking about the garden.", "Planted tulips.")
+    messages[0]["content"] = "Thinking about the allotment."
+    await client.put(f"/api/sessions/{sid}/messages", params={"user_id": user}, json={"messages": messages})
+
+    assert (await client.get("/api/search", params={"user_id": user, "q": "garden"})).json()["items"] == []
+    assert len((await client.get("/api/search", params={"user_id": user, "q": "allotment"})).json()["items"]) == 1
+
+    await client.delete(f"/api/sessions/{sid}", params={"user_id": user})
+    assert (await client.get("/api/search", params={"user_id": user, "q": "tulips"})).json()["items"] == []
+
+
+@pytest.mark.asyncio
+async def test_search_paginates(client: AsyncClient):
+    user = f"pages-{uuid.uuid4()}"
+    await _session(client, user, *[f"Morning run number {i}." for i in range(5)])
+    seen = []
+    cursor = None
+    while True:
+        params = {"user_id": user, "q": "run", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = (await client.get("/api/search", params=params)).json()
+        seen += [item["message_id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) == 5
+
+
+@pytest.mark.asyncio
+async def test_search_escapes_text_and_query_syntax(client: AsyncClient):
+    user = f"escape-{uuid.uuid4()}"
+    await _session(client, user, "I wrote <b>bold</b> plans AND kept them.")
+    res = await client.get("/api/search", params={"user_id": user, "q": '"bold AND* (kept'})
+    assert res.status_code == 200
+    assert [item["snippet"] for item in res.json()["items"]] == [
+        "I wrote &lt;b&gt;<mark>bold</mark>&lt;/b&gt; plans <mark>AND</mark> <mark>kept</mark> them."
+    ]
+    assert (await client.get("/api/search", params={"user_id": user, "q": "!!"})).json()["items"] == []
+    assert (await client.get("/api/search", params={"user_id": user, "q": "x", "cursor": "bad"})).status_code == 400
+
+
+def test_fts_query_quotes_words_and_keeps_prefixes():
+    assert fts_query("u1", 'walk* "calm') == 'owner : u7531x AND content : ("walk"* """calm")'
+    assert fts_query("u1", "* -- ") is None
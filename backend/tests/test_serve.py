@@ -0,0 +1,64 @@
+"""Tests for the production launcher options and startup warm-up."""
+import os
+from unittest.mock import patch
+
+import pytest
+
+from app.core.anthropic_service import AnthropicService
+from app.core.config import settings
+from tests.stub_model_server import create_stub_app, stub_service
+
+
+def test_server_options_use_fast_loop_and_parser_when_installed():
+    import serve
+
+    with patch.object(settings, "web_concurrency", 3), patch.object(serve, "_installed", return_value=True):
+        options = serve.server_options()
+    assert options["workers"] == 3
+    assert options["loop"] == "uvloop"
+    assert options["http"] == "httptools"
+    assert options["timeout_graceful_shutdown"] == settings.shutdown_grace_seconds
+
+
+def test_server_options_fall_back_to_asyncio_and_h11():
+    import serve
+
+    with patch.object(serve, "_installed", return_value=False):
+        options = serve.server_options()
+    assert options["loop"] == "asyncio"
+    assert options["http"] == "h11"
+
+
+def test_server_options_default_to_one_worker_per_core():
+    from serve import server_options
+
+    with patch.object(settings, "web_concurrency", 0):
+        assert server_options()["workers"] == (os.cpu_count() or 1)
+
+
+def test_several_workers_share_the_database_job_queue():
+    from serve import share_job_queue
+
+    with patch.object(settings, "insights_job_queue", "memory"), patch.dict(os.environ):
+        assert share_job_queue(1) is False
+        assert settings.insights_job_queue == "memory"
+        assert share_job_queue(4) is True
+        assert settings.insights_job_queue == "database"
+        assert os.environ["INSIGHTS_JOB_QUEUE"] == "database"
+
+
+@pytest.mark.asyncio
+async def test_warm_pool_leaves_connections_in_the_pool():
+    from app.db import engine, warm_pool
+
+    await engine.dispose()
+    assert await warm_pool(3) == 3
+    assert engine.pool.checkedin() == 3
+
+
+@pytest.mark.asyncio
+async def test_ai_warm_up():
+    service = stub_service(create_stub_app())
+    assert await service.warm_up() is True
+    await service.aclose()
+    assert await AnthropicService(api_key="mock-key").warm_up() is False
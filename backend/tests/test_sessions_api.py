@@ -106,3 +106,274 @@ async def test_migrate_skips_existing(client: AsyncClient):
     res2 = await client.post("/api/migrate", json=payload)
     assert res2.json()["imported"] == 0
     assert res2.json()["skipped"] == 1
+
+
+def _msg(content: str, minute: int, role: str = "user") -> dict:
+    return {"id": str(uuid.uuid4()), "role": role, "content": content, "timestamp": f"2024-01-15T12:{minute:02d}:00Z"}
+
+
+@pytest.mark.asyncio
+async def test_append_messages_inserts_only_new_rows(client: AsyncClient):
+    """Append writes new ids only and reports what it inserted."""
+    sid = (await client.post("/api/sessions", json={"user_id": "user-1"})).json()["id"]
+    first, second = _msg("Morning pages", 0), _msg("Noted.", 1, "assistant")
+    res = await client.post(f"/api/sessions/{sid}/messages:append?user_id=user-1", json={"messages": [first, second]})
+    assert res.status_code == 200
+    data = res.json()
+    assert [m["id"] for m in data["inserted"]] == [first["id"], second["id"]]
+    assert data["title"] == "Morning pages"
+
+    third = _msg("Evening", 2)
+    retry = await client.post(f"/api/sessions/{sid}/messages:append?user_id=user-1", json={"messages": [second, third]})
+    assert [m["id"] for m in retry.json()["inserted"]] == [third["id"]]
+    session = (await client.get(f"/api/sessions/{sid}?user_id=user-1")).json()
+    assert [m["id"] for m in session["messages"]] == [first["id"], second["id"], third["id"]]
+
+
+@pytest.mark.asyncio
+async def test_append_messages_rejects_ids_of_another_session(client: AsyncClient):
+    user = f"append-{uuid.uuid4()}"
+    first = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+    second = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+    message = _msg("Only here", 0)
+    await client.post(f"/api/sessions/{first}/messages:append?user_id={user}", json={"messages": [message]})
+
+    res = await client.post(f"/api/sessions/{second}/messages:append?user_id={user}", json={"messages": [message]})
+    assert res.status_code == 409
+    assert (await client.get(f"/api/sessions/{second}?user_id={user}")).json()["messages"] == []
+
+
+@pytest.mark.asyncio
+async def test_save_messages_delta_reports_changes(client: AsyncClient):
+    """A diff-aware PUT inserts, updates and deletes only the differing rows."""
+    sid = (await client.post("/api/sessions", json={"user_id": "user-1"})).json()["id"]
+    keep, edit, drop = _msg("Keep", 0), _msg("Draft", 1), _msg("Drop", 2)
+    await client.put(f"/api/sessions/{sid}/messages?user_id=user-1", json={"messages": [keep, edit, drop]})
+
+    added = _msg("Added", 3)
+    edited = dict(edit, content="Final")
+    res = await client.put(
+        f"/api/sessions/{sid}/messages?user_id=user-1&delta=true",
+        json={"messages": [keep, edited, added]},
+    )
+    assert res.status_code == 200
+    data = res.json()
+    assert [m["id"] for m in data["inserted"]] == [added["id"]]
+    assert [m["content"] for m in data["updated"]] == ["Final"]
+    assert data["deleted"] == [drop["id"]]
+    session = (await client.get(f"/api/sessions/{sid}?user_id=user-1")).json()
+    assert [m["content"] for m in session["messages"]] == ["Keep", "Final", "Added"]
+
+
+@pytest.mark.asyncio
+async def test_save_messages_unchanged_is_a_no_op(client: AsyncClient):
+    """Re-sending identical messages writes nothing and keeps updated_at."""
+    sid = (await client.post("/api/sessions", json={"user_id": "user-1"})).json()["id"]
+    msgs = [_msg("Same", 0)]
+    first = await client.put(f"/api/sessions/{sid}/messages?user_id=user-1", json={"messages": msgs})
+    again = await client.put(f"/api/sessions/{sid}/messages?user_id=user-1&delta=true", json={"messages": msgs})
+    data = again.json()
+    assert data["inserted"] == data["updated"] == data["deleted"] == []
+    assert data["updated_at"] == first.json()["updated_at"]
+
+
+@pytest.mark.asyncio
+async def test_session_summaries_paginate_with_cursor(client: AsyncClient):
+    """Summaries come back newest first in pages, with counts and previews."""
+    user = f"pager-{uuid.uuid4()}"
+    sids = []
+    for i in range(3):
+        sid = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+        await client.post(
+            f"/api/sessions/{sid}/messages:append?user_id={user}",
+            json={"messages": [_msg(f"Entry {i} first", 0), _msg(f"Entry {i} last", 1, "assistant")]},
+        )
+        sids.append(sid)
+
+    first = (await client.get(f"/api/sessions/summaries?user_id={user}&limit=2")).json()
+    assert [s["id"] for s in first["items"]] == [sids[2], sids[1]]
+    assert first["items"][0]["message_count"] == 2
+    assert first["items"][0]["last_message_preview"] == "Entry 2 last"
+    assert "messages" not in first["items"][0]
+
+    second = (await client.get(f"/api/sessions/summaries?user_id={user}&limit=2&cursor={first['next_cursor']}")).json()
+    assert [s["id"] for s in second["items"]] == [sids[0]]
+    assert second["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_session_summaries_page_through_untouched_sessions(client: AsyncClient):
+    """Sessions created in the same second and never written to still page forward one at a time."""
+    user = f"pager-{uuid.uuid4()}"
+    sids = {(await client.post("/api/sessions", json={"user_id": user})).json()["id"] for _ in range(3)}
+    seen, cursor = [], None
+    for _ in range(4):
+        page = (await client.get("/api/sessions/summaries", params={
+            "user_id": user, "limit": 1, **({"cursor": cursor} if cursor else {}),
+        })).json()
+        seen += [s["id"] for s in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 3 and set(seen) == sids
+
+
+@pytest.mark.asyncio
+async def test_session_summaries_reject_bad_cursor(client: AsyncClient):
+    """A malformed cursor is a client error."""
+    res = await client.get("/api/sessions/summaries?user_id=user-1&cursor=not-a-cursor")
+    assert res.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_session_pages_messages(client: AsyncClient):
+    """get_session with limit returns the newest messages and a cursor for older ones."""
+    sid = (await client.post("/api/sessions", json={"user_id": "user-1"})).json()["id"]
+    msgs = [_msg(f"Line {i}", i) for i in range(5)]
+    await client.put(f"/api/sessions/{sid}/messages?user_id=user-1", json={"messages": msgs})
+
+    newest = (await client.get(f"/api/sessions/{sid}?user_id=user-1&limit=2")).json()
+    assert [m["content"] for m in newest["messages"]] == ["Line 3", "Line 4"]
+    older = (await client.get(
+        f"/api/sessions/{sid}?user_id=user-1&limit=3&before={newest['older_cursor']}"
+    )).json()
+    assert [m["content"] for m in older["messages"]] == ["Line 0", "Line 1", "Line 2"]
+    assert older["older_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_migrate_handles_duplicates_in_one_request(client: AsyncClient):
+    """Repeated session ids are skipped and repeated message ids don't abort the import."""
+    sid, other, mid = str(uuid.uuid4()), str(uuid.uuid4()), str(uuid.uuid4())
+    message = {"id": mid, "role": "user", "content": "Hi", "timestamp": "2024-01-15T12:00:00Z"}
+    payload = {
+        "user_id": "user-1",
+        "sessions": [
+            {"id": sid, "title": "One", "messages": [message]},
+            {"id": sid, "title": "One again", "messages": []},
+            {"id": other, "title": "Two", "messages": [message]},
+        ],
+    }
+    res = await client.post("/api/migrate", json=payload)
+    assert res.json() == {"imported": 2, "skipped": 1}
+    first = (await client.get(f"/api/sessions/{sid}?user_id=user-1")).json()
+    assert first["title"] == "One"
+    assert [m["id"] for m in first["messages"]] == [mid]
+
+
+@pytest.mark.asyncio
+async def test_get_session_etag_and_not_modified(client: AsyncClient):
+    user = f"etag-{uuid.uuid4()}"
+    sid = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+    await client.put(f"/api/sessions/{sid}/messages?user_id={user}", json={"messages": [_msg("First", 0)]})
+
+    res = await client.get(f"/api/sessions/{sid}?user_id={user}")
+    etag = res.headers["etag"]
+    assert etag.startswith('"') and res.headers["cache-control"] == "private, no-cache"
+    cached = await client.get(f"/api/sessions/{sid}?user_id={user}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+    # A page of messages is a different representation
+    assert (await client.get(f"/api/sessions/{sid}?user_id={user}&limit=1")).headers["etag"] != etag
+
+    await client.post(f"/api/sessions/{sid}/messages:append?user_id={user}", json={"messages": [_msg("Second", 1)]})
+    changed = await client.get(f"/api/sessions/{sid}?user_id={user}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert [m["content"] for m in changed.json()["messages"]] == ["First", "Second"]
+    assert changed.headers["etag"] != etag
+
+    missing = await client.get(f"/api/sessions/{sid}?user_id=someone-else", headers={"If-None-Match": etag})
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_list_sessions_etag_follows_changes(client: AsyncClient):
+    user = f"etag-list-{uuid.uuid4()}"
+    first = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+    second = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+    etag = (await client.get(f"/api/sessions?user_id={user}")).headers["etag"]
+    assert (await client.get(f"/api/sessions?user_id={user}", headers={"If-None-Match": etag})).status_code == 304
+
+    await client.put(f"/api/sessions/{first}/messages?user_id={user}", json={"messages": [_msg("Hello", 0)]})
+    res = await client.get(f"/api/sessions?user_id={user}", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    etag = res.headers["etag"]
+
+    await client.delete(f"/api/sessions/{second}?user_id={user}")
+    res = await client.get(f"/api/sessions?user_id={user}", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert [s["id"] for s in res.json()] == [first]
+
+
+@pytest.mark.asyncio
+async def test_list_sessions_skips_a_session_created_between_its_queries(client: AsyncClient):
+    """Under READ COMMITTED the message query can see a session the listing query did not."""
+    from sqlalchemy import event
+
+    from app.db import engine
+
+    user = f"race-list-{uuid.uuid4()}"
+    first = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+    await client.put(f"/api/sessions/{first}/messages?user_id={user}", json={"messages": [_msg("Hello", 0)]})
+    late = str(uuid.uuid4())
+
+    def create_late_session(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT messages.session_id"):
+            cursor.execute(
+                "INSERT INTO sessions (id, user_id, title, created_at, updated_at) VALUES (?, ?, 'Late', ?, ?)",
+                (late, user, "2024-01-01 00:00:00", "2024-01-01 00:00:00"),
+            )
+            cursor.execute(
+                "INSERT INTO messages (id, session_id, role, content, timestamp) VALUES (?, ?, 'user', 'Late', ?)",
+                (str(uuid.uuid4()), late, "2024-01-01 00:00:00"),
+            )
+
+    event.listen(engine.sync_engine, "before_cursor_execute", create_late_session)
+    try:
+        res = await client.get(f"/api/sessions?user_id={user}")
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", create_late_session)
+    assert res.status_code == 200
+    assert [(s["id"], len(s["messages"])) for s in res.json()] == [(first, 1)]
+
+
+@pytest.mark.asyncio
+async def test_save_messages_validates_messages_strictly(client: AsyncClient):
+    sid = (await client.post("/api/sessions", json={"user_id": "user-1"})).json()["id"]
+    url = f"/api/sessions/{sid}/messages?user_id=user-1"
+    for bad in (
+        {"role": "user", "content": "Hi", "timestamp": 1705320000},  # Bare numbers are not timestamps
+        {"role": "user", "content": "Hi", "timestamp": "yesterday"},
+        {"content": "No role"},
+        {"role": "system", "content": "Only user and assistant turns are stored"},
+    ):
+        assert (await client.put(url, json={"messages": [bad]})).status_code == 422
+
+    offset_id, naive_id = str(uuid.uuid4()), str(uuid.uuid4())
+    res = await client.put(url, json={"messages": [
+        {"id": offset_id, "role": "user", "content": "Hi", "timestamp": "2024-01-15T14:00:00+02:00"},
+        {"id": naive_id, "role": "assistant", "content": "Hello", "timestamp": "2024-01-15 12:30:00"},
+    ]})
+    assert res.status_code == 200
+    assert [(m["id"], m["timestamp"]) for m in res.json()["messages"]] == [
+        (offset_id, "2024-01-15T12:00:00"),
+        (naive_id, "2024-01-15T12:30:00"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_session_reads_match_response_models(client: AsyncClient):
+    """The single-pass JSON has exactly the fields the declared schemas have."""
+    from app.api.sessions import SessionMessagesPage, SessionSchema
+
+    user = f"shape-{uuid.uuid4()}"
+    sid = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+    saved = await client.put(f"/api/sessions/{sid}/messages?user_id={user}", json={"messages": [_msg("Hi", 0)]})
+    listed = (await client.get(f"/api/sessions?user_id={user}")).json()
+    page = (await client.get(f"/api/sessions/{sid}?user_id={user}")).json()
+
+    assert saved.json() == SessionSchema.model_validate(saved.json()).model_dump(mode="json")
+    assert listed == [SessionSchema.model_validate(listed[0]).model_dump(mode="json")]
+    assert page == SessionMessagesPage.model_validate(page).model_dump(mode="json")
+    assert page["messages"] == saved.json()["messages"] == listed[0]["messages"]
@@ -0,0 +1,75 @@
+"""Tests for request coalescing."""
+import asyncio
+
+import pytest
+
+from app.core.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """Same-key callers get one execution and the same result."""
+    flights = SingleFlight()
+    runs = 0
+
+    async def work():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    results = await asyncio.gather(*(flights.do("k", work) for _ in range(5)))
+    assert results == ["result"] * 5
+    assert runs == 1
+    assert flights.stats() == {"calls": 5, "deduplicated": 4, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_exceptions_are_shared():
+    """Every waiter sees the shared call's exception."""
+    flights = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    results = await asyncio.gather(flights.do("k", boom), flights.do("k", boom), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_waiter_keeps_the_call_alive():
+    """A cancelled caller detaches; the others still get the result."""
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return 42
+
+    first = asyncio.create_task(flights.do("k", work))
+    second = asyncio.create_task(flights.do("k", work))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second == 42
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+@pytest.mark.asyncio
+async def test_cancelling_every_waiter_cancels_the_call():
+    """When nobody is left waiting, the upstream call is cancelled."""
+    flights = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    waiter = asyncio.create_task(flights.do("k", work))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    assert flights.stats()["in_flight"] == 0
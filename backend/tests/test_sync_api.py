@@ -0,0 +1,137 @@
+"""Tests for delta sync (GET /api/sync)."""
+import uuid
+
+import pytest
+from httpx import AsyncClient
+
+
+def _message(content: str, day: int = 1) -> dict:
+    return {"id": str(uuid.uuid4()), "role": "user", "content": content, "timestamp": f"2024-05-0{day}T08:00:00Z"}
+
+
+async def _sync(client: AsyncClient, user: str, since: str | None = None, **params) -> dict:
+    res = await client.get("/api/sync", params={"user_id": user, **({"since": since} if since else {}), **params})
+    assert res.status_code == 200
+    return res.json()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_then_only_changes(client: AsyncClient):
+    user = f"sync-{uuid.uuid4()}"
+    sid = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+    first, second = _message("Slept badly."), _message("Long walk helped.", 2)
+    await client.put(f"/api/sessions/{sid}/messages", params={"user_id": user}, json={"messages": [first, second]})
+
+    snapshot = await _sync(client, user)
+    assert [s["id"] for s in snapshot["sessions"]] == [sid]
+    assert {m["id"] for m in snapshot["messages"]} == {first["id"], second["id"]}
+
+    # Nothing changed: an empty delta, same position
+    idle = await _sync(client, user, snapshot["cursor"])
+    assert idle["sessions"] == idle["messages"] == idle["deleted_messages"] == []
+    assert idle["cursor"] == snapshot["cursor"]
+
+    first["content"] = "Slept badly, woke at five."
+    third = _message("Coffee with Sam.", 3)
+    await client.put(f"/api/sessions/{sid}/messages", params={"user_id": user}, json={"messages": [first, third]})
+    delta = await _sync(client, user, snapshot["cursor"])
+    assert {m["id"]: m["content"] for m in delta["messages"]} == {
+        first["id"]: "Slept badly, woke at five.",
+        third["id"]: "Coffee with Sam.",
+    }
+    assert delta["deleted_messages"] == [second["id"]]
+    assert [s["id"] for s in delta["sessions"]] == [sid]  # Its updated_at moved
+    assert not delta["has_more"]
+
+    appended = _message("Evening: calmer.", 4)
+    await client.post(f"/api/sessions/{sid}/messages:append", params={"user_id": user}, json={"messages": [appended]})
+    later = await _sync(client, user, delta["cursor"])
+    assert [m["id"] for m in later["messages"]] == [appended["id"]]
+
+
+@pytest.mark.asyncio
+async def test_deleted_session_is_a_tombstone(client: AsyncClient):
+    user = f"sync-{uuid.uuid4()}"
+    sid = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+    await client.put(f"/api/sessions/{sid}/messages", params={"user_id": user}, json={"messages": [_message("Hi.")]})
+    cursor = (await _sync(client, user))["cursor"]
+
+    await client.delete(f"/api/sessions/{sid}", params={"user_id": user})
+    delta = await _sync(client, user, cursor)
+    assert delta["deleted_sessions"] == [sid]
+    assert delta["deleted_messages"] == []  # Implied by the session tombstone
+    assert delta["sessions"] == delta["messages"] == []
+
+
+@pytest.mark.asyncio
+async def test_created_and_deleted_between_syncs(client: AsyncClient):
+    user = f"sync-{uuid.uuid4()}"
+    cursor = (await _sync(client, user))["cursor"]
+    sid = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+    await client.delete(f"/api/sessions/{sid}", params={"user_id": user})
+    delta = await _sync(client, user, cursor)
+    assert delta["sessions"] == []
+    assert delta["deleted_sessions"] == [sid]
+
+
+@pytest.mark.asyncio
+async def test_sync_pages_with_has_more(client: AsyncClient):
+    user = f"sync-{uuid.uuid4()}"
+    cursor = (await _sync(client, user))["cursor"]
+    sid = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+    messages = [_message(f"Note {i}.", i % 9 + 1) for i in range(7)]
+    await client.put(f"/api/sessions/{sid}/messages", params={"user_id": user}, json={"messages": messages})
+
+    seen, pages = set(), 0
+    while True:
+        page = await _sync(client, user, cursor, limit=3)
+        seen |= {m["id"] for m in page["messages"]}
+        cursor, pages = page["cursor"], pages + 1
+        if not page["has_more"]:
+            break
+    assert seen == {m["id"] for m in messages}
+    assert pages == 3
+
+
+@pytest.mark.asyncio
+async def test_sync_only_sees_own_changes(client: AsyncClient):
+    user = f"sync-{uuid.uuid4()}"
+    cursor = (await _sync(client, user))["cursor"]
+    other = (await client.post("/api/sessions", json={"user_id": f"{user}-other"})).json()["id"]
+    await client.put(
+        f"/api/sessions/{other}/messages", params={"user_id": f"{user}-other"}, json={"messages": [_message("Private.")]}
+    )
+    delta = await _sync(client, user, cursor)
+    assert delta["sessions"] == delta["messages"] == []
+    assert (await _sync(client, user))["sessions"] == []
+
+
+@pytest.mark.asyncio
+async def test_sync_rejects_bad_cursor(client: AsyncClient):
+    res = await client.get("/api/sync", params={"user_id": "someone", "since": "not-a-cursor"})
+    assert res.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_cursor_older_than_the_pruned_feed_must_resync(client: AsyncClient):
+    from datetime import datetime, timedelta
+
+    from app.core.sync import prune_changes
+    from app.db import async_session
+
+    user = f"sync-{uuid.uuid4()}"
+    sid = (await client.post("/api/sessions", json={"user_id": user})).json()["id"]
+    old = (await _sync(client, user))["cursor"]
+    await client.put(f"/api/sessions/{sid}/messages", params={"user_id": user}, json={"messages": [_message("One.")]})
+    await client.put(f"/api/sessions/{sid}/messages", params={"user_id": user}, json={"messages": [_message("Two.")]})
+    recent = (await _sync(client, user))["cursor"]
+
+    async with async_session() as db:
+        assert await prune_changes(db, datetime.utcnow() + timedelta(seconds=1)) > 0
+
+    expired = await client.get("/api/sync", params={"user_id": user, "since": old})
+    assert expired.status_code == 410
+    # The newest change is kept, so an up-to-date cursor still works
+    assert (await _sync(client, user, recent))["cursor"] == recent
+    fresh = await _sync(client, user)
+    assert [m["content"] for m in fresh["messages"]] == ["Two."]
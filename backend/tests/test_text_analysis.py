@@ -0,0 +1,63 @@
+"""Tests for the local insights pre-analysis."""
+import random
+
+from app.core.text_analysis import analyze_entries, tokenize
+
+
+def test_tokenize_drops_stopwords_and_short_tokens():
+    """Tokens are lowercased content words."""
+    assert tokenize("I'm SO tired of the deadlines, ok?") == ["tired", "deadlines"]
+
+
+def test_word_sizes_follow_frequency():
+    """The most frequent word gets size 5; rarer words get smaller sizes."""
+    analysis = analyze_entries([["sleep sleep sleep sleep sleep"], ["sleep walk"]])
+    sizes = dict(analysis.related_words)
+    assert sizes["sleep"] == 5
+    assert sizes["walk"] == 1
+    assert analysis.term_counts == {"sleep": 6, "walk": 1}
+
+
+def test_themes_cluster_co_occurring_terms_and_connect():
+    """Terms that appear in the same entries form one theme; overlapping themes connect."""
+    entries = [
+        ["Work deadline stress again", "Boss pushed the deadline"],
+        ["Went running, calm evening", "Sleep was better"],
+        ["Work stress and poor sleep", "deadline tomorrow"],
+        ["Running with friends", "calm morning"],
+    ]
+    analysis = analyze_entries(entries)
+    by_key = {theme.key: theme for theme in analysis.themes}
+    assert set(by_key["deadline"].terms) == {"deadline", "stress", "work"}
+    assert by_key["deadline"].entries == [0, 2]
+    assert set(by_key["calm"].terms) == {"calm", "running"}
+    assert ("deadline", "sleep", 2) in analysis.connections
+    assert all(1 <= strength <= 5 for _, _, strength in analysis.connections)
+
+
+def test_empty_entries():
+    """No text yields an empty analysis rather than an error."""
+    analysis = analyze_entries([[""], []])
+    assert analysis.related_words == []
+    assert analysis.themes == []
+
+
+
+def test_words_in_most_entries_do_not_swallow_the_themes():
+    """With hundreds of entries, words written nearly every day still leave distinct themes."""
+    vocab = (
+        "work deadline boss meeting stress tired sleep coffee morning walk park calm "
+        "mom sister friend dinner journal weekend project money gym book music garden"
+    ).split()
+    rng = random.Random(7)
+    entries = []
+    for _ in range(300):
+        focus = rng.sample(vocab, 4)
+        entries.append(
+            [" ".join(rng.choice(focus if rng.random() < 0.5 else vocab) for _ in range(20)) for _ in range(5)]
+        )
+    analysis = analyze_entries(entries)
+    assert len(analysis.themes) == 5
+    assert len({theme.key for theme in analysis.themes}) == 5
+    assert all(len(theme.entries) < 150 for theme in analysis.themes)
+    assert analysis.connections
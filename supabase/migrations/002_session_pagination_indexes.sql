@@ -0,0 +1,7 @@
+-- Keyset pagination of the sessions list: (user_id, updated_at desc, id desc)
+create index if not exists idx_sessions_user_updated
+  on public.sessions(user_id, updated_at desc, id desc);
+
+-- Message counts, latest-message previews and paging within a session
+create index if not exists idx_messages_session_timestamp
+  on public.messages(session_id, timestamp, id);
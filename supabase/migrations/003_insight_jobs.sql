@@ -0,0 +1,20 @@
+-- Insights jobs: requests queued by POST /api/insights/jobs and their results.
+-- Only the backend reads and writes this table.
+create table if not exists public.insight_jobs (
+  id text primary key,
+  user_id text not null,
+  status text not null default 'queued' check (status in ('queued', 'running', 'succeeded', 'failed')),
+  progress text not null default 'queued',
+  request text not null,
+  result text,
+  error text,
+  attempts integer not null default 0,
+  created_at timestamptz not null default now(),
+  updated_at timestamptz not null default now()
+);
+
+-- Workers claim the oldest queued job
+create index if not exists idx_insight_jobs_status_created
+  on public.insight_jobs(status, created_at);
+
+alter table public.insight_jobs enable row level security;
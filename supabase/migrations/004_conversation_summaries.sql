@@ -0,0 +1,12 @@
+-- Rolling summary of the messages of a session that no longer fit the chat window.
+-- (covered_timestamp, covered_message_id) is the last message folded in.
+create table if not exists public.conversation_summaries (
+  session_id text primary key references public.sessions(id) on delete cascade,
+  summary text not null,
+  covered_timestamp timestamptz not null,
+  covered_message_id text not null,
+  message_count integer not null default 0,
+  updated_at timestamptz not null default now()
+);
+
+alter table public.conversation_summaries enable row level security;
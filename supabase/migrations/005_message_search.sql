@@ -0,0 +1,8 @@
+-- Full-text search over messages (GET /api/search): a generated tsvector and a GIN index.
+-- Queries filter by the owning session's user and rank with ts_rank_cd.
+alter table public.messages
+  add column if not exists search_vector tsvector
+  generated always as (to_tsvector('english', content)) stored;
+
+create index if not exists idx_messages_search
+  on public.messages using gin (search_vector);
@@ -0,0 +1,57 @@
+-- Change feed for delta sync (GET /api/sync): triggers append a row per created,
+-- updated or deleted session or message; deletes are tombstones (deleted = true).
+create table if not exists public.sync_changes (
+  seq bigint generated always as identity primary key,
+  user_id uuid not null references auth.users(id) on delete cascade,
+  entity text not null check (entity in ('session', 'message')),
+  entity_id text not null,
+  session_id text not null,
+  deleted boolean not null default false,
+  changed_at timestamptz not null default now()
+);
+
+create index if not exists idx_sync_changes_user_seq on public.sync_changes(user_id, seq);
+
+alter table public.sync_changes enable row level security;
+
+create policy "Users can view own changes"
+  on public.sync_changes for select
+  using (auth.uid() = user_id);
+
+-- The per-user transaction lock makes a user's seq order match commit order,
+-- so a client never skips a change that commits after a higher seq.
+create or replace function public.sync_session_change() returns trigger
+  language plpgsql security definer set search_path = public as $$
+declare
+  s public.sessions%rowtype;
+begin
+  if tg_op = 'DELETE' then s := old; else s := new; end if;
+  perform pg_advisory_xact_lock(hashtext(s.user_id::text));
+  insert into public.sync_changes (user_id, entity, entity_id, session_id, deleted)
+  values (s.user_id, 'session', s.id, s.id, tg_op = 'DELETE');
+  return null;
+end $$;
+
+create or replace function public.sync_message_change() returns trigger
+  language plpgsql security definer set search_path = public as $$
+declare
+  m public.messages%rowtype;
+  owner uuid;
+begin
+  if tg_op = 'DELETE' then m := old; else m := new; end if;
+  select user_id into owner from public.sessions where id = m.session_id;
+  if owner is not null then
+    perform pg_advisory_xact_lock(hashtext(owner::text));
+    insert into public.sync_changes (user_id, entity, entity_id, session_id, deleted)
+    values (owner, 'message', m.id, m.session_id, tg_op = 'DELETE');
+  end if;
+  return null;
+end $$;
+
+drop trigger if exists sync_sessions on public.sessions;
+create trigger sync_sessions after insert or update or delete on public.sessions
+  for each row execute function public.sync_session_change();
+
+drop trigger if exists sync_messages on public.messages;
+create trigger sync_messages after insert or update or delete on public.messages
+  for each row execute function public.sync_message_change();